@@ -0,0 +1,55 @@
+#! /usr/bin/env python3
+"""
+Measures the throughput of the 'grep' command in MB/s
+on files with many matches per line.
+
+python3 benchmarks/bench_grep.py [--size MB]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.commands import CommandGREP
+from src.environment import Environment
+from src.iostreams import Stream
+
+
+def make_file(size, matches_per_line):
+    """Creates the temporary file of the given size in bytes."""
+    line = ' '.join(['match'] * matches_per_line + ['other text here']) + '\n'
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as file:
+        file.write(line * max(1, size // len(line)))
+    return file.name
+
+
+def measure(args, file_name):
+    """Runs grep over the file and returns the throughput in MB/s."""
+    command = CommandGREP()
+    command.set_args(args + [file_name])
+    start = time.perf_counter()
+    for chunk in command.run(Stream(), Environment()).get_stream():
+        pass
+    elapsed = time.perf_counter() - start
+    return os.path.getsize(file_name) / elapsed / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='grep throughput benchmark.')
+    parser.add_argument('--size', type=int, default=16, help='file size in MB')
+    options = parser.parse_args()
+    for matches_per_line in (0, 1, 10, 100):
+        file_name = make_file(options.size * 1024 * 1024, matches_per_line)
+        try:
+            for args in (['match'], ['-i', 'MATCH'], ['-w', 'match'], ['-A', '2', 'match']):
+                print('{:4d} matches per line  {:18s} {:8.1f} MB/s'.format(
+                    matches_per_line, ' '.join(args), measure(args, file_name)))
+        finally:
+            os.remove(file_name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#! /usr/bin/env python3
+"""
+Measures the time of lexing long command lines
+to show that it grows linearly with the length of the line.
+
+python3 benchmarks/bench_lexer.py [--size MB]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.lexer import Lexer
+
+LINES = {
+    'many words': 'echo a=1 $x word | ',
+    'glued quotes': '\'a\'"b"',
+    'echo payload': None,
+}
+
+
+def make_line(kind, size):
+    """Creates the command line of the given kind and size in symbols."""
+    if LINES[kind] is None:
+        return 'echo \'' + 'x' * (size - 7) + '\''
+    part = LINES[kind]
+    return part * (size // len(part))
+
+
+def measure(line):
+    """Returns the time of lexing the line in seconds."""
+    start = time.perf_counter()
+    Lexer().get_lexemes(line)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='lexer scaling benchmark.')
+    parser.add_argument('--size', type=int, default=1, help='maximal line size in MB')
+    options = parser.parse_args()
+    max_size = options.size * 1024 * 1024
+    for kind in LINES:
+        size = max_size // 8
+        while size <= max_size:
+            elapsed = measure(make_line(kind, size))
+            print('{:14s} {:9d} symbols {:9.4f} s {:8.1f} ns/symbol'.format(
+                kind, size, elapsed, elapsed / size * 1e9))
+            size *= 2
+
+
+if __name__ == '__main__':
+    main()
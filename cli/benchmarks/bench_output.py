@@ -0,0 +1,82 @@
+#! /usr/bin/env python3
+"""
+Measures how fast the output gets to the terminal: the time to the first line
+of the command that keeps working after it, the time of writing many lines
+to the pseudo-terminal line by line and by the BatchedWriter, and the peak
+memory while the big output of the external command is read.
+
+python3 benchmarks/bench_output.py [--lines N]
+"""
+import argparse
+import io
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.cli import Cli
+from src.iostreams import BatchedWriter
+
+
+def first_line(cli):
+    """Returns the time to the first line of the command printing the second one later."""
+    start = time.perf_counter()
+    result = cli.process_input("sh -c 'echo first; sleep 1; echo second'")
+    chunks = result.get_stream().chunks()
+    next(chunks)
+    elapsed = time.perf_counter() - start
+    list(chunks)
+    return elapsed
+
+
+def terminal_write(cli, line, batched):
+    """Writes the output of the line to the pseudo-terminal and returns the time."""
+    master, slave = os.openpty()
+
+    def drain():
+        try:
+            while os.read(master, 1024 * 1024):
+                pass
+        except OSError:
+            pass
+    threading.Thread(target=drain, daemon=True).start()
+    out = io.TextIOWrapper(io.BufferedWriter(io.FileIO(slave, 'w', closefd=False)),
+                           line_buffering=True)
+    target = BatchedWriter(out) if batched else out
+    start = time.perf_counter()
+    cli.process_input(line).get_stream().write_to(target)
+    target.flush()
+    elapsed = time.perf_counter() - start
+    os.close(slave)
+    os.close(master)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='terminal output benchmark.')
+    parser.add_argument('--lines', type=int, default=200000, help='number of printed lines')
+    options = parser.parse_args()
+    cli = Cli()
+    print('{:24s} {:10.3f} s'.format('first line', first_line(cli)))
+    with tempfile.NamedTemporaryFile('w', suffix='.txt') as lines:
+        lines.write(''.join('{} line\n'.format(i) for i in range(options.lines)))
+        lines.flush()
+        for batched in (False, True):
+            print('{:24s} {:10.3f} s'.format(
+                'grep, batched' if batched else 'grep, line by line',
+                terminal_write(cli, 'grep line {}'.format(lines.name), batched)))
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    size = sum(len(chunk) for chunk in
+               cli.process_input('seq {}'.format(options.lines * 50)).get_stream().chunks())
+    print('{:24s} {:10.3f} s {:8.1f} MB read, peak memory +{:.1f} MB'.format(
+        'seq', time.perf_counter() - start, size / 1024 / 1024,
+        (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024))
+
+
+if __name__ == '__main__':
+    main()
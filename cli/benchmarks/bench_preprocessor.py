@@ -0,0 +1,56 @@
+#! /usr/bin/env python3
+"""
+Measures the time of variables substitution in big arguments
+and in arguments with many variables: the first substitution
+compiles the string, the repeated one only renders the compiled template.
+
+python3 benchmarks/bench_preprocessor.py [--size MB]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.environment import Environment
+from src.preprocessor import Preprocessor
+
+ARGUMENTS = {
+    'plain text': 'some text ',
+    'double quotes': '"text $x" ',
+    'single quotes': '\'text $x\' ',
+    'many variables': '$x$long_name ',
+}
+
+
+def measure(argument, env):
+    """Returns times of the first and the repeated substitution in seconds."""
+    times = []
+    for _ in range(2):
+        start = time.perf_counter()
+        Preprocessor.substitute_vars(argument, env)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='variables substitution benchmark.')
+    parser.add_argument('--size', type=int, default=1, help='maximal argument size in MB')
+    options = parser.parse_args()
+    env = Environment()
+    env.set_var_value('x', '10')
+    env.set_var_value('long_name', 'value')
+    max_size = options.size * 1024 * 1024
+    for kind, part in ARGUMENTS.items():
+        size = max_size // 8
+        while size <= max_size:
+            argument = part * (size // len(part))
+            first, repeated = measure(argument, env)
+            print('{:15s} {:9d} symbols  compile {:8.4f} s  render {:8.4f} s'.format(
+                kind, len(argument), first, repeated))
+            size *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+#! /usr/bin/env python3
+"""
+Measures how many external commands are started per second
+by the CLI itself and by the spawn server, and how fast
+the missing command is reported.
+
+python3 benchmarks/bench_spawn.py [--count N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import spawner
+from src.commands import UnknownCommand
+from src.environment import Environment
+from src.iostreams import Stream
+
+
+def measure(name, count):
+    """Runs the command count times and returns the number of runs per second."""
+    env = Environment()
+    command = UnknownCommand(name, [])
+    command.run(Stream(), env)
+    start = time.perf_counter()
+    for _ in range(count):
+        command.run(Stream(), env).get_output()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='external commands start benchmark.')
+    parser.add_argument('--count', type=int, default=1000, help='number of starts')
+    options = parser.parse_args()
+    for server in (False, True):
+        spawner.use_spawn_server(server)
+        print('{:14s} {:10.1f} spawns/s'.format(
+            'spawn server' if server else 'local', measure('true', options.count)))
+    print('{:14s} {:10.1f} lookups/s'.format(
+        'not found', measure('surely-missing-command', options.count)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+#! /usr/bin/env python3
+"""
+The benchmark suite of the interpreter and builtins.
+
+Measures the Lexer, the Preprocessor and the Parser on lines of growing size
+with many words, quotes and variables, the pipe run by the PipelineExecutor
+and the 'cat', 'wc', 'grep' and 'echo' commands on synthetic files
+of growing size. For every case the best time of several runs
+and the peak memory allocated by Python in one more run (by tracemalloc,
+memory-mapped files are not counted) are recorded.
+The file cache is flushed before every run, so files are read every time.
+
+Results are saved as JSON and compared with the baseline:
+cases that became slower or bigger than the threshold are reported
+and the exit code is 1.
+
+python3 benchmarks/bench_suite.py [--max-file-size 1G] [--output results.json]
+python3 benchmarks/bench_suite.py --save-baseline
+python3 benchmarks/bench_suite.py --baseline benchmarks/baseline.json [--threshold 0.2]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.commands import CommandCAT, CommandECHO, CommandGREP, CommandPIPE, CommandWC
+from src.environment import Environment
+from src.executor import PipelineExecutor
+from src.filecache import get_file_cache
+from src.iostreams import Stream
+from src.lexer import Lexer
+from src.parser import Parser
+from src.preprocessor import Preprocessor
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+WORDS = ['error', 'warning', 'info', 'request', 'user', 'id', 'time', 'ms', 'ok', 'failed']
+
+LINES = {
+    'words': 'echo a=1 $x word | ',
+    'quotes': '\'a\'"b" ',
+    'vars': '"$x"a$y ',
+    'nested quotes': '\'$x"$y"\' ',
+}
+
+
+def parse_size(text):
+    """Converts the size like '64M' to the number of bytes."""
+    text = text.strip().upper()
+    if text[-1:] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def format_size(size):
+    """Converts the number of bytes to the short string like '64M'."""
+    for unit in 'GMK':
+        if size >= UNITS[unit] and size % UNITS[unit] == 0:
+            return '{}{}'.format(size // UNITS[unit], unit)
+    return str(size)
+
+
+def sizes(min_size, max_size, step=16):
+    """Yields sizes from the minimal one to the maximal one multiplying by the step."""
+    size = min_size
+    while size <= max_size:
+        yield size
+        size *= step
+
+
+def make_line(kind, size):
+    """Creates the command line of the given kind and size in symbols."""
+    part = LINES[kind]
+    return part * max(1, size // len(part))
+
+
+def make_file(directory, size):
+    """
+    Creates the file of log-like lines of the given size in bytes.
+    The block of lines is made once and repeated.
+    """
+    generator = random.Random(size)
+    lines = []
+    block_size = 0
+    while block_size < min(size, 1024 * 1024):
+        line = ' '.join(generator.choice(WORDS) for _ in range(generator.randint(3, 12))) + '\n'
+        lines.append(line)
+        block_size += len(line)
+    block = ''.join(lines).encode()
+    file_path = os.path.join(directory, 'file-{}.txt'.format(format_size(size)))
+    with open(file_path, 'wb') as opened_file:
+        for _ in range(size // len(block)):
+            opened_file.write(block)
+        opened_file.write(block[:size % len(block)])
+    return file_path
+
+
+def consume(result):
+    """Reads the output of the command till the end without keeping it."""
+    for _ in result.get_stream():
+        pass
+
+
+def builtin(command_class, args):
+    """Makes the command with the given arguments."""
+    command = command_class()
+    command.set_args(args)
+    return command
+
+
+def cases(options, directory):
+    """
+    Yields names of cases and functions running them once.
+    Files are created when the first case needs them.
+    """
+    env = Environment()
+    env.set_var_value('x', 'value')
+    env.set_var_value('y', 'other value')
+    executor = PipelineExecutor()
+    cache = get_file_cache()
+
+    for size in sizes(options.min_line_size, options.max_line_size):
+        for kind in LINES:
+            line = make_line(kind, size)
+            yield 'lexer/{}/{}'.format(kind, format_size(size)), \
+                lambda line=line: Lexer().get_lexemes(line)
+        for kind in ('vars', 'nested quotes'):
+            line = make_line(kind, size)
+
+            def substitute(line=line):
+                Preprocessor.compile.cache_clear()
+                Preprocessor.substitute_vars(line, env)
+            yield 'preprocessor/{}/{}'.format(kind, format_size(size)), substitute
+        lexemes = Lexer().get_lexemes('echo ' + make_line('vars', size))
+        yield 'parser/args/{}'.format(format_size(size)), \
+            lambda lexemes=lexemes: Parser(env).build_command(lexemes)
+        lexemes = Lexer().get_lexemes(make_line('words', size) + 'echo')
+        yield 'parser/pipes/{}'.format(format_size(size)), \
+            lambda lexemes=lexemes: Parser(env).build_command(lexemes)
+        args = ['word'] * max(1, size // 5)
+        yield 'echo/{}'.format(format_size(size)), \
+            lambda args=args: consume(builtin(CommandECHO, args).run(Stream(), env))
+
+    for size in sizes(options.min_file_size, options.max_file_size):
+        file_path = make_file(directory, size)
+        name = format_size(size)
+
+        def run(command_class, args, file_path=file_path):
+            cache.flush()
+            consume(builtin(command_class, args + [file_path]).run(Stream(), env))
+        yield 'cat/{}'.format(name), lambda run=run: run(CommandCAT, [])
+        yield 'wc/{}'.format(name), lambda run=run: run(CommandWC, [])
+        yield 'grep/rare/{}'.format(name), lambda run=run: run(CommandGREP, ['failed ok'])
+        yield 'grep/frequent/{}'.format(name), lambda run=run: run(CommandGREP, ['error'])
+
+        def pipe(file_path=file_path):
+            cache.flush()
+            command = CommandPIPE(CommandPIPE(builtin(CommandCAT, [file_path]),
+                                              builtin(CommandGREP, ['error'])),
+                                  builtin(CommandWC, []))
+            consume(executor.run(command, Stream(), env))
+        yield 'pipe/cat-grep-wc/{}'.format(name), pipe
+        os.remove(file_path)
+
+
+def measure(run, repeat, memory):
+    """
+    Runs the case several times.
+    :return: pair of the best time in seconds and the peak memory in bytes
+    (None if the memory is not measured).
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+
+def compare(result, old):
+    """
+    Compares the result of the case with its result in the baseline.
+    :return: pair of relative changes of the time and the memory,
+    None instead of the change if there is nothing to compare.
+    """
+    if old is None:
+        return None, None
+    time_change = result['time'] / old['time'] - 1 if old['time'] else None
+    memory_change = None
+    if result['peak_memory'] is not None and old.get('peak_memory'):
+        memory_change = result['peak_memory'] / old['peak_memory'] - 1
+    return time_change, memory_change
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark suite of the CLI.')
+    parser.add_argument('--min-line-size', type=parse_size, default='1K',
+                        help='minimal size of command lines, i.e. 1K')
+    parser.add_argument('--max-line-size', type=parse_size, default='256K',
+                        help='maximal size of command lines')
+    parser.add_argument('--min-file-size', type=parse_size, default='1K',
+                        help='minimal size of files')
+    parser.add_argument('--max-file-size', type=parse_size, default='64M',
+                        help='maximal size of files, up to 1G and more')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs')
+    parser.add_argument('--no-memory', action='store_true', help='do not measure the memory')
+    parser.add_argument('--filter', default='', help='run only cases with this substring')
+    parser.add_argument('--output', help='save results to this JSON file')
+    parser.add_argument('--baseline', help='compare with results from this JSON file')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='save results as ' + os.path.relpath(BASELINE))
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed relative growth of the time and the memory')
+    options = parser.parse_args()
+
+    baseline = {}
+    if options.baseline:
+        with open(options.baseline) as opened_file:
+            baseline = json.load(opened_file)['results']
+
+    results = {}
+    regressions = []
+    print('{:32s} {:>11s} {:>11s} {:>9s} {:>9s}'.format(
+        'case', 'time, ms', 'memory, KB', 'time', 'memory'))
+    with tempfile.TemporaryDirectory() as directory:
+        for name, run in cases(options, directory):
+            if options.filter not in name:
+                continue
+            elapsed, peak = measure(run, options.repeat, not options.no_memory)
+            results[name] = {'time': elapsed, 'peak_memory': peak}
+            time_change, memory_change = compare(results[name], baseline.get(name))
+            if any(change is not None and change > options.threshold
+                   for change in (time_change, memory_change)):
+                regressions.append(name)
+            print('{:32s} {:11.3f} {:>11s} {:>9s} {:>9s}'.format(
+                name, elapsed * 1000, '-' if peak is None else '{:.1f}'.format(peak / 1024),
+                '' if time_change is None else '{:+.0%}'.format(time_change),
+                '' if memory_change is None else '{:+.0%}'.format(memory_change)))
+
+    report = {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+              'python': platform.python_version(), 'platform': platform.platform(),
+              'repeat': options.repeat, 'results': results}
+    for path in ([options.output] if options.output else []) + \
+            ([BASELINE] if options.save_baseline else []):
+        with open(path, 'w') as opened_file:
+            json.dump(report, opened_file, indent=2, sort_keys=True)
+    if regressions:
+        print('{} cases are slower or bigger than the baseline by more than {:.0%}:'.format(
+            len(regressions), options.threshold))
+        for name in regressions:
+            print('    ' + name)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
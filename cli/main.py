@@ -1,7 +1,68 @@
 #! /usr/bin/env python3
+"""
+Starts the CLI.
+
+main.py                      the interactive mode
+main.py SCRIPT               runs commands from the file line by line
+main.py -c COMMANDS          runs commands from the string line by line
+command | main.py            runs commands from the non-interactive input
+--summary                    prints the number of lines, the time
+                             and totals for every command to stderr
+--spawn-server               starts external commands by the helper process
+--profile                    turns the profiling on, see the 'stats' command
+--spill-threshold MB         size of the output kept in memory, bigger output
+                             goes to temporary files
+"""
+import argparse
+import io
+import sys
 
 from src.cli import Cli
+from src.iostreams import BatchedWriter, set_spill_threshold
+from src.profiler import get_profiler
+from src.spawner import use_spawn_server
+
+BUFFER_SIZE = 1024 * 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='The shell imitator.')
+    parser.add_argument('-c', dest='commands', metavar='COMMANDS',
+                        help='run commands from the string')
+    parser.add_argument('--summary', action='store_true',
+                        help='print the summary of the script to stderr')
+    parser.add_argument('--spawn-server', action='store_true',
+                        help='start external commands by the helper process')
+    parser.add_argument('--profile', action='store_true',
+                        help='record times of executed lines for the \'stats\' command')
+    parser.add_argument('--spill-threshold', type=int, default=64, metavar='MB',
+                        help='size of the output kept in memory, bigger output goes to temporary files')
+    parser.add_argument('script', metavar='SCRIPT', nargs='?',
+                        help='run commands from the file')
+    args = parser.parse_args()
+    use_spawn_server(args.spawn_server)
+    get_profiler().enable(args.profile)
+    set_spill_threshold(args.spill_threshold * 1024 * 1024)
 
-if __name__ == '__main__':
     cli = Cli()
-    cli.run()
+    if args.commands is None and args.script is None and sys.stdin.isatty():
+        cli.run()
+        return 0
+    out = io.TextIOWrapper(io.BufferedWriter(io.FileIO(sys.stdout.fileno(), 'w', closefd=False),
+                                             BUFFER_SIZE), encoding=sys.stdout.encoding,
+                           errors=sys.stdout.errors, newline='')
+    if sys.stdout.isatty():
+        out = BatchedWriter(out)
+    try:
+        if args.commands is not None:
+            return cli.run_script(args.commands.splitlines(), out, summary=args.summary)
+        if args.script is not None:
+            with open(args.script, buffering=BUFFER_SIZE) as script:
+                return cli.run_script(script, out, summary=args.summary)
+        return cli.run_script(sys.stdin, out, summary=args.summary)
+    finally:
+        out.flush()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
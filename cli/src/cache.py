@@ -0,0 +1,142 @@
+"""
+The cache of command trees built from input lines.
+Lexing and parsing of the line depend only on the line itself
+and values of variables substituted into it, so the command tree
+of the line seen before is taken from the cache while these variables
+keep their values. Changing the variable removes from the cache only
+the lines that used it.
+Trees are optimized (see the optimizer module) before they are cached,
+so the optimized tree of the repeated line is taken at once.
+"""
+from collections import OrderedDict
+from src.lexer import Lexer, Lexeme_type
+from src.optimizer import optimize
+from src.parser import Parser
+import time
+
+
+class ParseCache:
+    """
+    The bounded LRU cache mapping input lines to command trees.
+    Every entry keeps the names of variables read while the line was parsed.
+
+    cache = ParseCache(env)
+    command = cache.get_command('echo $x | wc')
+    """
+
+    def __init__(self, env, max_size=256):
+        """
+        Subscribes to changes of variables of the environment.
+        :param env: the Environment instance with variables.
+        :param max_size: maximal number of cached lines (int).
+        """
+        self.__env = env
+        self.__lexer = Lexer()
+        self.__parser = Parser(env)
+        self.__max_size = max_size
+        self.__entries = OrderedDict()
+        self.__dependents = {}
+        self.__hits = 0
+        self.__misses = 0
+        env.subscribe(self.invalidate)
+
+    def get_command(self, line, profile=None):
+        """
+        Returns the optimized command tree of the input line.
+        The line is lexed, parsed and optimized only if it is not in the cache.
+        Lexer and parser exceptions are passed to the caller.
+        :param line: the input string.
+        :param profile: the LineProfile getting times of lexing, parsing
+        (with the optimization) and substitution of variables or None.
+        :return: the root of the Command tree or None if the line has no commands.
+        """
+        entry = self.__entries.get(line)
+        if entry is not None:
+            self.__entries.move_to_end(line)
+            self.__hits += 1
+            if profile is not None:
+                profile.cached = True
+            return entry[0]
+
+        self.__misses += 1
+        start = time.perf_counter()
+        lexemes = self.__lexer.get_lexemes(line)
+        if profile is not None:
+            profile.add_phase('lex', time.perf_counter() - start)
+        if not lexemes:
+            return None
+        start = time.perf_counter()
+        self.__env.start_recording()
+        try:
+            command = optimize(self.__parser.build_command(lexemes, profile))
+        finally:
+            var_names = self.__env.stop_recording()
+            if profile is not None:
+                profile.add_phase('parse', time.perf_counter() - start - profile.phases['preprocess'])
+        if ParseCache.__is_cacheable(lexemes):
+            self.__add(line, command, var_names)
+        return command
+
+    def invalidate(self, var_name):
+        """
+        Removes lines which depend on the variable.
+        :param var_name: the name of the changed variable.
+        """
+        for line in self.__dependents.pop(var_name, ()):
+            self.__remove(line)
+
+    def hits(self):
+        """Returns the number of lines taken from the cache."""
+        return self.__hits
+
+    def misses(self):
+        """Returns the number of lines parsed from scratch."""
+        return self.__misses
+
+    def size(self):
+        """Returns the number of cached lines."""
+        return len(self.__entries)
+
+    def __add(self, line, command, var_names):
+        """Puts the line to the cache, removing the least recently used one if needed."""
+        self.__entries[line] = (command, var_names)
+        for var_name in var_names:
+            self.__dependents.setdefault(var_name, set()).add(line)
+        while len(self.__entries) > self.__max_size:
+            self.__remove(next(iter(self.__entries)))
+
+    def __remove(self, line):
+        """Removes the line from the cache and from the lists of dependents."""
+        entry = self.__entries.pop(line, None)
+        if entry is None:
+            return
+        for var_name in entry[1]:
+            lines = self.__dependents.get(var_name)
+            if lines is not None:
+                lines.discard(line)
+                if not lines:
+                    del self.__dependents[var_name]
+
+    @staticmethod
+    def __is_cacheable(lexemes):
+        """
+        Checks if the command tree of lexemes can be reused.
+        The command given by the variable is run by the parser,
+        so its result cannot be cached. Commands after the assignment
+        and ';', '&&' or '||' are parsed only when they run,
+        so such lines are not cached too.
+        """
+        command_position = True
+        assigned = False
+        for lexeme in lexemes:
+            if command_position and lexeme.type() == Lexeme_type.VAR:
+                return False
+            if assigned and lexeme.type() in (Lexeme_type.SEMICOLON, Lexeme_type.AND,
+                                              Lexeme_type.OR):
+                return False
+            assigned = assigned or lexeme.type() == Lexeme_type.ASSIGNMENT
+            command_position = lexeme.type() in (Lexeme_type.PIPE, Lexeme_type.SEMICOLON,
+                                                 Lexeme_type.AND, Lexeme_type.OR,
+                                                 Lexeme_type.AMPERSAND) or \
+                command_position and lexeme.value() in ('time', 'explain')
+        return True
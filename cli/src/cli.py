@@ -1,11 +1,16 @@
 """
 The main CLI class with the infinite loop.
 """
-from src.parser import Parser, ParserException
-from src.lexer import Lexer, LexerException
+from src.parser import ParserException
+from src.lexer import LexerException
+from src.cache import ParseCache
 from src.commands import *
 from src.environment import Environment
+from src.executor import PipelineExecutor
+from src.jobs import get_job_manager
+from src.profiler import LineProfile, get_profiler
 import sys
+import time
 
 
 class Cli:
@@ -20,45 +25,91 @@ class Cli:
         """
         The class needs:
         the Environment instance for storing variables,
-        the Parser and Lexer instances for parsing and lexing the input.
+        the ParseCache instance for lexing and parsing the input
+        (with the Lexer and the Parser inside),
+        the PipelineExecutor instance for running commands,
+        the JobManager instance for running background jobs.
         """
         self.__env = Environment()
-        self.__parser = Parser(self.__env)
-        self.__lexer = Lexer()
+        self.__cache = ParseCache(self.__env)
+        self.__executor = PipelineExecutor()
+        self.__jobs = get_job_manager()
+        self.__profiler = get_profiler()
 
     def process_input(self, input):
         """
         Method for processing input string:
         lexing, parsing and running the resultant.
+        Command trees of repeated lines are taken from the cache.
+        The line ending with '&' is started as the background job
+        and only the job number is returned.
+        If the profiling is on, times of the line are put to the profiler
+        when its output ends.
 
         :param input: The input string.
         :return: The CommandResult instance with result of command execution.
         """
-        lexems = self.__lexer.get_lexemes(input)
-        command = self.__parser.build_command(lexems)
+        profile = LineProfile(input) if self.__profiler.is_enabled() else None
+        command = self.__cache.get_command(input, profile)
         result = None
-        if command:
-            result = command.run(Stream(), self.__env)
+        if profile is not None and command and not isinstance(command, CommandBACKGROUND):
+            result = self.__run_profiled(command, profile)
+        elif isinstance(command, CommandBACKGROUND):
+            line = input.rstrip()[:-1].rstrip()
+            job = self.__jobs.start(line, command.get_command(), self.__env, self.__executor)
+            output = Stream()
+            output.write_line('[{}]'.format(job.number()))
+            result = CommandResult(output, self.__env, 0)
+        elif command:
+            result = self.__executor.run(command, Stream(), self.__env)
             self.__env = result.get_env()
         return result
 
+    def __run_profiled(self, command, profile):
+        """
+        Runs the command with the profile getting times of its commands.
+        The time of the whole line is taken when its output ends.
+        """
+        start = time.perf_counter()
+        result = self.__executor.run(command, Stream(), self.__env, profile)
+        self.__env = result.get_env()
+        output = result.get_stream()
+
+        def chunks():
+            try:
+                yield from output.chunks()
+            finally:
+                profile.add_phase('run', time.perf_counter() - start)
+                self.__profiler.add(profile)
+        return CommandResult(Stream(chunks(), output.is_binary()), result.get_env(),
+                             result.return_value)
+
+    def get_cache(self):
+        """Returns the ParseCache instance with hit and miss counters."""
+        return self.__cache
+
     def run(self):
         """
         The main method of Cli class with infinite loop.
         Take input, process it and print the result continuously
         till ExitException, EOFError or Exception are raising.
+        The output is printed while it is produced, by batches
+        of the BatchedWriter.
         """
         running = True
+        out = BatchedWriter(sys.stdout)
         print('>\t\tHello! This is a shell imitator.')
         while running:
             try:
+                self.__report_jobs(out)
                 input_string = input('> ')
                 if input_string:
                     result = self.process_input(input_string)
                     if result:
-                        output = result.get_output()
-                        if output:
-                            print(output, end='')
+                        try:
+                            result.get_stream().write_to(out)
+                        finally:
+                            out.flush()
                         return_value = result.return_value()
                     if return_value:
                         print('Process exited with error code {}'.
@@ -76,3 +127,86 @@ class Cli:
                 return
 
         print('Good bye.')
+
+    def run_script(self, lines, out=sys.stdout, err=sys.stderr, summary=False):
+        """
+        Runs commands from the iterable of lines without the banner and prompts,
+        i.e. lines of the script file or the non-interactive input.
+        The output is not flushed after every line. Lexing and parsing
+        errors are reported to err with the line number and the script goes on.
+        The script stops on the 'exit' command or on the unexpected error.
+        The output of background jobs is written after the line
+        they finished at, the script waits for all jobs at the end.
+        :param lines: iterable with input strings.
+        :param out: the text file for the output of commands.
+        :param err: the text file for errors and the summary.
+        :param summary: print the number of lines, the time and totals
+        for every command after the script (bool).
+        :return: the return value of the last command (int).
+        """
+        start = time.perf_counter()
+        totals = {}
+        line_count = 0
+        return_value = 0
+        for line_number, line in enumerate(lines, 1):
+            line = line.rstrip('\r\n')
+            if not line.strip():
+                continue
+            line_count += 1
+            line_start = time.perf_counter()
+            try:
+                result = self.process_input(line)
+                if result:
+                    result.get_stream().write_to(out)
+                    return_value = result.return_value()
+            except ParserException as ex:
+                err.write('line {}: Parsing exception: {}{}'.format(line_number, ex, os.linesep))
+                return_value = 1
+            except LexerException as ex:
+                err.write('line {}: Lexing exception: {}{}'.format(line_number, ex, os.linesep))
+                return_value = 1
+            except ExitException:
+                break
+            except Exception as ex:
+                err.write('line {}: Something wrong: {}{}'.format(line_number, ex, os.linesep))
+                return_value = 1
+                break
+            finally:
+                name = line.split(None, 1)[0]
+                if '=' in name:
+                    name = name[:name.index('=') + 1]
+                count, total = totals.get(name, (0, 0.0))
+                totals[name] = (count + 1, total + time.perf_counter() - line_start)
+            self.__report_jobs(out)
+        self.__jobs.wait_all()
+        self.__report_jobs(out)
+        out.flush()
+        if summary:
+            Cli.__write_summary(err, line_count, time.perf_counter() - start, totals)
+        return return_value
+
+    def __report_jobs(self, out):
+        """
+        Writes the output and the state of every finished background job
+        and removes these jobs from the table.
+        :param out: the text file for the output.
+        """
+        jobs = self.__jobs.finished()
+        for job in jobs:
+            job.output().write_to(out)
+            out.write('[{}]  {:<10}{}{}'.format(job.number(), job.state(), job.line(), os.linesep))
+        if jobs:
+            out.flush()
+
+    @staticmethod
+    def __write_summary(err, line_count, elapsed, totals):
+        """
+        Writes the number of executed lines, the wall time
+        and the number of lines and the time for every command.
+        """
+        err.write('Executed {} lines in {:.3f} s ({:.1f} lines/s).{}'.format(
+            line_count, elapsed, line_count / elapsed if elapsed else 0.0, os.linesep))
+        err.write('{:>20} {:>10} {:>10}{}'.format('command', 'lines', 'time, s', os.linesep))
+        for name, (count, total) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            err.write('{:>20} {:>10} {:>10.3f}{}'.format(name[:20], count, total, os.linesep))
+        err.flush()
@@ -6,11 +6,24 @@ and the environment and returns the CommandResult instance.
 Also contains ExitException that raises if command 'exit' was parsed.
 """
 from abc import ABCMeta, abstractmethod
-import sys
-import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from src.iostreams import *
+from src.spawner import forget, get_spawner, resolve
+from src.sorting import make_key, sort_lines
+from src.search import Matcher, count_lines, count_mapped_file, grep_lines, grep_mapped_file, \
+    grep_text, grep_tree
+from src.filecache import get_file_cache
+from src.grouping import top_lines, unique_lines
+from src.headtail import head_chunks, tail_chunks, tail_file
+from src.jobs import get_job_manager
+from src.profiler import get_profiler
+from src.trigrams import INDEX_NAME, TrigramIndex, get_index, required_trigrams
+from src.wordcount import count_chunks, count_file, read_chunks
+from src.workers import get_process_pool
 import argparse
 import re
+import threading
+import time
 
 
 class ExitException(Exception):
@@ -32,6 +45,8 @@ class CommandResult:
         :param return_value: return flag (int):
         0 - process exited successfully
         1 - otherwise
+        or the function returning it, when the flag is known
+        only after the output is read till the end.
         """
         self.__output = output
         self.__env = env
@@ -39,12 +54,25 @@ class CommandResult:
 
     def return_value(self):
         """Returns the flag returned by command."""
+        if callable(self.__return_value):
+            return self.__return_value()
         return self.__return_value
 
+    def is_return_value_known(self):
+        """
+        Checks if the flag is known before the output is read,
+        the flag of the running process is known only after it.
+        """
+        return not callable(self.__return_value)
+
     def get_output(self):
         """Returns the output of command execution."""
         return self.__output.get_value()
 
+    def get_stream(self):
+        """Returns the Stream with the output of command execution."""
+        return self.__output
+
     def get_env(self):
         """Returns the changed (or not) environment."""
         return self.__env
@@ -60,6 +88,15 @@ class Command(metaclass=ABCMeta):
     def run(self, input, env):
         return NotImplemented
 
+    @staticmethod
+    def supports(args):
+        """
+        Checks if the command implements all options among the arguments,
+        otherwise the external program with the same name is run instead.
+        :param args: list of arguments.
+        """
+        return True
+
 
 class CommandPIPE(Command):
     """
@@ -76,29 +113,79 @@ class CommandPIPE(Command):
         self.__left_cmd = left
         self.__right_cmd = right
 
+    def stages(self):
+        """
+        Returns the list of commands of the whole pipe
+        from the left to the right.
+        Adjacent external commands are joined into one ExternalPipeline.
+        """
+        stages = []
+        for cmd in (self.__left_cmd, self.__right_cmd):
+            if isinstance(cmd, CommandPIPE):
+                for stage in cmd.stages():
+                    CommandPIPE.__add_stage(stages, stage)
+            else:
+                CommandPIPE.__add_stage(stages, cmd)
+        return stages
+
+    @staticmethod
+    def __add_stage(stages, command):
+        """
+        Appends the command to the list of stages.
+        Adjacent UnknownCommands are joined into one ExternalPipeline.
+        """
+        if stages and isinstance(command, (UnknownCommand, ExternalPipeline)) and \
+                isinstance(stages[-1], (UnknownCommand, ExternalPipeline)):
+            stages[-1] = ExternalPipeline(stages[-1].get_commands() + command.get_commands())
+        else:
+            stages.append(command)
+
+    @staticmethod
+    def connect(output):
+        """
+        Makes the input Stream for the right command from the output
+        Stream of the left one. The content is passed lazily
+        and the text always ends with the newline symbol,
+        the binary content is passed untouched.
+        Closing the new Stream closes the output of the left command.
+        :param output: the Stream instance with the left command results.
+        :return: the Stream instance for the right command.
+        """
+        if output.is_binary():
+            return output
+
+        def chunks():
+            last = ''
+            try:
+                for chunk in output:
+                    last = chunk
+                    yield chunk
+            finally:
+                output.close()
+            if not last.endswith(os.linesep):
+                yield os.linesep
+        return Stream(chunks())
+
     def run(self, input, env):
         """
         Takes the input Stream and the environment,
-        executes left command with them,
+        executes the leftmost command with them,
         takes its result Stream and new environment,
-        executes the right command with them
-        and return its result.
+        executes the next command with them and so on.
+        The results are passed between commands lazily,
+        so the next command starts before the previous one is finished.
         :param input: the Stream instance with previous results.
         :param env: the Environment instance with variables.
-        :return: the right command result (CommandResult instance).
+        :return: the rightmost command result (CommandResult instance).
         """
-        result_of_left = self.__left_cmd.run(input, env)
-
-        if result_of_left.return_value():
-            return result_of_left
-
-        changed_input = Stream()
-        output = result_of_left.get_output()
-        if output.endswith(os.linesep):
-            output = output[0:-len(os.linesep)]
-        changed_input.write_line(output)
-        changed_env = result_of_left.get_env()
-        return self.__right_cmd.run(changed_input, changed_env)
+        stages = self.stages()
+        result = stages[0].run(input, env)
+        for command in stages[1:]:
+            if result.is_return_value_known() and result.return_value():
+                return result
+            changed_input = CommandPIPE.connect(result.get_stream())
+            result = command.run(changed_input, result.get_env())
+        return result
 
 
 class CommandCAT(Command):
@@ -114,6 +201,10 @@ class CommandCAT(Command):
         """
         self.__args = args
 
+    def get_args(self):
+        """Returns the list of arguments."""
+        return self.__args
+
     def run(self, input, env):
         """
         Takes the input Stream and the environment, writes the content of files
@@ -123,27 +214,21 @@ class CommandCAT(Command):
         :return: the CommandResult instance with contents of arguments.
         """
         return_value = 0
-        self.__output = Stream()
-        num_of_args = len(self.__args)
+        files = []
+        error = None
+        for file in self.__args:
+            file_path = os.path.join(env.get_cwd(), file)
+            if not os.path.isfile(file_path):
+                error = 'cat: {}: No such file or directory.'.format(file)
+                return_value = 1
+                break
+            files.append(file_path)
 
-        if not num_of_args:
-            self.__output.write(input.get_value())
+        if not self.__args:
+            output = input
         else:
-            for file in self.__args:
-                file_path = os.path.join(env.get_cwd(), file)
-                if not os.path.isfile(file_path):
-                    self.__output.write_line('cat: {}: No such file or directory.'.
-                                             format(file))
-                    return_value = 1
-                    break
-                with open(file, 'r') as opened_file:
-                    text = opened_file.read()
-                    sep = '\n'
-                    if '\r\n' in text:
-                        sep = '\r\n'
-                    text = text.replace(sep, os.linesep)
-                    self.__output.write(text)
-        return CommandResult(self.__output, env, return_value)
+            output = Stream(FileSource(files, error, get_file_cache()), binary=True)
+        return CommandResult(output, env, return_value)
 
 
 class CommandPWD(Command):
@@ -223,28 +308,62 @@ class CommandECHO(Command):
 class CommandWC(Command):
     """
     The 'wc' prints newline, word, and byte counts for each file.
+    Available keys:
+    -l, --lines
+              Print only the newline counts.
     """
+    PARALLEL_SIZE = 64 * 1024 * 1024
+    LINES_KEYS = ('-l', '--lines')
+
     def set_args(self, args):
         """
         Takes and sets arguments if they are given.
         :param args: list of arguments.
         """
         self.__args = args
+        self.__input_files = None
+
+    def get_args(self):
+        """Returns the list of arguments."""
+        return self.__args
+
+    def set_input_files(self, files):
+        """
+        Makes the command count the given files as its input,
+        i.e. instead of the output of 'cat' with these files.
+        Counts are printed like counts of the input.
+        :param files: list of names of existing files.
+        """
+        self.__input_files = files
 
-    def __count_lines_words_bytes(self, input):
+    def get_input_files(self):
+        """Returns names of files counted as the input or None."""
+        return self.__input_files
+
+    def __count_files(self, files):
         """
-        Counts newlines, words and bytes for the input file.
-        :param input: the name of file (string).
-        :return: list with three counts.
+        Counts newlines, words and bytes for each file.
+        Counts of files from the file cache are taken from it, other files
+        are counted by the pool of processes if they are big enough.
+        :param files: list of paths to existing files.
+        :return: list of lists with three counts in the order of files.
         """
-        sep = '\n'
-        if '\r\n' in input:
-            sep = '\r\n'
-        lines = input.split(sep)
-        line_count = max(len(lines) - 1, 1)
-        word_count = len(input.split())
-        char_count = len(input.replace(os.linesep, '\n'))
-        return [line_count, word_count, char_count]
+        cache = get_file_cache()
+        counts = []
+        uncached = []
+        for file_path in files:
+            cached = cache.get(file_path)
+            counts.append(cached.counts() if cached is not None else None)
+            if cached is None:
+                uncached.append(file_path)
+        size = sum(os.path.getsize(file_path) for file_path in uncached)
+        if len(uncached) > 1 and size >= CommandWC.PARALLEL_SIZE:
+            results = get_process_pool().map(count_file, uncached)
+        else:
+            results = (count_file(file_path) for file_path in uncached)
+        results = iter(results)
+        return [file_counts if file_counts is not None else next(results)
+                for file_counts in counts]
 
     def run(self, input, env):
         """
@@ -258,42 +377,450 @@ class CommandWC(Command):
         self.__output = Stream()
         return_value = 0
         result = list()
+        lines_only = any(arg in CommandWC.LINES_KEYS for arg in self.__args)
+        args = [arg for arg in self.__args if arg not in CommandWC.LINES_KEYS]
 
-        if not self.__args:
-            result.append((' ',
-                           self.__count_lines_words_bytes(input.get_value())))
+        if not args and self.__input_files is not None:
+            files = [os.path.join(env.get_cwd(), file) for file in self.__input_files]
+            counts = [sum(file_counts) for file_counts in zip(*self.__count_files(files))]
+            result.append((' ', counts or [0, 0, 0]))
+        elif not args:
+            counts = count_chunks(input.bytes_chunks())
+            result.append((' ', counts))
         else:
-            for file in self.__args:
+            files = []
+            for file in args:
                 file_path = os.path.join(env.get_cwd(), file)
                 if not os.path.isfile(file_path):
                     self.__output.write_line("wc: {}: No such file or directory.".
                                              format(file))
                     return_value = 1
                     break
-                with open(file, 'r') as opened_file:
-                    text = opened_file.read()
-                    result.append((file, self.__count_lines_words_bytes(text)))
+                files.append(file_path)
+            if return_value == 0:
+                result = list(zip(args, self.__count_files(files)))
 
-        if return_value is 0:
+        if return_value == 0:
             total_lines = 0
             total_words = 0
             total_bytes = 0
             for (name, [line_count, word_count, byte_count]) in result:
+                line_count = max(line_count, 1)
                 total_bytes += byte_count
                 total_words += word_count
                 total_lines += line_count
-                if not len(self.__args) == 1:
-                    self.__output.write_line('{:4d} {:4d} {:4d}    {}'.
-                                             format(line_count, word_count, byte_count, name))
-                else:
-                    self.__output.write_line('{:4d} {:4d} {:4d}    {}'.
-                                             format(line_count, word_count, byte_count, name))
+                self.__write_counts(lines_only, line_count, word_count, byte_count, name)
 
-            if len(self.__args) > 1:
-                self.__output.write_line('{:4d} {:4d} {:4d}    {}'.
-                                         format(total_lines, total_words, total_bytes, 'total'))
+            if len(args) > 1:
+                self.__write_counts(lines_only, total_lines, total_words, total_bytes, 'total')
         return CommandResult(self.__output, env, return_value)
 
+    def __write_counts(self, lines_only, line_count, word_count, byte_count, name):
+        """Writes the line with counts of one file, only the newline count if lines_only."""
+        if lines_only:
+            self.__output.write_line('{:4d}    {}'.format(line_count, name))
+        else:
+            self.__output.write_line('{:4d} {:4d} {:4d}    {}'.
+                                     format(line_count, word_count, byte_count, name))
+
+
+def parse_count_args(name, args, default=10):
+    """
+    Parses arguments of 'head' and 'tail': -n NUM, -nNUM, --lines=NUM,
+    --lines NUM or -NUM and names of files.
+    :param name: the command name for error messages (string).
+    :param args: list of arguments.
+    :param default: the number of lines if it is not given (int).
+    :return: triple of the number of lines, the list of files
+    and the error message or None.
+    """
+    count = default
+    files = []
+    args = iter(args)
+    for arg in args:
+        value = None
+        if arg in ('-n', '--lines'):
+            value = next(args, '')
+        elif arg.startswith('--lines='):
+            value = arg[len('--lines='):]
+        elif arg.startswith('-n'):
+            value = arg[2:]
+        elif arg.startswith('-') and arg[1:].isdigit():
+            value = arg[1:]
+        elif arg.startswith('-') and arg != '-':
+            return count, files, '{}: unknown option {}.'.format(name, arg)
+        else:
+            files.append(arg)
+            continue
+        if not value.isdigit():
+            return count, files, '{}: invalid number of lines: \'{}\'.'.format(name, value)
+        count = int(value)
+    return count, files, None
+
+
+def _is_count_option(arg):
+    """Checks if the argument is an option of 'head' and 'tail' (see parse_count_args)."""
+    return arg in ('-n', '--lines') or arg.startswith(('-n', '--lines=')) or \
+        arg.startswith('-') and arg[1:].isdigit()
+
+
+def _supports_options(args, is_known, valued):
+    """
+    Checks that every option among arguments is implemented by the builtin command.
+    :param args: list of arguments.
+    :param is_known: the function checking if the option is implemented.
+    :param valued: tuple of options followed by their values.
+    :return: False if some option is unknown, True otherwise.
+    """
+    args = iter(args)
+    for arg in args:
+        if arg in valued:
+            next(args, None)
+        elif arg.startswith('-') and arg != '-' and not is_known(arg):
+            return False
+    return True
+
+
+class CommandHEAD(Command):
+    """
+    Prints the first lines of files or of the input.
+    Usage:
+    head [-n NUM] [FILE...]
+    Other options are left to the external 'head'.
+    Reading stops as soon as NUM lines are printed: the input Stream
+    is closed, so commands on the left from the pipe stop like on SIGPIPE.
+    Several files are printed with headers '==> FILE <=='.
+    """
+
+    def set_args(self, args):
+        """
+        Takes and sets arguments if they are given.
+        :param args: list of arguments.
+        """
+        self.__args = args
+
+    @staticmethod
+    def supports(args):
+        """Checks if all options set the number of lines, otherwise the external 'head' is run."""
+        return _supports_options(args, _is_count_option, ('-n', '--lines'))
+
+    def get_args(self):
+        """Returns the list of arguments."""
+        return self.__args
+
+    def run(self, input, env):
+        """
+        Takes the input Stream and the environment and prints the first lines.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :return: the CommandResult instance with the first lines.
+        """
+        count, files, paths, error = _check_count_args('head', self.__args, env)
+        if error is not None:
+            output = Stream()
+            output.write_line(error)
+            return CommandResult(output, env, 1)
+        if not files:
+            return CommandResult(Stream(CommandHEAD.__head_input(input, count),
+                                        input.is_binary()), env, 0)
+        return CommandResult(Stream(_by_files(files, paths,
+                                              lambda path: head_chunks(read_chunks(path), count)),
+                                    binary=True), env, 0)
+
+    @staticmethod
+    def __head_input(input, count):
+        """Yields the first lines of the input and closes it."""
+        try:
+            yield from head_chunks(input.chunks(), count)
+        finally:
+            input.close()
+
+
+class CommandTAIL(Command):
+    """
+    Prints the last lines of files or of the input.
+    Usage:
+    tail [-n NUM] [FILE...]
+    Other options (like -f) are left to the external 'tail'.
+    Files are read backwards from the end, so the time does not depend
+    on their size. The input is read till its end.
+    Several files are printed with headers '==> FILE <=='.
+    """
+
+    def set_args(self, args):
+        """
+        Takes and sets arguments if they are given.
+        :param args: list of arguments.
+        """
+        self.__args = args
+
+    @staticmethod
+    def supports(args):
+        """Checks if all options set the number of lines, otherwise the external 'tail' is run."""
+        return _supports_options(args, _is_count_option, ('-n', '--lines'))
+
+    def get_args(self):
+        """Returns the list of arguments."""
+        return self.__args
+
+    def run(self, input, env):
+        """
+        Takes the input Stream and the environment and prints the last lines.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :return: the CommandResult instance with the last lines.
+        """
+        count, files, paths, error = _check_count_args('tail', self.__args, env)
+        if error is not None:
+            output = Stream()
+            output.write_line(error)
+            return CommandResult(output, env, 1)
+        if not files:
+            return CommandResult(Stream(CommandTAIL.__tail_input(input, count),
+                                        input.is_binary()), env, 0)
+        return CommandResult(Stream(_by_files(files, paths,
+                                              lambda path: [tail_file(path, count)]),
+                                    binary=True), env, 0)
+
+    @staticmethod
+    def __tail_input(input, count):
+        """Yields the last lines of the input."""
+        lines = tail_chunks(input.chunks(), count)
+        if lines:
+            yield lines
+
+
+def _check_count_args(name, args, env):
+    """
+    Parses arguments of 'head' and 'tail' and checks that files exist.
+    :return: the number of lines, the list of names of files,
+    the list of paths to them and the error message or None.
+    """
+    count, files, error = parse_count_args(name, args)
+    if error is not None:
+        return count, files, [], error
+    paths, error = _check_files(name, files, env)
+    return count, files, paths, error
+
+
+def _by_files(names, paths, read):
+    """
+    Yields binary chunks of every file, with headers if there are several files.
+    :param names: list of names of files as they are given.
+    :param paths: list of paths to existing files.
+    :param read: the function taking the path and returning binary chunks.
+    """
+    for ix, (name, file_path) in enumerate(zip(names, paths)):
+        if len(paths) > 1:
+            yield '{}==> {} <=={}'.format(os.linesep if ix else '', name,
+                                          os.linesep).encode(ENCODING)
+        yield from read(file_path)
+
+
+class CommandSORT(Command):
+    """
+    Prints lines of files or of the input in the sorted order.
+    Available keys:
+    -n, --numeric-sort
+              Compare by the number at the beginning of the key.
+    -r, --reverse
+              Print lines in the descending order.
+    -k N[,M], --key=N[,M]
+              Compare by fields from N to M (or to the end of the line),
+              fields are separated by whitespaces.
+    Other options are left to the external 'sort'.
+
+    Lines over the memory budget are sorted by parts, which are kept
+    in temporary files and merged (see the sorting module).
+    """
+
+    def set_args(self, args):
+        """
+        Takes and sets arguments if they are given.
+        :param args: list of arguments.
+        """
+        self.__args = args
+
+    @staticmethod
+    def supports(args):
+        """Checks if all options are implemented, otherwise the external 'sort' is run."""
+        return _supports_options(args, CommandSORT.__is_option, ('-k', '--key'))
+
+    @staticmethod
+    def __is_option(arg):
+        """Checks if the argument is an implemented option."""
+        return arg in ('--numeric-sort', '--reverse') or arg.startswith(('-k', '--key=')) or \
+            set(arg[1:]) <= set('nr')
+
+    def get_args(self):
+        """Returns the list of arguments."""
+        return self.__args
+
+    def run(self, input, env):
+        """
+        Takes the input Stream and the environment and sorts lines.
+        Lines are read when the output is read.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :return: the CommandResult instance with sorted lines.
+        """
+        output = Stream()
+        numeric = False
+        reverse = False
+        start = end = None
+        files = []
+        args = iter(self.__args)
+        for arg in args:
+            if arg in ('-k', '--key'):
+                value = next(args, '')
+            elif arg.startswith('--key='):
+                value = arg[len('--key='):]
+            elif arg.startswith('-k'):
+                value = arg[2:]
+            elif arg in ('--numeric-sort', '--reverse'):
+                numeric = numeric or arg == '--numeric-sort'
+                reverse = reverse or arg == '--reverse'
+                continue
+            elif arg.startswith('-') and len(arg) > 1 and set(arg[1:]) <= set('nr'):
+                numeric = numeric or 'n' in arg
+                reverse = reverse or 'r' in arg
+                continue
+            elif arg.startswith('-') and arg != '-':
+                output.write_line('sort: unknown option {}.'.format(arg))
+                return CommandResult(output, env, 1)
+            else:
+                files.append(arg)
+                continue
+            fields = value.split(',')
+            if len(fields) > 2 or not all(field.isdigit() and int(field) > 0
+                                          for field in fields):
+                output.write_line('sort: invalid key \'{}\'.'.format(value))
+                return CommandResult(output, env, 1)
+            start = int(fields[0])
+            end = int(fields[1]) if len(fields) == 2 else None
+
+        paths, error = _check_files('sort', files, env)
+        if error is not None:
+            output.write_line(error)
+            return CommandResult(output, env, 1)
+        key = make_key(numeric, start, end)
+
+        def lines():
+            for line in sort_lines(_read_lines(input, paths), key, reverse):
+                yield line + os.linesep
+        return CommandResult(Stream(lines()), env, 0)
+
+
+class CommandUNIQ(Command):
+    """
+    Prints lines of the file or of the input without adjacent repeats.
+    Available keys:
+    -c, --count
+              Print the number of repeats before every line.
+    --top N
+              Print N most frequent lines of the whole input with their counts,
+              equal lines need not be adjacent. Lines are counted
+              by the hash aggregation with bounded memory (see the grouping module).
+    Other options are left to the external 'uniq'.
+    """
+
+    def set_args(self, args):
+        """
+        Takes and sets arguments if they are given.
+        :param args: list of arguments.
+        """
+        self.__args = args
+
+    @staticmethod
+    def supports(args):
+        """Checks if all options are implemented, otherwise the external 'uniq' is run."""
+        return _supports_options(args, lambda arg: arg in ('-c', '--count') or
+                                 arg.startswith('--top='), ('--top',))
+
+    def get_args(self):
+        """Returns the list of arguments."""
+        return self.__args
+
+    def run(self, input, env):
+        """
+        Takes the input Stream and the environment and removes repeated lines.
+        Lines are read when the output is read.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :return: the CommandResult instance with unique lines.
+        """
+        output = Stream()
+        count = False
+        top = None
+        files = []
+        args = iter(self.__args)
+        for arg in args:
+            if arg in ('-c', '--count'):
+                count = True
+            elif arg == '--top' or arg.startswith('--top='):
+                value = next(args, '') if arg == '--top' else arg[len('--top='):]
+                if not value.isdigit():
+                    output.write_line('uniq: invalid number of lines: \'{}\'.'.format(value))
+                    return CommandResult(output, env, 1)
+                top = int(value)
+            elif arg.startswith('-') and arg != '-':
+                output.write_line('uniq: unknown option {}.'.format(arg))
+                return CommandResult(output, env, 1)
+            else:
+                files.append(arg)
+        if len(files) > 1:
+            output.write_line('uniq: extra operand {}.'.format(files[1]))
+            return CommandResult(output, env, 1)
+        paths, error = _check_files('uniq', files, env)
+        if error is not None:
+            output.write_line(error)
+            return CommandResult(output, env, 1)
+
+        def lines():
+            if top is not None:
+                groups = top_lines(_read_lines(input, paths), top)
+            else:
+                groups = unique_lines(_read_lines(input, paths))
+            for line, repeats in groups:
+                if count or top is not None:
+                    yield '{:7d} {}{}'.format(repeats, line, os.linesep)
+                else:
+                    yield line + os.linesep
+        return CommandResult(Stream(lines()), env, 0)
+
+
+def _check_files(name, files, env):
+    """
+    Checks that files exist.
+    :return: pair of the list of paths to files and the error message or None.
+    """
+    paths = []
+    for file in files:
+        file_path = os.path.join(env.get_cwd(), file)
+        if not os.path.isfile(file_path):
+            return paths, '{}: {}: No such file or directory.'.format(name, file)
+        paths.append(file_path)
+    return paths, None
+
+
+def _read_lines(input, paths):
+    """
+    Yields lines of files or, if there are no files, of the input
+    without newline symbols.
+    """
+    if paths:
+        lines = (line for file_path in paths for line in _file_lines(file_path))
+    else:
+        lines = input.lines()
+    for line in lines:
+        yield line[:-1] if line.endswith('\n') else line
+
+
+def _file_lines(file_path):
+    """Yields lines of the text file."""
+    with open(file_path, 'r', errors='replace') as opened_file:
+        yield from opened_file
+
 
 class UnknownCommand(Command):
     """
@@ -310,6 +837,16 @@ class UnknownCommand(Command):
         self.__command = cmd
         self.__args = args
 
+    def get_commands(self):
+        """Returns the list of external commands, i.e. this command only."""
+        return [self]
+
+    def get_args_list(self):
+        """Returns the command name and its arguments as one list."""
+        args_list = [self.__command]
+        args_list.extend(self.__args)
+        return args_list
+
     def run(self, input, env):
         """
         Takes the input Stream and the environment and
@@ -318,23 +855,116 @@ class UnknownCommand(Command):
         :param env: the Environment instance with variables.
         :return: the CommandResult instance with results of the called process.
         """
-        self.__output = Stream()
-        args_list = [self.__command]
-        args_list.extend(self.__args)
+        return ExternalPipeline([self]).run(input, env)
+
+
+class ExternalPipeline(Command):
+    """
+    The chain of UnknownCommands connected by pipes.
+    The processes are connected by the pipes of the operating system,
+    so the data passed between them never comes into the CLI,
+    only the output of the last process is read back while it is produced.
+    """
+
+    def __init__(self, commands):
+        """
+        Takes the commands of the chain.
+        :param commands: list of UnknownCommands from the left to the right.
+        """
+        self.__commands = commands
+
+    def get_commands(self):
+        """Returns the list of external commands of the chain."""
+        return list(self.__commands)
+
+    def run(self, input, env):
+        """
+        Takes the input Stream and the environment, starts all processes
+        and passes the input Stream to the first of them.
+        Names of commands are resolved and processes are started
+        by the spawner from the spawner module. The output is read
+        from the pipe of the last process lazily (see PipeSource),
+        so it is passed on at once and never kept whole.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :return: the CommandResult instance with results of the last process.
+        Asking the return value before the output is read moves the rest
+        of the output to the SpillBuffer, so the processes can finish.
+        """
+        output = Stream()
+        has_input = not input.is_empty()
+        spawner = get_spawner()
+        processes = []
+        stdin_writer = None
+        if has_input:
+            stdin, input_fd = os.pipe()
+            stdin_writer = open(input_fd, 'wb')
+        else:
+            stdin = os.open(os.devnull, os.O_RDONLY)
+        for command in self.__commands:
+            args_list = command.get_args_list()
+            path = resolve(args_list[0])
+            process = None
+            if path is not None:
+                read_fd, write_fd = os.pipe()
+                try:
+                    process = spawner.spawn(path, args_list, stdin, write_fd, env.get_cwd())
+                except OSError:
+                    forget(args_list[0])
+                    os.close(read_fd)
+                finally:
+                    os.close(write_fd)
+            os.close(stdin)
+            if process is None:
+                ExternalPipeline.__stop(processes, stdin_writer)
+                output.write_line('Command {}: command not found.'.
+                                  format(args_list[0]))
+                return CommandResult(output, env, 1)
+            processes.append(process)
+            stdin = read_fd
 
+        writer = None
+        if stdin_writer is not None:
+            writer = threading.Thread(target=ExternalPipeline.__write_input,
+                                      args=(input, stdin_writer), daemon=True)
+            writer.start()
+        source = PipeSource(stdin)
+
+        def return_value():
+            source.drain()
+            for process in processes:
+                process.wait()
+            if writer is not None:
+                writer.join()
+            return processes[-1].returncode
+        return CommandResult(Stream(source, binary=True), env, return_value)
+
+    @staticmethod
+    def __write_input(input, stdin):
+        """
+        Writes the input Stream to the standard input of the first process,
+        the binary content is written as it is.
+        Stops if the process does not read its input any more.
+        """
         try:
-            process = subprocess.run(args_list,
-                                     input=input.get_value(),
-                                     stdout=subprocess.PIPE,
-                                     encoding=sys.stdout.encoding)
-            return_value = process.returncode
-            self.__output.write(str(process.stdout))
-        except Exception as err:
-            self.__output.write_line('Command {}: command not found.'.
-                                     format(self.__command))
-            return_value = 1
+            for chunk in input.bytes_chunks():
+                stdin.write(chunk)
+        except BrokenPipeError:
+            pass
+        finally:
+            try:
+                stdin.close()
+            except BrokenPipeError:
+                pass
 
-        return CommandResult(self.__output, env, return_value)
+    @staticmethod
+    def __stop(processes, stdin_writer):
+        """Kills already started processes of the chain."""
+        if stdin_writer is not None:
+            stdin_writer.close()
+        for process in processes:
+            process.kill()
+            process.wait()
 
 
 class CommandASSIGNMENT(Command):
@@ -376,7 +1006,24 @@ class CommandGREP(Command):
               words.
     -A NUM, --after-context=NUM
               Print  NUM  lines  of  trailing  context  after  matching lines.
+    -c, --count
+              Print only the number of matching lines of all files
+              or of the input, lines are not highlighted.
+    -r, --recursive
+              Read all files under each directory, recursively.
+              Binary files are skipped, every found line is printed
+              with the file name.
+    --sorted
+              Print results of the recursive search in the order of file names,
+              otherwise results of each file are printed as soon as it is searched.
+
+    The input is searched only if no files are given, otherwise it is closed.
+    Files bigger than PARALLEL_SIZE bytes are searched by the pool of processes.
+    If the current directory has the trigram index (see CommandINDEX),
+    indexed files without literal parts of the pattern are skipped.
     """
+    PARALLEL_SIZE = 64 * 1024 * 1024
+
     def set_args(self, args):
         """
         Takes and sets arguments if they are given.
@@ -384,6 +1031,10 @@ class CommandGREP(Command):
         """
         self.__args = args
 
+    def get_args(self):
+        """Returns the list of arguments."""
+        return self.__args
+
     def run(self, input, env):
         """
         Takes the input Stream and the environment.
@@ -394,13 +1045,13 @@ class CommandGREP(Command):
         """
         self.__output = Stream()
         return_value = 0
-        if (not input.get_value() and len(self.__args) <= 1) or (input.get_value() and len(self.__args) < 1):
+        has_input = not input.is_empty()
+        if (not has_input and len(self.__args) <= 1) or (has_input and len(self.__args) < 1):
             self.__output.write_line('Wrong number of arguments for grep command.')
             return CommandResult(self.__output, env, 1)
-        as_str = ' '.join(self.__args)
-        if re.search('-.*A', as_str)and not re.search('-.*A\s*[0-9]{1,}', as_str):
-                self.__output.write_line('The NUM argument is required.')
-                return CommandResult(self.__output, env, 1)
+        if CommandGREP.__missing_num(self.__args):
+            self.__output.write_line('The NUM argument is required.')
+            return CommandResult(self.__output, env, 1)
         parser = argparse.ArgumentParser()
         parser.add_argument('-i', '--ignore-case', action='store_true',
                             help='Ignore case distinctions, so that characters'
@@ -410,10 +1061,15 @@ class CommandGREP(Command):
                                  'matches that form whole words.')
         parser.add_argument('-A', '--after-context', metavar='NUM', type=int,
                             help='Increase output verbosity.')
+        parser.add_argument('-c', '--count', action='store_true',
+                            help='Print only the number of matching lines.')
+        parser.add_argument('-r', '--recursive', action='store_true',
+                            help='Read all files under each directory, recursively.')
+        parser.add_argument('--sorted', action='store_true',
+                            help='Print results of the recursive search '
+                                 'in the order of file names.')
         parser.add_argument('pattern', type=str, metavar='PATTERN')
-        if not input.get_value():
-            parser.add_argument('file', metavar='FILE',
-                                type=str, nargs='+')
+        parser.add_argument('file', metavar='FILE', type=str, nargs='*')
         try:
             args = parser.parse_args(self.__args)
         except argparse.ArgumentError as ae:
@@ -431,91 +1087,871 @@ class CommandGREP(Command):
 
         if return_value != 0:
             return CommandResult(self.__output, env, return_value)
-        self.__args = args
-        pattern = args.pattern
-        if args.word_regexp:
-            pattern = '{} '.format(pattern)
-        if args.ignore_case:
-            self.__pattern = re.compile(pattern, re.IGNORECASE)
-        else:
-            self.__pattern = re.compile(pattern)
-        if not input.get_value():
+        try:
+            matcher = Matcher(args.pattern, args.ignore_case, args.word_regexp)
+        except re.error as err:
+            self.__output.write_line('grep: invalid pattern: {}.'.format(err))
+            return CommandResult(self.__output, env, 1)
+        if args.count and args.recursive:
+            self.__output.write_line('grep: -c cannot be used with -r.')
+            return CommandResult(self.__output, env, 1)
+        if args.recursive and not args.file:
+            args.file = ['.']
+        if not has_input or args.file:
+            input.close()
             if not args.file:
                 self.__output.write_line('grep: no argument FILE.')
                 return CommandResult(self.__output, env, 1)
+            files = []
+            error = None
             for file in args.file:
                 file_path = os.path.join(env.get_cwd(), file)
-                if not os.path.isfile(file_path):
-                    self.__output.write_line('grep: {}: No such file or directory.'.
-                                             format(file))
+                if not os.path.isfile(file_path) and \
+                        not (args.recursive and os.path.isdir(file_path)):
+                    error = 'grep: {}: No such file or directory.'.format(file)
+                    return_value = 1
+                    break
+                files.append(file_path if not args.recursive else file)
+            may_match = CommandGREP.__get_filter(matcher, env)
+            if args.count:
+                source = CommandGREP.__count(CommandGREP.__count_files(matcher, files, may_match),
+                                             error)
+            elif args.recursive:
+                source = CommandGREP.__grep_tree(matcher, files, error, args.after_context,
+                                                 args.sorted, may_match)
+            else:
+                source = CommandGREP.__grep_files(matcher, files, error, args.after_context,
+                                                  may_match)
+        elif args.count:
+            source = CommandGREP.__count((count_lines(matcher, lines)
+                                          for lines in (input.lines(),)), None)
+        else:
+            source = grep_lines(matcher, input.lines(), args.after_context)
+        return CommandResult(Stream(source), env, return_value)
+
+    @staticmethod
+    def __missing_num(args):
+        """
+        Checks if the -A key is given without the NUM argument.
+        :param args: list of arguments.
+        :return: True if the NUM argument is missing.
+        """
+        for ix, arg in enumerate(args):
+            if arg.startswith('--'):
+                value = None
+                if arg == '--after-context':
+                    value = args[ix + 1] if ix + 1 < len(args) else ''
+                elif arg.startswith('--after-context='):
+                    value = arg[len('--after-context='):]
+            elif arg.startswith('-') and 'A' in arg:
+                value = arg[arg.index('A') + 1:]
+                if not value:
+                    value = args[ix + 1] if ix + 1 < len(args) else ''
+            else:
+                continue
+            if value is not None and not value.isdigit():
+                return True
+        return False
+
+    @staticmethod
+    def __get_filter(matcher, env):
+        """
+        Makes the function checking files by the trigram index of the current directory.
+        :param matcher: the Matcher instance.
+        :param env: the Environment instance with the current directory.
+        :return: the function taking the file path or None if there is no index
+        or the pattern has no literal parts.
+        """
+        index = get_index(env.get_cwd())
+        if index is None:
+            return None
+        trigrams = required_trigrams(matcher.pattern(), matcher.flags())
+        if not trigrams:
+            return None
+        return lambda file_path: index.may_match(file_path, trigrams)
+
+    @staticmethod
+    def __grep_tree(matcher, paths, error, after_context, ordered, may_match):
+        """
+        Yields the result of search in all files of the given directory trees,
+        files of the trigram index are skipped.
+        :param matcher: the Matcher instance.
+        :param paths: list of paths to existing files or directories.
+        :param error: the error message printed after results or None.
+        :param after_context: number of lines printed after the matching line or None.
+        :param ordered: print results in the order of file names (bool).
+        :param may_match: the function filtering files by the index or None.
+        """
+        yield from grep_tree(matcher, paths, after_context, get_process_pool(), ordered,
+                             may_match, skipped=(INDEX_NAME,))
+        if error is not None:
+            yield error + os.linesep
+
+    @staticmethod
+    def __grep_files(matcher, files, error, after_context, may_match):
+        """
+        Yields the result of search in the given files.
+        :param matcher: the Matcher instance.
+        :param files: list of paths to existing files.
+        :param error: the error message printed after results or None.
+        :param after_context: number of lines printed after the matching line or None.
+        :param may_match: the function filtering files by the index or None.
+        """
+        for file_path in files:
+            if may_match is not None and not may_match(file_path):
+                continue
+            if os.path.getsize(file_path) >= CommandGREP.PARALLEL_SIZE:
+                yield from grep_mapped_file(matcher, file_path, after_context,
+                                            get_process_pool())
+                continue
+            cached = get_file_cache().get(file_path)
+            if cached is not None:
+                yield from grep_text(matcher, cached, after_context)
+                continue
+            with open(file_path, 'r', errors='replace') as opened_file:
+                yield from grep_lines(matcher, opened_file, after_context)
+        if error is not None:
+            yield error + os.linesep
+
+    @staticmethod
+    def __count(counts, error):
+        """
+        Yields the total number of matching lines and then the error message.
+        :param counts: iterable with numbers of matching lines, counted lazily.
+        :param error: the error message printed after the number or None.
+        """
+        yield '{}{}'.format(sum(counts), os.linesep)
+        if error is not None:
+            yield error + os.linesep
+
+    @staticmethod
+    def __count_files(matcher, files, may_match):
+        """
+        Yields numbers of matching lines of the given files.
+        :param matcher: the Matcher instance.
+        :param files: list of paths to existing files.
+        :param may_match: the function filtering files by the index or None.
+        """
+        for file_path in files:
+            if may_match is not None and not may_match(file_path):
+                continue
+            if os.path.getsize(file_path) >= CommandGREP.PARALLEL_SIZE:
+                yield count_mapped_file(matcher, file_path, get_process_pool())
+                continue
+            cached = get_file_cache().get(file_path)
+            if cached is not None:
+                yield count_lines(matcher, cached.lines())
+                continue
+            with open(file_path, 'r', errors='replace') as opened_file:
+                yield count_lines(matcher, opened_file)
+
+
+class CommandINDEX(Command):
+    """
+    Manages the trigram index of the current directory used by 'grep'.
+    Usage:
+    index build [PATH...]
+              Adds files and directory trees to the index (the current directory
+              by default), only new and changed files are read.
+    index refresh
+              Reads changed and new files under indexed paths again
+              and forgets removed files.
+    index stats
+              Prints numbers of indexed paths, files, stale files and trigrams
+              and the size of the index.
+    """
+
+    def set_args(self, args):
+        """
+        Takes and sets arguments if they are given.
+        :param args: list of arguments.
+        """
+        self.__args = args
+
+    def run(self, input, env):
+        """
+        Takes the input Stream and the environment, runs the action of the index.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :return: the CommandResult instance with the report of the action.
+        """
+        self.__output = Stream()
+        if not self.__args:
+            self.__output.write_line('index: no action, use build, refresh or stats.')
+            return CommandResult(self.__output, env, 1)
+        action, paths = self.__args[0], self.__args[1:]
+        index = TrigramIndex.load(os.path.join(env.get_cwd(), INDEX_NAME))
+        if action == 'build':
+            paths = [os.path.join(env.get_cwd(), path) for path in paths or ['.']]
+            for path, name in zip(paths, self.__args[1:]):
+                if not os.path.exists(path):
+                    self.__output.write_line('index: {}: No such file or directory.'.
+                                             format(name))
                     return CommandResult(self.__output, env, 1)
+            read = index.build(paths, get_process_pool())
+            index.save()
+            self.__output.write_line('Indexed {} files.'.format(read))
+        elif action == 'refresh' and not paths:
+            read, removed = index.refresh(get_process_pool())
+            index.save()
+            self.__output.write_line('Indexed {} files, removed {} files.'.
+                                     format(read, removed))
+        elif action == 'stats' and not paths:
+            stats = index.stats()
+            for name in ['roots', 'files', 'stale', 'trigrams', 'size']:
+                self.__output.write_line('{:>8}: {}'.format(name, stats[name]))
+        else:
+            self.__output.write_line('index: wrong arguments {}.'.
+                                     format(' '.join(self.__args)))
+            return CommandResult(self.__output, env, 1)
+        return CommandResult(self.__output, env, 0)
+
 
-                with open(file, 'r') as f:
-                    self.__result = ''
-                    self.__i = 0
-                    sep = '\n'
-                    text = f.read()
-                    if '\r\n' in text:
-                        sep = '\r\n'
-                    lines = text.split(sep)
-                    self.__lines_after = None
-                    for line in lines:
-                        if line and not line.endswith(os.linesep):
-                            line = line + os.linesep
-                        self.process_string(line, len(lines))
+class CommandFILECACHE(Command):
+    """
+    Shows statistics of the file cache shared by 'cat', 'wc' and 'grep'
+    or removes all files from it.
+    Usage:
+    filecache [stats]
+    filecache flush
+    """
+
+    def set_args(self, args):
+        """
+        Takes and sets arguments if they are given.
+        :param args: list of arguments.
+        """
+        self.__args = args
 
+    def run(self, input, env):
+        """
+        Takes the input Stream and the environment, runs the action of the cache.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :return: the CommandResult instance with statistics of the cache.
+        """
+        self.__output = Stream()
+        cache = get_file_cache()
+        if self.__args in ([], ['stats']):
+            stats = cache.stats()
+            for name in ['files', 'size', 'max size', 'hits', 'misses', 'evictions']:
+                self.__output.write_line('{:>9}: {}'.format(name, stats[name]))
+        elif self.__args == ['flush']:
+            cache.flush()
         else:
-            lines = input.get_value()
-            sep = '\n'
-            if '\r\n' in lines:
-                sep = '\r\n'
-            lines = lines.split(sep)
-            self.__result = ''
-            self.__i = 0
-            self.__lines_after = None
-            for line in lines:
-                if line and not line.endswith(os.linesep):
-                    line = line + os.linesep
-                self.process_string(line, len(lines))
-        return CommandResult(self.__output, env, return_value)
+            self.__output.write_line('filecache: wrong arguments {}.'.
+                                     format(' '.join(self.__args)))
+            return CommandResult(self.__output, env, 1)
+        return CommandResult(self.__output, env, 0)
+
 
-    def process_string(self, line, length_lines):
+class CommandBACKGROUND(Command):
+    """
+    The command tree of the line ending with '&'.
+    The CLI runs the inner command as the background job.
+    """
+
+    def __init__(self, command):
         """
-        Searches the pattern the given string.
-        :param line: the string where pattern is searching.
-        :param length_lines: length of all lines to check if the given is the last.
+        :param command: the root of the Command tree run in the background.
         """
-        self.__i += 1
-        result_line = ''
-        self.__ix = 0
-        while True:
-            string = line[self.__ix:]
-            matched = self.__pattern.search(string)
-            if not matched:
-                break
+        self.__command = command
+
+    def get_command(self):
+        """Returns the Command run in the background."""
+        return self.__command
+
+    def run(self, input, env):
+        """
+        Runs the inner command right away, when the tree is executed
+        without the CLI starting jobs.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :return: the CommandResult instance of the inner command.
+        """
+        return self.__command.run(input, env)
+
+
+class ListOutput:
+    """
+    The output of the list of commands: outputs of its commands one after another.
+    The next Stream is taken from the iterator when the previous one is read
+    till the end, so the next command of the list runs after the previous one.
+    Outputs can be text or binary: the list is read as bytes, as text
+    by 'text_chunks', and every Stream writes itself to the file.
+    """
+
+    def __init__(self, streams):
+        """
+        :param streams: the generator of Streams with outputs of commands.
+        """
+        self.__streams = streams
+        self.__current = None
+
+    def __iter__(self):
+        """Yields outputs of commands as bytes."""
+        for stream in self.__next():
+            yield from stream.bytes_chunks()
+
+    def text_chunks(self):
+        """Yields outputs of commands as strings."""
+        for stream in self.__next():
+            yield from stream
+
+    def write_to(self, out):
+        """Writes outputs of commands to the given text file."""
+        for stream in self.__next():
+            stream.write_to(out)
+
+    def close(self):
+        """Closes the output of the current command, the rest of the list is not run."""
+        if self.__current is not None:
+            self.__current.close()
+        self.__streams.close()
+
+    def __next(self):
+        """Yields Streams remembering the one being read."""
+        for stream in self.__streams:
+            self.__current = stream
+            yield stream
+        self.__current = None
+
+
+class CommandLIST(Command):
+    """
+    The common class of commands joining two command trees by the operator
+    ';', '&&', '||' or '&'. The right command runs after the left one
+    is finished, when its output is read till the end, and only if
+    the return value of the left one allows it.
+    The output of the list is outputs of its commands one after another,
+    the return value is the one of the last run command.
+    """
+    OPERATOR = None
+
+    def __init__(self, left, right):
+        """
+        :param left: some Command located to the left from the operator.
+        :param right: some Command located to the right from the operator.
+        """
+        self.__left = left
+        self.__right = right
+
+    def get_left(self):
+        """Returns the Command on the left from the operator."""
+        return self.__left
+
+    def get_right(self):
+        """Returns the Command on the right from the operator."""
+        return self.__right
+
+    def items(self):
+        """
+        Returns the list of commands joined by the same operator
+        from the left to the right.
+        """
+        items = []
+        for cmd in (self.__left, self.__right):
+            if type(cmd) is type(self):
+                items.extend(cmd.items())
             else:
-                self.__lines_after = self.__args.after_context
-                self.__ix += matched.end()
-                if self.__args.word_regexp:
-                    self.__ix -= 1
-                result_line += string[:matched.start()]
-                finded = matched.group()
-                if self.__args.word_regexp:
-                    finded = finded[:-1]
-                    if not line[matched.start() - 1].isspace():
-                        self.__result += finded
-                        continue
-                result_line += '\x1b[1;31m{}\x1b[0m'.format(finded)
-        if result_line:
-            result_line += line[self.__ix:]
-            self.__result += result_line
-            if self.__lines_after:
-                self.__lines_after = self.__args.after_context
+                items.append(cmd)
+        return items
+
+    def runs_right(self, return_value):
+        """
+        Checks if the right command runs after the left one.
+        :param return_value: the return value of the left command (int).
+        """
+        return True
+
+    def run(self, input, env, runner=None):
+        """
+        Takes the input Stream and the environment and runs the left command,
+        the right one is run when the output of the left one is read.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :param runner: the function taking the command, the input and
+        the environment and running the command, i.e. by the PipelineExecutor,
+        or None to run commands by themselves.
+        :return: the CommandResult instance with outputs of commands,
+        its return value is known when the output is read till the end.
+        """
+        last = None
+
+        def streams():
+            nonlocal last
+            last = run_command(self.__left, input, env, runner)
+            yield last.get_stream()
+            if self.runs_right(last.return_value()):
+                last = run_command(self.__right, Stream(), last.get_env(), runner)
+                yield last.get_stream()
+        return CommandResult(Stream(ListOutput(streams()), True), env,
+                             lambda: last.return_value() if last is not None else 0)
+
+
+class CommandSEQUENCE(CommandLIST):
+    """
+    Runs commands one after another.
+    Usage:
+    COMMAND ; COMMAND
+    """
+    OPERATOR = ';'
+
+
+class CommandAND(CommandLIST):
+    """
+    Runs the right command if the left one succeeded.
+    Usage:
+    COMMAND && COMMAND
+    """
+    OPERATOR = '&&'
+
+    def runs_right(self, return_value):
+        """Checks if the left command succeeded."""
+        return return_value == 0
+
+
+class CommandOR(CommandLIST):
+    """
+    Runs the right command if the left one failed.
+    Usage:
+    COMMAND || COMMAND
+    """
+    OPERATOR = '||'
+
+    def runs_right(self, return_value):
+        """Checks if the left command failed."""
+        return return_value != 0
+
+
+class CommandPARALLEL(CommandLIST):
+    """
+    Runs commands at the same time and finishes when all of them are done.
+    Every command runs in its own thread with the copy of the environment,
+    like the background job, so variables assigned by it are forgotten.
+    The output of the first command is passed as it is produced,
+    outputs of the others are kept by SpillBuffers till their turn,
+    so the output is the same as the commands would run one after another.
+    The return value is the return value of the last command,
+    the others are like background jobs.
+    Usage:
+    COMMAND & COMMAND
+    """
+    OPERATOR = '&'
+
+    def run(self, input, env, runner=None):
+        """
+        Takes the input Stream and the environment and starts all commands
+        joined by '&', the first one gets the input.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :param runner: the function running the command (see CommandLIST.run)
+        or None to run commands by themselves.
+        :return: the CommandResult instance with outputs of commands,
+        its return value is known when the output is read till the end.
+        """
+        items = self.items()
+        cancelled = threading.Event()
+        pool = ThreadPoolExecutor(len(items) - 1)
+        futures = [pool.submit(CommandPARALLEL.__collect, item, env.copy(), runner, cancelled)
+                   for item in items[1:]]
+        pool.shutdown(wait=False)
+
+        def streams():
+            try:
+                yield run_command(items[0], input, env.copy(), runner).get_stream()
+                for future in futures:
+                    buffer, _ = future.result()
+                    yield Stream(buffer.chunks(), buffer.is_binary())
+            finally:
+                cancelled.set()
+                for future in futures:
+                    future.add_done_callback(CommandPARALLEL.__release)
+        return CommandResult(Stream(ListOutput(streams()), True), env,
+                             lambda: futures[-1].result()[1])
+
+    @staticmethod
+    def __collect(command, env, runner, cancelled):
+        """
+        Runs the command and reads its whole output till the end
+        or till the output of the list is closed.
+        :return: pair of the SpillBuffer with the output and the return value.
+        """
+        result = run_command(command, Stream(), env, runner)
+        stream = result.get_stream()
+        buffer = SpillBuffer(stream.is_binary())
+        try:
+            for chunk in stream.chunks():
+                if cancelled.is_set():
+                    break
+                buffer.write(chunk)
+        finally:
+            stream.close()
+        return buffer, result.return_value()
+
+    @staticmethod
+    def __release(future):
+        """Removes the output kept for the command when it is not needed any more."""
+        if not future.cancelled() and future.exception() is None:
+            future.result()[0].close()
+
+
+class CommandDEFERRED(Command):
+    """
+    The part of the line that is parsed only when it runs,
+    so the variables assigned by commands before it in the line
+    are substituted with their new values.
+    """
+
+    def __init__(self, build, text):
+        """
+        :param build: the function taking the Environment instance
+        and returning the Command tree of the part of the line.
+        :param text: the part of the line as it is written (string).
+        """
+        self.__build = build
+        self.__text = text
+
+    def build(self, env):
+        """
+        Parses the part of the line with the current values of variables.
+        :param env: the Environment instance with variables.
+        :return: the root of the Command tree.
+        """
+        return self.__build(env)
+
+    def get_text(self):
+        """Returns the part of the line as it is written."""
+        return self.__text
+
+    def run(self, input, env, runner=None):
+        """
+        Takes the input Stream and the environment, builds the Command tree
+        and runs it.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :param runner: the function running the command (see CommandLIST.run)
+        or None to run the command by itself.
+        :return: the CommandResult instance of the built command.
+        """
+        return run_command(self.__build(env), input, env, runner)
+
+
+def run_command(command, input, env, runner=None):
+    """
+    Runs the command by the runner if it is given, by itself otherwise.
+    :param runner: the function taking the command, the input and
+    the environment, i.e. running the command by the PipelineExecutor.
+    :return: the CommandResult instance.
+    """
+    if runner is None:
+        return command.run(input, env)
+    return runner(command, input, env)
+
+
+class CommandJOBS(Command):
+    """
+    Prints the table of background jobs.
+    Usage:
+    jobs
+    """
+
+    def set_args(self, args):
+        """
+        Takes and sets arguments if they are given.
+        :param args: list of arguments.
+        """
+        self.__args = args
+
+    def run(self, input, env):
+        """
+        Takes the input Stream and the environment,
+        prints the number, the state and the line of every job.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :return: the CommandResult instance with the table of jobs.
+        """
+        self.__output = Stream()
+        for job in get_job_manager().jobs():
+            self.__output.write_line('[{}]  {:<10}{}'.format(job.number(), job.state(), job.line()))
+        return CommandResult(self.__output, env, 0)
+
+
+class CommandWAIT(Command):
+    """
+    Waits for background jobs to finish, their output
+    is printed by the CLI as usual.
+    Usage:
+    wait [JOB...]
+    """
+
+    def set_args(self, args):
+        """
+        Takes and sets arguments if they are given.
+        :param args: list of job numbers.
+        """
+        self.__args = args
+
+    def run(self, input, env):
+        """
+        Takes the input Stream and the environment, waits for the given jobs
+        or for all jobs if no one is given.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :return: the CommandResult instance with the return value of the last job.
+        """
+        self.__output = Stream()
+        manager = get_job_manager()
+        jobs = [manager.find(arg) for arg in self.__args]
+        if None in jobs:
+            self.__output.write_line('wait: no such job {}.'.
+                                     format(self.__args[jobs.index(None)]))
+            return CommandResult(self.__output, env, 1)
+        return_value = 0
+        for job in jobs or manager.jobs():
+            return_value = job.wait()
+        return CommandResult(self.__output, env, return_value)
+
+
+class CommandFG(Command):
+    """
+    Waits for the background job and prints its output
+    instead of the CLI.
+    Usage:
+    fg [JOB]
+    """
+
+    def set_args(self, args):
+        """
+        Takes and sets arguments if they are given.
+        :param args: list with the job number.
+        """
+        self.__args = args
+
+    def run(self, input, env):
+        """
+        Takes the input Stream and the environment, waits for the given job
+        or the last started one and removes it from the table of jobs.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :return: the CommandResult instance with the output of the job.
+        """
+        self.__output = Stream()
+        if len(self.__args) > 1:
+            self.__output.write_line('fg: too many arguments.')
+            return CommandResult(self.__output, env, 1)
+        manager = get_job_manager()
+        job = manager.find(self.__args[0]) if self.__args else manager.get()
+        if job is None:
+            self.__output.write_line('fg: no such job {}.'.format(self.__args[0])
+                                     if self.__args else 'fg: no current job.')
+            return CommandResult(self.__output, env, 1)
+        return_value = job.wait()
+        manager.remove(job)
+        return CommandResult(job.output(), env, return_value)
+
+
+class CommandTIME(Command):
+    """
+    Runs the command and prints the wall, user and system time
+    it took after its output, like 'time' of the shell.
+    User and system times are taken for the whole CLI process
+    and its finished child processes.
+    Usage:
+    time COMMAND [| COMMAND...]
+    """
+
+    def __init__(self, command):
+        """
+        :param command: the root of the Command tree to measure.
+        """
+        self.__command = command
+
+    def get_command(self):
+        """Returns the measured Command."""
+        return self.__command
+
+    def run(self, input, env, runner=None):
+        """
+        Takes the input Stream and the environment and runs the command.
+        Times are printed when its output is read till the end
+        and its processes are finished.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :param runner: the function taking the command, the input and
+        the environment and running the command, i.e. by the PipelineExecutor,
+        or None to run the command by itself.
+        :return: the CommandResult instance of the command with times after its output.
+        """
+        start = time.perf_counter()
+        start_times = os.times()
+        if runner is None:
+            result = self.__command.run(input, env)
         else:
-            if self.__lines_after and self.__lines_after > 0:
-                self.__lines_after -= 1
-                self.__result += line
-                if self.__lines_after == 0 and (self.__i < length_lines and not self.__i == length_lines - 1):
-                    self.__result += '\x1b[0;34m---\x1b[0m' + os.linesep
-        self.__output.write(self.__result)
-        self.__result = ''
+            result = runner(self.__command, input, env)
+
+        stream = result.get_stream()
+
+        def chunks():
+            yield from stream.chunks()
+            result.return_value()
+            wall = time.perf_counter() - start
+            times = os.times()
+            user = times.user + times.children_user - start_times.user - start_times.children_user
+            system = times.system + times.children_system - \
+                start_times.system - start_times.children_system
+            for name, seconds in (('real', wall), ('user', user), ('sys', system)):
+                seconds = max(seconds, 0.0)
+                line = '{}\t{:d}m{:.3f}s{}'.format(name, int(seconds // 60), seconds % 60,
+                                                   os.linesep)
+                yield line.encode(ENCODING) if stream.is_binary() else line
+        return CommandResult(Stream(chunks(), stream.is_binary()), result.get_env(),
+                             result.return_value)
+
+
+class CommandSTATS(Command):
+    """
+    Prints percentiles of times of executed lines by command names
+    and how much output was moved to temporary files,
+    or turns the profiling on and off.
+    Usage:
+    stats
+    stats on|off|clear
+    """
+
+    def set_args(self, args):
+        """
+        Takes and sets arguments if they are given.
+        :param args: list of arguments.
+        """
+        self.__args = args
+
+    def run(self, input, env):
+        """
+        Takes the input Stream and the environment, runs the action of the profiler.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :return: the CommandResult instance with the table of percentiles in milliseconds.
+        """
+        self.__output = Stream()
+        profiler = get_profiler()
+        if not self.__args:
+            self.__output.write_line('{:<20}{:>8}{:>10}{:>10}{:>10}{:>10}'.format(
+                'command', 'count', 'p50, ms', 'p90, ms', 'p99, ms', 'max, ms'))
+            for name, count, percentiles in profiler.percentiles():
+                self.__output.write_line('{:<20}{:>8}'.format(name[:20], count) + ''.join(
+                    '{:>10.3f}'.format(seconds * 1000) for seconds in percentiles))
+            spill_stats = get_spill_stats()
+            self.__output.write_line('Spilled to disk: {} buffers, {} bytes.'.format(
+                spill_stats['spills'], spill_stats['spilled bytes']))
+            if not profiler.is_enabled():
+                self.__output.write_line('Profiling is off, run \'stats on\' to turn it on.')
+        elif self.__args == ['on'] or self.__args == ['off']:
+            profiler.enable(self.__args[0] == 'on')
+        elif self.__args == ['clear']:
+            profiler.clear()
+        else:
+            self.__output.write_line('stats: wrong arguments {}.'.
+                                     format(' '.join(self.__args)))
+            return CommandResult(self.__output, env, 1)
+        return CommandResult(self.__output, env, 0)
+
+
+class CommandFUSED(Command):
+    """
+    The stage of the pipe made by the optimizer from adjacent commands,
+    i.e. 'grep x file' instead of 'cat file | grep x'.
+    The fused command runs only if all its files exist and are not empty,
+    otherwise the original commands run, so errors are the same.
+    If it counts lines, the fused command is 'grep -c' and its number
+    is printed like 'wc -l' prints the number of found lines.
+    """
+
+    def __init__(self, command, original, files=(), count_lines=False):
+        """
+        :param command: the Command running instead of the original ones.
+        :param original: the Command (usually CommandPIPE) it replaces.
+        :param files: names of files read by the fused command.
+        :param count_lines: the command is 'grep -c' replacing 'grep | wc -l' (bool).
+        """
+        self.__command = command
+        self.__original = original
+        self.__files = list(files)
+        self.__count_lines = count_lines
+
+    def get_command(self):
+        """Returns the fused Command."""
+        return self.__command
+
+    def get_original(self):
+        """Returns the replaced Command."""
+        return self.__original
+
+    def get_files(self):
+        """Returns names of files read by the fused command."""
+        return list(self.__files)
+
+    def counts_lines(self):
+        """Checks if the fused command replaces 'grep | wc -l'."""
+        return self.__count_lines
+
+    def run(self, input, env):
+        """
+        Takes the input Stream and the environment and runs the fused command
+        or the original one if some file is missing or empty.
+        The fused command reading files gets no input, like 'cat' ignores it.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :return: the CommandResult instance.
+        """
+        for file in self.__files:
+            file_path = os.path.join(env.get_cwd(), file)
+            if not os.path.isfile(file_path) or not os.path.getsize(file_path):
+                return self.__original.run(input, env)
+        result = self.__command.run(Stream() if self.__files else input, env)
+        if not self.__count_lines:
+            return result
+        if result.return_value():
+            return self.__original.run(input, env)
+        stream = result.get_stream()
+
+        def chunks():
+            yield '{:4d}    {}{}'.format(max(int(stream.get_value()), 1), ' ', os.linesep)
+        return CommandResult(Stream(chunks()), result.get_env(), 0)
+
+
+class CommandEXPLAIN(Command):
+    """
+    Prints the plan of the command line made by the optimizer
+    (see the optimizer module) instead of running the line.
+    Usage:
+    explain COMMAND [| COMMAND...]
+    """
+
+    def __init__(self, command, plan=None):
+        """
+        :param command: the root of the Command tree to explain.
+        :param plan: list of lines describing the optimized tree
+        or None if the tree was not optimized.
+        """
+        self.__command = command
+        self.__plan = plan
+
+    def get_command(self):
+        """Returns the explained Command."""
+        return self.__command
+
+    def run(self, input, env):
+        """
+        Takes the input Stream and the environment and prints the plan.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :return: the CommandResult instance with the plan.
+        """
+        output = Stream()
+        if self.__plan is None:
+            output.write_line('explain: the plan is not built.')
+            return CommandResult(output, env, 1)
+        for line in self.__plan:
+            output.write_line(line)
+        return CommandResult(output, env, 0)
@@ -16,15 +16,57 @@ class Environment:
         """
         self.__vars_values = dict()
         self.__current_working_directory = os.getcwd()
+        self.__listeners = []
+        self.__reads = None
 
     def get_var_value(self, var_name):
         """Returns the value of given variable."""
+        if self.__reads is not None:
+            self.__reads.add(var_name)
         return self.__vars_values.get(var_name, '')
 
     def set_var_value(self, var_name, value):
-        """Sets the new value of variable."""
+        """
+        Sets the new value of variable.
+        If the value is changed the listeners are notified.
+        """
+        changed = self.__vars_values.get(var_name, '') != value
         self.__vars_values[var_name] = value
+        if changed:
+            for listener in self.__listeners:
+                listener(var_name)
 
     def get_cwd(self):
         """Returns the current working directory."""
         return self.__current_working_directory
+
+    def copy(self):
+        """
+        Returns the new Environment with the same variables and working directory.
+        Listeners are not copied, so changes of the copy are not seen by anybody.
+        """
+        env = Environment()
+        env.__vars_values = dict(self.__vars_values)
+        env.__current_working_directory = self.__current_working_directory
+        return env
+
+    def subscribe(self, listener):
+        """
+        Adds the function called with the variable name
+        every time the value of some variable is changed.
+        :param listener: the function taking the variable name.
+        """
+        self.__listeners.append(listener)
+
+    def start_recording(self):
+        """Starts collecting names of variables which values are read."""
+        self.__reads = set()
+
+    def stop_recording(self):
+        """
+        Stops collecting names of read variables.
+        :return: the set of variable names read since start_recording.
+        """
+        reads = self.__reads or set()
+        self.__reads = None
+        return reads
@@ -0,0 +1,233 @@
+"""
+The executor of commands trees in the CLI.
+Runs every command of the pipe in its own thread,
+so all of them work at the same time.
+The threads are linked by bounded queues: a command that produces
+its output faster than the next one reads it waits till the queue
+has free space again.
+"""
+import queue
+import threading
+import time
+from src.commands import CommandDEFERRED, CommandLIST, CommandPIPE, CommandResult, CommandTIME
+from src.iostreams import Stream
+from src.profiler import command_name
+
+
+class Channel:
+    """
+    The bounded queue between two threads of the pipe.
+    Passes chunks of the left command output to the right command.
+    """
+    __END = object()
+
+    def __init__(self, queue_size, batch_size):
+        """
+        :param queue_size: maximal number of chunks in the queue (int).
+        :param batch_size: maximal number of symbols in one chunk (int).
+        """
+        self.__queue = queue.Queue(queue_size)
+        self.__batch_size = batch_size
+        self.__cancelled = threading.Event()
+
+    def pump(self, stream):
+        """
+        Puts the content of the Stream into the queue
+        till its end or till the Channel is cancelled.
+        Small chunks are joined while the reader is busy.
+        The binary content is passed as bytes.
+        Exceptions raised while reading the Stream are passed to the reader.
+        The Stream is closed at the end, so the left command stops
+        if the Channel was cancelled.
+        :param stream: the Stream instance with the left command results.
+        """
+        empty = b'' if stream.is_binary() else ''
+        batch = []
+        size = 0
+        try:
+            for chunk in stream.chunks():
+                batch.append(chunk)
+                size += len(chunk)
+                if size >= self.__batch_size or self.__queue.empty():
+                    if not self.__put(empty.join(batch)):
+                        return
+                    batch = []
+                    size = 0
+            if batch:
+                self.__put(empty.join(batch))
+        except BaseException as ex:
+            self.__put(ex)
+        finally:
+            stream.close()
+            self.__put(self.__END)
+
+    def cancel(self):
+        """Stops the writer of the Channel, the rest of content is dropped."""
+        self.__cancelled.set()
+
+    def close(self):
+        """Cancels the Channel, called when the reader needs no more content."""
+        self.cancel()
+
+    def __put(self, item):
+        """
+        Waits for the free space in the queue and puts the item there.
+        :return: False if the Channel was cancelled, True otherwise.
+        """
+        while not self.__cancelled.is_set():
+            try:
+                self.__queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def __iter__(self):
+        """Yields chunks from the queue till the end of the left command output."""
+        while True:
+            try:
+                item = self.__queue.get(timeout=0.1)
+            except queue.Empty:
+                if self.__cancelled.is_set():
+                    return
+                continue
+            if item is self.__END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+class PipelineOutput:
+    """
+    The output of the last command of the pipe.
+    Stops all commands of the pipe when the output is read or closed.
+    """
+
+    def __init__(self, output, channels):
+        """
+        :param output: the Stream instance with the last command results.
+        :param channels: list of Channels between commands of the pipe.
+        """
+        self.__output = output
+        self.__channels = channels
+
+    def is_binary(self):
+        """Checks if the output of the last command is binary."""
+        return self.__output.is_binary()
+
+    def __iter__(self):
+        """Yields the output of the last command, bytes if it is binary."""
+        try:
+            yield from self.__output.chunks()
+        finally:
+            self.cancel()
+
+    def write_to(self, out):
+        """Writes the output of the last command to the given text file."""
+        try:
+            self.__output.write_to(out)
+        finally:
+            self.cancel()
+
+    def close(self):
+        """Stops all commands of the pipe, called when the output is not needed any more."""
+        self.cancel()
+
+    def cancel(self):
+        """Cancels all channels of the pipe."""
+        for channel in self.__channels:
+            channel.cancel()
+
+
+class PipelineExecutor:
+    """
+    Runs the Command and returns its result.
+    CommandPIPE is executed by threads, one thread for each command of the pipe.
+
+    executor = PipelineExecutor()
+    result = executor.run(command, Stream(), env)
+    """
+
+    def __init__(self, queue_size=64, batch_size=64 * 1024):
+        """
+        :param queue_size: maximal number of chunks waiting between two commands (int).
+        :param batch_size: maximal number of symbols in one chunk (int).
+        """
+        self.__queue_size = queue_size
+        self.__batch_size = batch_size
+
+    def run(self, command, input, env, profile=None):
+        """
+        Takes the Command, the input Stream and the environment.
+        The commands of the pipe are started from the left to the right
+        with the environment returned by the previous command.
+        Every command returns its result at once and produces the output
+        later in its own thread, while the next command reads it.
+        If some command fails the result of this command is returned
+        and the commands on the left from it are stopped; the return value
+        of the running process is known only after its output, so such
+        a command is never treated as failed.
+        Commands of lists, their parts parsed when they run and the command
+        of 'time' are run by this method too, so their pipes are executed
+        by threads as well.
+        :param command: the root of the Command tree.
+        :param input: the Stream instance with previous results.
+        :param env: the Environment instance with variables.
+        :param profile: the LineProfile getting the time of every command
+        or None.
+        :return: the CommandResult instance with result of the last command.
+        """
+        if isinstance(command, (CommandTIME, CommandLIST, CommandDEFERRED)):
+            return command.run(input, env, lambda inner, input, env:
+                               self.run(inner, input, env, profile))
+        if not isinstance(command, CommandPIPE):
+            return PipelineExecutor.__run_stage(command, input, env, profile)
+
+        channels = []
+        stages = command.stages()
+        for stage in stages[:-1]:
+            try:
+                result = PipelineExecutor.__run_stage(stage, input, env, profile)
+            except BaseException:
+                PipelineExecutor.__cancel(channels)
+                raise
+            if result.is_return_value_known() and result.return_value():
+                PipelineExecutor.__cancel(channels)
+                return result
+            channel = Channel(self.__queue_size, self.__batch_size)
+            channels.append(channel)
+            thread = threading.Thread(target=channel.pump,
+                                      args=(result.get_stream(),), daemon=True)
+            thread.start()
+            input = CommandPIPE.connect(Stream(channel, result.get_stream().is_binary()))
+            env = result.get_env()
+
+        try:
+            result = PipelineExecutor.__run_stage(stages[-1], input, env, profile)
+        except BaseException:
+            PipelineExecutor.__cancel(channels)
+            raise
+        pipeline_output = PipelineOutput(result.get_stream(), channels)
+        output = Stream(pipeline_output, pipeline_output.is_binary())
+        return CommandResult(output, result.get_env(), result.return_value)
+
+    @staticmethod
+    def __run_stage(command, input, env, profile):
+        """
+        Runs one command. If the profile is given, the time of the command
+        is added to it when the output of the command ends.
+        """
+        if profile is None:
+            return command.run(input, env)
+        start = time.perf_counter()
+        result = command.run(input, env)
+        output = profile.time_stage(command_name(command), start, result.get_stream())
+        return CommandResult(output, result.get_env(), result.return_value)
+
+    @staticmethod
+    def __cancel(channels):
+        """Cancels all given channels."""
+        for channel in channels:
+            channel.cancel()
+
@@ -0,0 +1,162 @@
+"""
+The cache of contents of files shared by 'cat', 'wc' and 'grep'.
+
+A file is read once and kept decoded with converted line endings,
+together with its counts for 'wc' and, when they are needed,
+offsets of its lines. The cached file is used while the file has the same
+modification time, size and inode; the total size of cached files
+is bounded and the least recently used files are removed first.
+Big files are not cached, they are read by chunks as before.
+"""
+from array import array
+from collections import OrderedDict
+import locale
+import os
+import re
+import threading
+from src.wordcount import count_chunks
+
+__cache = None
+__lock = threading.Lock()
+
+
+class CachedFile:
+    """The decoded content of the file with its counts and line offsets."""
+
+    def __init__(self, data):
+        """
+        Decodes the content, converts line endings to the newline symbol
+        and counts newlines, words and bytes.
+        :param data: the content of the file (bytes).
+        """
+        self.__counts = count_chunks([data])
+        text = data.decode(locale.getpreferredencoding(False), 'replace')
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        self.__text = text
+        self.__offsets = None
+        self.__lock = threading.Lock()
+
+    def text(self):
+        """Returns the decoded content with newline symbols as line endings."""
+        return self.__text
+
+    def counts(self):
+        """Returns the list with numbers of newlines, words and bytes."""
+        return list(self.__counts)
+
+    def line_offsets(self):
+        """
+        Returns the array with offsets of starts of all lines in the text.
+        The array is made at the first call.
+        """
+        with self.__lock:
+            if self.__offsets is None:
+                offsets = array('L', [0])
+                offsets.extend(match.end() for match in re.finditer('\n', self.__text))
+                if offsets[-1] == len(self.__text):
+                    offsets.pop()
+                self.__offsets = offsets
+            return self.__offsets
+
+    def lines(self):
+        """Yields lines of the text, each except maybe the last one ends with the newline."""
+        text = self.__text
+        offsets = self.line_offsets()
+        for ix in range(len(offsets)):
+            end = offsets[ix + 1] if ix + 1 < len(offsets) else len(text)
+            yield text[offsets[ix]:end]
+
+
+class FileCache:
+    """
+    The LRU cache of CachedFiles bounded by the total size of files.
+
+    cache = get_file_cache()
+    cached = cache.get(path)
+    if cached is not None:
+        text = cached.text()
+    """
+
+    def __init__(self, max_size=128 * 1024 * 1024, max_file_size=16 * 1024 * 1024):
+        """
+        :param max_size: maximal total size of cached files in bytes (int).
+        :param max_file_size: files bigger than this size are not cached (int).
+        """
+        self.__max_size = max_size
+        self.__max_file_size = max_file_size
+        self.__entries = OrderedDict()
+        self.__size = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__lock = threading.Lock()
+
+    def get(self, file_path):
+        """
+        Returns the cached content of the file, the file is read if it is not cached
+        or was changed since.
+        :param file_path: path to the file (string).
+        :return: the CachedFile instance or None if the file is too big or cannot be read.
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        if stat.st_size > self.__max_file_size:
+            return None
+        key = os.path.abspath(file_path)
+        stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino, stat.st_dev)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self.__entries.move_to_end(key)
+                self.__hits += 1
+                return entry[1]
+            self.__misses += 1
+        try:
+            with open(file_path, 'rb') as opened_file:
+                data = opened_file.read()
+        except OSError:
+            return None
+        cached = CachedFile(data)
+        with self.__lock:
+            self.__remove(key)
+            self.__entries[key] = (stamp, cached, len(data))
+            self.__size += len(data)
+            while self.__size > self.__max_size:
+                self.__remove(next(iter(self.__entries)))
+                self.__evictions += 1
+        return cached
+
+    def flush(self):
+        """Removes all files from the cache."""
+        with self.__lock:
+            self.__entries.clear()
+            self.__size = 0
+
+    def stats(self):
+        """
+        Returns the statistics of the cache.
+        :return: dictionary with numbers of files, hits, misses and evictions,
+        the total and the maximal size of cached files in bytes.
+        """
+        with self.__lock:
+            return {'files': len(self.__entries), 'size': self.__size,
+                    'max size': self.__max_size, 'hits': self.__hits,
+                    'misses': self.__misses, 'evictions': self.__evictions}
+
+    def __remove(self, key):
+        """Removes the file from the cache if it is there."""
+        entry = self.__entries.pop(key, None)
+        if entry is not None:
+            self.__size -= entry[2]
+
+
+def get_file_cache():
+    """Returns the FileCache instance shared by all commands."""
+    global __cache
+    with __lock:
+        if __cache is None:
+            __cache = FileCache()
+        return __cache
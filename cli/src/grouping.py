@@ -0,0 +1,109 @@
+"""
+The engine of the 'uniq' command.
+Adjacent repeated lines are removed in one pass with constant memory.
+
+The most frequent lines are found by the hash aggregation: the dict
+counts every distinct line. When the estimated size of the dict exceeds
+the memory budget (the spill threshold of streams, see the iostreams module
+by default), its counts are moved to PARTITIONS SpillBuffers by the hash
+of the line and the dict starts again. At the end every partition,
+which has only its own part of distinct lines, is counted again alone
+and only the top lines are kept by the heap.
+"""
+from src.iostreams import SpillBuffer, Stream, get_spill_threshold
+import heapq
+
+ENTRY_OVERHEAD = 128
+PARTITIONS = 64
+
+
+def unique_lines(lines):
+    """
+    Yields pairs of the line and the number of its adjacent repeats.
+    :param lines: iterable with lines without newline symbols.
+    """
+    previous = None
+    count = 0
+    for line in lines:
+        if count and line == previous:
+            count += 1
+            continue
+        if count:
+            yield previous, count
+        previous = line
+        count = 1
+    if count:
+        yield previous, count
+
+
+def top_lines(lines, number, budget=None):
+    """
+    Counts all equal lines and returns the most frequent ones.
+    :param lines: iterable with lines without newline symbols.
+    :param number: the number of returned lines (int).
+    :param budget: maximal size of counted lines kept in memory in bytes,
+    the spill threshold of streams by default.
+    :return: list of pairs of the line and its count, from the most frequent line,
+    lines with equal counts are in the sorted order.
+    """
+    if budget is None:
+        budget = get_spill_threshold()
+    counts = {}
+    size = 0
+    partitions = None
+    try:
+        for line in lines:
+            count = counts.get(line)
+            if count is None:
+                size += len(line) + ENTRY_OVERHEAD
+                counts[line] = 1
+                if size > budget:
+                    partitions = _spill(counts, partitions)
+                    counts = {}
+                    size = 0
+            else:
+                counts[line] = count + 1
+        if partitions is None:
+            return _top(counts.items(), number)
+        partitions = _spill(counts, partitions)
+        counts = None
+        top = []
+        for buffer in partitions:
+            counts = {}
+            for line, count in _read_partition(buffer):
+                counts[line] = counts.get(line, 0) + count
+            top = _top(top + _top(counts.items(), number), number)
+            buffer.close()
+        return top
+    finally:
+        for buffer in partitions or ():
+            buffer.close()
+
+
+def _top(items, number):
+    """Returns the given number of pairs with the biggest counts."""
+    return heapq.nsmallest(number, items, key=lambda item: (-item[1], item[0]))
+
+
+def _spill(counts, partitions):
+    """
+    Adds counts to the partitions by the hash of the line.
+    :param counts: the dict with counts of lines.
+    :param partitions: list of SpillBuffers or None to make them.
+    :return: list of SpillBuffers.
+    """
+    if partitions is None:
+        partitions = [SpillBuffer(threshold=0) for _ in range(PARTITIONS)]
+    batches = [[] for _ in partitions]
+    for line, count in counts.items():
+        batches[hash(line) % len(partitions)].append('{}\t{}\n'.format(count, line))
+    for buffer, batch in zip(partitions, batches):
+        buffer.write(''.join(batch))
+    return partitions
+
+
+def _read_partition(buffer):
+    """Yields pairs of the line and the count from the partition."""
+    for entry in Stream(buffer.chunks()).lines():
+        count, line = entry[:-1].split('\t', 1)
+        yield line, int(count)
@@ -0,0 +1,106 @@
+"""
+The engine of the 'head' and 'tail' commands.
+Lines are found by the newline symbol in whole chunks, so the content
+is never split into lines: the same functions work with strings and bytes.
+
+'head' stops reading as soon as it has enough lines.
+'tail' reads the file backwards by blocks from its end till it has
+enough lines, so the time does not depend on the size of the file;
+the input is read till its end, but only the chunks with the last lines are kept.
+"""
+from collections import deque
+import os
+
+BLOCK_SIZE = 64 * 1024
+
+
+def head_chunks(chunks, count):
+    """
+    Yields the beginning of the content with the given number of lines.
+    Reading stops when the lines are found, the rest of chunks is not read.
+    :param chunks: iterable with strings or bytes.
+    :param count: the number of lines (int).
+    """
+    left = count
+    if left <= 0:
+        return
+    for chunk in chunks:
+        newline = _newline(chunk)
+        found = chunk.count(newline)
+        if found < left:
+            left -= found
+            yield chunk
+            continue
+        end = -1
+        for _ in range(left):
+            end = chunk.index(newline, end + 1)
+        yield chunk[:end + 1]
+        return
+
+
+def tail_chunks(chunks, count):
+    """
+    Returns the end of the content with the given number of lines.
+    Only the last chunks that may contain these lines are kept while reading.
+    :param chunks: iterable with strings or bytes.
+    :param count: the number of lines (int).
+    :return: string or bytes, None if there are no chunks.
+    """
+    kept = deque()
+    newlines = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        found = chunk.count(_newline(chunk))
+        kept.append((chunk, found))
+        newlines += found
+        while len(kept) > 1 and newlines - kept[0][1] > count:
+            newlines -= kept.popleft()[1]
+    if not kept:
+        return None
+    return last_lines(kept[0][0][:0].join(chunk for chunk, _ in kept), count)
+
+
+def tail_file(file_path, count):
+    """
+    Returns the end of the file with the given number of lines.
+    Blocks are read from the end of the file till enough lines are found.
+    :param file_path: path to the existing file (string).
+    :param count: the number of lines (int).
+    :return: bytes.
+    """
+    blocks = []
+    newlines = 0
+    with open(file_path, 'rb') as opened_file:
+        fd = opened_file.fileno()
+        position = os.fstat(fd).st_size
+        while position > 0 and newlines <= count:
+            size = min(BLOCK_SIZE, position)
+            position -= size
+            block = os.pread(fd, size, position)
+            blocks.append(block)
+            newlines += block.count(b'\n')
+    return last_lines(b''.join(reversed(blocks)), count)
+
+
+def last_lines(data, count):
+    """
+    Returns the given number of lines from the end of the data.
+    The newline symbol at the very end does not start a new line.
+    :param data: string or bytes.
+    :param count: the number of lines (int).
+    """
+    if count <= 0:
+        return data[:0]
+    newline = _newline(data)
+    end = len(data) - 1 if data.endswith(newline) else len(data)
+    for _ in range(count):
+        end = data.rfind(newline, 0, end)
+        if end == -1:
+            return data
+    return data[end + 1:]
+
+
+def _newline(data):
+    """Returns the newline symbol of the same type as the data."""
+    return b'\n' if isinstance(data, bytes) else '\n'
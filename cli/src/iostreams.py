@@ -1,19 +1,199 @@
 """
 The abstraction of input and output streams for command usage.
+
+A Stream either stores the written strings in memory or wraps
+an iterable of string chunks. In the second case the chunks are produced
+lazily, only when somebody reads the Stream, so commands connected
+by the pipe can pass their results chunk by chunk without keeping
+the whole output in memory.
+The lazy content can also be binary, like the output of files
+and of external commands: bytes are passed through pipes untouched
+and decoded only when the Stream is read as text.
+The written content is kept by the SpillBuffer, which moves it
+to the temporary file when it becomes too big for memory.
+
+FileSource is the lazy binary content of files read by big chunks.
+As text it is decoded or taken from the file cache.
+It can also be written to the terminal without decoding.
+PipeSource is the lazy output of the process read from its pipe.
+
+BatchedWriter joins small writes to the terminal into batches,
+which are written when they become big or a bit later by its own thread.
 """
 
-from io import StringIO
+from io import BytesIO, StringIO
+import codecs
+import itertools
+import locale
+import mmap
 import os
+import tempfile
+import threading
+import time
+
+ENCODING = locale.getpreferredencoding(False)
+
+__spill_threshold = 64 * 1024 * 1024
+__spill_stats = {'spills': 0, 'spilled bytes': 0}
+__spill_lock = threading.Lock()
+
+
+def set_spill_threshold(threshold):
+    """
+    Sets the size of the content kept in memory by SpillBuffers,
+    bigger content is moved to temporary files.
+    :param threshold: the size in symbols or bytes (int).
+    """
+    global __spill_threshold
+    __spill_threshold = threshold
+
+
+def get_spill_threshold():
+    """Returns the size of the content kept in memory by SpillBuffers."""
+    return __spill_threshold
+
+
+def get_spill_stats():
+    """
+    Returns the statistics of spilling.
+    :return: dictionary with the number of SpillBuffers moved to temporary files
+    and the number of bytes written to these files.
+    """
+    with __spill_lock:
+        return dict(__spill_stats)
+
+
+def _count_spill(spills, size):
+    """Adds spilled buffers and written bytes to the statistics."""
+    with __spill_lock:
+        __spill_stats['spills'] += spills
+        __spill_stats['spilled bytes'] += size
+
+
+class SpillBuffer:
+    """
+    The buffer of written strings or bytes. The content is kept in memory
+    till its size exceeds the spill threshold, then it is moved
+    to the anonymous temporary file and the next writes go there.
+    The content is read back by chunks, so it is never loaded at once.
+    Strings are kept in the file in UTF-8.
+    """
+    CHUNK_SIZE = 1024 * 1024
+    FILE_ENCODING = 'utf-8'
+
+    def __init__(self, binary=False, threshold=None):
+        """
+        :param binary: the buffer keeps bytes instead of strings (bool).
+        :param threshold: the size of the content kept in memory,
+        the threshold set by set_spill_threshold by default.
+        """
+        self.__binary = binary
+        self.__threshold = get_spill_threshold() if threshold is None else threshold
+        self.__memory = BytesIO() if binary else StringIO()
+        self.__file = None
+        self.__size = 0
+
+    def write(self, data):
+        """Writes the string or the bytes."""
+        if not data:
+            return
+        self.__size += len(data)
+        if self.__file is None:
+            self.__memory.write(data)
+            if self.__size > self.__threshold:
+                self.__spill()
+            return
+        if not self.__binary:
+            data = data.encode(self.FILE_ENCODING, 'surrogatepass')
+        self.__file.write(data)
+        _count_spill(0, len(data))
+
+    def is_binary(self):
+        """Checks if the buffer keeps bytes."""
+        return self.__binary
+
+    def tell(self):
+        """Returns the size of the written content, zero if nothing was written."""
+        return self.__size
+
+    def is_spilled(self):
+        """Checks if the content was moved to the temporary file."""
+        return self.__file is not None
+
+    def getvalue(self):
+        """Returns the whole content as one string or bytes."""
+        if self.__file is None:
+            return self.__memory.getvalue()
+        return (b'' if self.__binary else '').join(self.chunks())
+
+    def chunks(self):
+        """Yields the content from the beginning by chunks."""
+        if self.__file is None:
+            value = self.__memory.getvalue()
+            if value:
+                yield value
+            return
+        self.__file.flush()
+        fd = self.__file.fileno()
+        decoder = None if self.__binary else \
+            codecs.getincrementaldecoder(self.FILE_ENCODING)('surrogatepass')
+        offset = 0
+        while True:
+            data = os.pread(fd, self.CHUNK_SIZE, offset)
+            offset += len(data)
+            last = not data
+            if decoder is not None:
+                data = decoder.decode(data, last)
+            if data:
+                yield data
+            if last:
+                return
+
+    def close(self):
+        """Removes the temporary file and the content."""
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+        self.__memory = BytesIO() if self.__binary else StringIO()
+        self.__size = 0
+
+    def __spill(self):
+        """Moves the content from memory to the temporary file."""
+        data = self.__memory.getvalue()
+        if not self.__binary:
+            data = data.encode(self.FILE_ENCODING, 'surrogatepass')
+        self.__file = tempfile.TemporaryFile()
+        self.__file.write(data)
+        self.__memory = None
+        _count_spill(1, len(data))
 
 
 class Stream:
     """
     The stream that contains input or/and commands executions results.
+    The lazy content can be binary: then chunks are bytes, they are passed
+    between commands as is and decoded only when somebody reads the Stream as text.
     """
 
-    def __init__(self):
-        """Creates StringIO for results storage."""
-        self.__io_str = StringIO()
+    def __init__(self, source=None, binary=False):
+        """
+        Creates the SpillBuffer for results storage.
+        :param source: optional iterable of strings, the lazy content of the Stream.
+        :param binary: the source yields bytes instead of strings (bool).
+        If the binary source has the method 'text_chunks', it is used
+        to read the content as text instead of decoding.
+        """
+        self.__io_str = SpillBuffer()
+        self.__origin = source
+        self.__source = None
+        self.__head = []
+        self.__binary = binary and source is not None
+        if source is not None:
+            self.__source = iter(source)
+
+    def is_binary(self):
+        """Checks if the lazy content of the Stream is bytes."""
+        return self.__binary
 
     def write(self, str):
         """Writes the input string."""
@@ -25,5 +205,444 @@ class Stream:
         self.__io_str.write(os.linesep)
 
     def get_value(self):
-        """Returns current value of the Stream."""
+        """
+        Returns current value of the Stream.
+        The lazy content is read till the end, decoded if it is binary
+        and stored in the SpillBuffer.
+        """
+        if self.__source is not None:
+            for chunk in self.__text_rest():
+                self.__io_str.write(chunk)
         return self.__io_str.getvalue()
+
+    def is_empty(self):
+        """
+        Checks if the Stream has no content.
+        Reads at most one non-empty chunk of the lazy content.
+        """
+        if self.__head or self.__io_str.tell():
+            return False
+        if self.__source is not None:
+            for chunk in self.__source:
+                if chunk:
+                    self.__head.append(chunk)
+                    return False
+            self.__source = None
+        return True
+
+    def __iter__(self):
+        """
+        Yields the content of the Stream chunk by chunk as strings.
+        The lazy content can be read only once.
+        """
+        yield from self.__io_str.chunks()
+        if self.__source is None:
+            return
+        if self.__io_str.tell():
+            self.__io_str = SpillBuffer()
+        for chunk in self.__text_rest():
+            if chunk:
+                yield chunk
+
+    def chunks(self):
+        """
+        Yields the content of the Stream as it is: bytes chunks
+        if the lazy content is binary, strings otherwise.
+        """
+        if not self.__binary:
+            yield from self
+            return
+        for chunk in self.__io_str.chunks():
+            yield chunk.encode(ENCODING)
+        if self.__io_str.tell():
+            self.__io_str = SpillBuffer()
+        for chunk in self.__rest():
+            if chunk:
+                yield chunk
+
+    def bytes_chunks(self):
+        """Yields the content of the Stream as bytes, strings are encoded."""
+        if self.__binary:
+            yield from self.chunks()
+            return
+        for chunk in self:
+            yield chunk.encode(ENCODING)
+
+    def write_to(self, out):
+        """
+        Writes the content of the Stream to the given text file, i.e. sys.stdout.
+        If the lazy content knows how to write itself (like FileSource)
+        and was not read yet, it is written directly.
+        The binary content is written to the binary buffer of the file if it has one.
+        :param out: the text file object.
+        """
+        if self.__source is not None and not self.__head and \
+                not self.__io_str.tell() and hasattr(self.__origin, 'write_to'):
+            self.__source = None
+            self.__origin.write_to(out)
+            return
+        buffer = getattr(out, 'buffer', None)
+        if self.__binary and buffer is not None:
+            out.flush()
+            for chunk in self.chunks():
+                buffer.write(chunk)
+            return
+        for chunk in self:
+            out.write(chunk)
+
+    def close(self):
+        """
+        Drops the lazy content which was not read yet and closes its source:
+        generators are closed and Channels are cancelled, so the commands
+        producing the content stop, like on SIGPIPE.
+        """
+        source = self.__source
+        self.__source = None
+        self.__head = []
+        for item in (source, self.__origin):
+            close = getattr(item, 'close', None)
+            if close is not None:
+                close()
+
+    def lines(self):
+        """
+        Yields the content of the Stream line by line.
+        Every line except maybe the last one ends with the newline symbol.
+        """
+        rest = []
+        for chunk in self:
+            start = 0
+            end = chunk.find('\n')
+            while end != -1:
+                rest.append(chunk[start:end + 1])
+                yield ''.join(rest)
+                rest = []
+                start = end + 1
+                end = chunk.find('\n', start)
+            if start < len(chunk):
+                rest.append(chunk[start:])
+        if rest:
+            yield ''.join(rest)
+
+    def __rest(self):
+        """Yields the lazy content which was not read yet, the Stream forgets it."""
+        source = self.__source
+        self.__source = None
+        if source is None:
+            return
+        while self.__head:
+            yield self.__head.pop(0)
+        yield from source
+
+    def __text_rest(self):
+        """Yields the lazy content which was not read yet as strings."""
+        if not self.__binary:
+            yield from self.__rest()
+            return
+        self.__binary = False
+        if not self.__head and hasattr(self.__origin, 'text_chunks'):
+            self.__source = None
+            yield from self.__origin.text_chunks()
+        else:
+            yield from decode_chunks(self.__rest())
+
+
+def decode_chunks(chunks, encoding=None):
+    """
+    Decodes bytes chunks to strings with the system line separator.
+    Line endings '\\r\\n' and '\\r' are converted like in the text mode of files,
+    also when the chunk boundary is between '\\r' and '\\n'.
+    :param chunks: iterable of bytes.
+    :param encoding: the encoding, the preferred encoding of the system by default.
+    """
+    decoder = codecs.getincrementaldecoder(encoding or ENCODING)('replace')
+    carriage_return = False
+    for chunk in itertools.chain(chunks, [b'']):
+        text = decoder.decode(chunk, not chunk)
+        if carriage_return:
+            text = '\r' + text
+            carriage_return = False
+        if text.endswith('\r') and chunk:
+            text = text[:-1]
+            carriage_return = True
+        if text:
+            yield convert_line_endings(text)
+
+
+def convert_line_endings(text):
+    """Converts line endings of the text to the system line separator."""
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    if os.linesep != '\n':
+        text = text.replace('\n', os.linesep)
+    return text
+
+
+class FileSource:
+    """
+    The lazy binary content of files for the Stream.
+    Files are read by big binary chunks, so their size is not limited
+    by the memory. When the content is read as text, line endings are converted
+    only if the chunk has the carriage return symbol or the system line separator
+    is not the newline one.
+    """
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, files, error=None, cache=None):
+        """
+        :param files: list of paths to existing files.
+        :param error: the error message written after files or None.
+        :param cache: the FileCache instance with decoded files or None.
+        """
+        self.__files = files
+        self.__error = error
+        self.__cache = cache
+        self.__encoding = locale.getpreferredencoding(False)
+
+    def __iter__(self):
+        """Yields the content of files as it is, by bytes chunks."""
+        for file_path in self.__files:
+            yield from self.__read(file_path)
+        if self.__error is not None:
+            yield (self.__error + os.linesep).encode(self.__encoding)
+
+    def text_chunks(self):
+        """
+        Yields the decoded content of files with converted line endings.
+        Files from the cache are not read again.
+        """
+        for file_path in self.__files:
+            cached = self.__cache.get(file_path) if self.__cache is not None else None
+            if cached is not None:
+                text = cached.text()
+                if text:
+                    yield convert_line_endings(text)
+                continue
+            yield from decode_chunks(self.__read(file_path), self.__encoding)
+        if self.__error is not None:
+            yield self.__error + os.linesep
+
+    def __read(self, file_path):
+        """Yields bytes chunks of the file."""
+        with open(file_path, 'rb') as opened_file:
+            while True:
+                chunk = opened_file.read(self.CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+    def write_to(self, out):
+        """
+        Writes files to the given text file.
+        If the file object has the binary buffer with the file descriptor,
+        chunks are passed to it by the kernel without copying them into the CLI.
+        Line endings are converted only for the terminal, in chunks
+        with the carriage return symbol; other files get the content untouched.
+        :param out: the text file object.
+        """
+        try:
+            fd = out.buffer.fileno()
+        except (AttributeError, OSError, ValueError):
+            fd = None
+        if fd is None or os.linesep != '\n':
+            for chunk in self.text_chunks():
+                out.write(chunk)
+            return
+
+        out.flush()
+        convert = os.isatty(fd)
+        for file_path in self.__files:
+            with open(file_path, 'rb') as opened_file:
+                if not os.fstat(opened_file.fileno()).st_size:
+                    continue
+                with mmap.mmap(opened_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    FileSource.__copy(mapped, opened_file.fileno(), out, fd, convert)
+        if self.__error is not None:
+            out.write(self.__error + os.linesep)
+
+    @staticmethod
+    def __copy(mapped, in_fd, out, out_fd, convert):
+        """
+        Copies the memory-mapped file to the file descriptor chunk by chunk.
+        If convert is set, line endings are converted in chunks with the carriage return symbol.
+        """
+        offset = 0
+        size = len(mapped)
+        while offset < size:
+            end = min(offset + FileSource.CHUNK_SIZE, size)
+            if not convert or mapped.find(b'\r', offset, end) == -1:
+                while offset < end:
+                    try:
+                        sent = os.sendfile(out_fd, in_fd, offset, end - offset)
+                    except OSError:
+                        sent = 0
+                    if not sent:
+                        out.buffer.write(mapped[offset:end])
+                        out.buffer.flush()
+                        sent = end - offset
+                    offset += sent
+            else:
+                if end < size and mapped[end - 1] == ord('\r'):
+                    end += 1
+                chunk = mapped[offset:end].replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+                out.buffer.write(chunk)
+                out.buffer.flush()
+                offset = end
+
+
+class PipeSource:
+    """
+    The lazy binary output of the process for the Stream.
+    Bytes are read from the pipe as soon as the process writes them,
+    so the output appears while the process works and is never kept whole.
+    Closing the source closes the pipe: the process writing
+    to it gets SIGPIPE and stops, like in the shell.
+    """
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, fd):
+        """
+        :param fd: the file descriptor of the reading end of the pipe.
+        """
+        self.__fd = fd
+        self.__rest = None
+
+    def __iter__(self):
+        """Yields bytes chunks till the end of the output, then closes the pipe."""
+        try:
+            while self.__fd is not None:
+                chunk = os.read(self.__fd, self.READ_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+            if self.__rest is not None:
+                yield from self.__rest.chunks()
+        finally:
+            self.close()
+
+    def drain(self):
+        """
+        Reads the rest of the output into the SpillBuffer, so the process
+        can finish before the output is read; the output is read from there.
+        """
+        if self.__fd is None:
+            return
+        rest = SpillBuffer(binary=True)
+        for chunk in iter(lambda: os.read(self.__fd, self.READ_SIZE), b''):
+            rest.write(chunk)
+        os.close(self.__fd)
+        self.__fd = None
+        self.__rest = rest
+
+    def close(self):
+        """Closes the pipe, the rest of the output is dropped."""
+        fd = self.__fd
+        self.__fd = None
+        if fd is not None:
+            os.close(fd)
+        if self.__rest is not None:
+            self.__rest.close()
+
+
+class BatchedWriter:
+    """
+    The wrapper of the text file, i.e. sys.stdout, joining small writes
+    into batches. The batch is written by one write when its size exceeds
+    batch_size, or by the flushing thread 'interval' seconds after
+    the first write into it, so lines of the slow command still appear at once
+    while the fast output is written by few big writes instead of one
+    system call per line. Bytes written to 'buffer' keep their order with strings.
+
+    out = BatchedWriter(sys.stdout)
+    stream.write_to(out)
+    out.flush()
+    """
+
+    def __init__(self, out, batch_size=64 * 1024, interval=0.01):
+        """
+        Starts the flushing thread.
+        :param out: the text file object.
+        :param batch_size: maximal number of symbols or bytes kept in the batch (int).
+        :param interval: the delay of writing the batch in seconds (float).
+        """
+        self.__out = out
+        self.__batch_size = batch_size
+        self.__interval = interval
+        self.__batch = []
+        self.__size = 0
+        self.__lock = threading.Lock()
+        self.__pending = threading.Event()
+        self.buffer = None
+        if getattr(out, 'buffer', None) is not None:
+            self.buffer = _BatchedBuffer(self, out.buffer)
+        thread = threading.Thread(target=self.__flush_later, daemon=True)
+        thread.start()
+
+    def write(self, data):
+        """Adds the string or the bytes to the batch."""
+        with self.__lock:
+            self.__batch.append(data)
+            self.__size += len(data)
+            if self.__size >= self.__batch_size:
+                self.__write_batch()
+            else:
+                self.__pending.set()
+        return len(data)
+
+    def flush(self):
+        """Writes the batch and flushes the file."""
+        with self.__lock:
+            self.__write_batch()
+            self.__out.flush()
+
+    def isatty(self):
+        """Checks if the file is the terminal."""
+        return self.__out.isatty()
+
+    def __write_batch(self):
+        """Writes the batch, adjacent strings and bytes by one write each."""
+        self.__pending.clear()
+        if not self.__batch:
+            return
+        batch = self.__batch
+        self.__batch = []
+        self.__size = 0
+        for binary, group in itertools.groupby(batch, lambda data: isinstance(data, bytes)):
+            if binary:
+                self.__out.flush()
+                self.__out.buffer.write(b''.join(group))
+            else:
+                self.__out.write(''.join(group))
+        self.__out.flush()
+
+    def __flush_later(self):
+        """The flushing thread: writes the batch a bit later than its first write."""
+        while True:
+            self.__pending.wait()
+            time.sleep(self.__interval)
+            with self.__lock:
+                self.__write_batch()
+
+
+class _BatchedBuffer:
+    """The binary 'buffer' of the BatchedWriter, its bytes go to the same batch."""
+
+    def __init__(self, writer, buffer):
+        """
+        :param writer: the BatchedWriter instance.
+        :param buffer: the binary buffer of the wrapped file.
+        """
+        self.__writer = writer
+        self.__buffer = buffer
+
+    def write(self, data):
+        """Adds the bytes to the batch of the writer."""
+        return self.__writer.write(bytes(data))
+
+    def flush(self):
+        """Writes the batch of the writer."""
+        self.__writer.flush()
+
+    def fileno(self):
+        """Returns the file descriptor of the wrapped file."""
+        return self.__buffer.fileno()
@@ -0,0 +1,192 @@
+"""
+Background jobs of the CLI.
+
+The line ending with '&' is run as the job. The JobManager keeps its own
+asyncio event loop in the separate thread and every job is the task
+of this loop. Commands themselves are blocking, so the task runs
+the command tree in the thread pool of the loop and keeps its whole output;
+several jobs run at the same time while the prompt is free.
+The output is kept by the SpillBuffer, so the big output of the job
+goes to the temporary file. The output of finished jobs is delivered
+by the CLI before the next prompt, or at once by 'fg'.
+
+Jobs run with the copy of the environment, so variables assigned by the job
+do not change the environment of the CLI, like in the subshell.
+The command tree is copied too, because the same cached tree
+can be run by another job at the same time.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from src.iostreams import SpillBuffer, Stream
+import asyncio
+import copy
+import os
+import threading
+
+__manager = None
+__lock = threading.Lock()
+
+
+class Job:
+    """The command line run in the background."""
+
+    def __init__(self, number, line, future):
+        """
+        :param number: the job number shown to the user (int).
+        :param line: the command line without '&' (string).
+        :param future: the future with the SpillBuffer with the output
+        and the return value of the job.
+        """
+        self.__number = number
+        self.__line = line
+        self.__future = future
+
+    def number(self):
+        """Returns the job number."""
+        return self.__number
+
+    def line(self):
+        """Returns the command line of the job."""
+        return self.__line
+
+    def is_done(self):
+        """Checks if the job is finished."""
+        return self.__future.done()
+
+    def wait(self):
+        """
+        Waits for the job to finish.
+        :return: the return value of the job (int).
+        """
+        return self.__future.result()[1]
+
+    def output(self):
+        """
+        Waits for the job to finish.
+        :return: the Stream instance with the output of the job.
+        """
+        buffer = self.__future.result()[0]
+        return Stream(buffer.chunks(), buffer.is_binary())
+
+    def state(self):
+        """Returns the state of the job as the 'jobs' command prints it."""
+        if not self.is_done():
+            return 'Running'
+        return_value = self.wait()
+        return 'Exit {}'.format(return_value) if return_value else 'Done'
+
+
+class JobManager:
+    """
+    Starts command trees as jobs of the event loop and keeps the table of jobs.
+
+    manager = get_job_manager()
+    job = manager.start('grep x big.log', command, env, executor)
+    return_value = job.wait()
+    output = job.output()
+    """
+
+    def __init__(self, max_jobs=32):
+        """
+        Starts the event loop in the daemon thread.
+        :param max_jobs: maximal number of jobs running at the same time (int).
+        """
+        self.__loop = asyncio.new_event_loop()
+        self.__loop.set_default_executor(ThreadPoolExecutor(max_jobs, 'job'))
+        self.__jobs = OrderedDict()
+        self.__lock = threading.Lock()
+        thread = threading.Thread(target=self.__loop.run_forever, daemon=True)
+        thread.start()
+
+    def start(self, line, command, env, executor):
+        """
+        Starts the job. The job number is the least number
+        greater than numbers of all jobs in the table.
+        :param line: the command line without '&' (string).
+        :param command: the root of the Command tree.
+        :param env: the Environment instance, the job gets its copy.
+        :param executor: the PipelineExecutor instance running the command.
+        :return: the Job instance.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self.__run(copy.deepcopy(command), env.copy(), executor), self.__loop)
+        with self.__lock:
+            number = next(reversed(self.__jobs), 0) + 1
+            job = Job(number, line, future)
+            self.__jobs[number] = job
+        return job
+
+    def jobs(self):
+        """Returns the list of all jobs in the table."""
+        with self.__lock:
+            return list(self.__jobs.values())
+
+    def get(self, number=None):
+        """
+        Returns the job by its number or the last started job.
+        :param number: the job number (int) or None.
+        :return: the Job instance or None if there is no such job.
+        """
+        with self.__lock:
+            if number is None:
+                return self.__jobs[next(reversed(self.__jobs))] if self.__jobs else None
+            return self.__jobs.get(number)
+
+    def find(self, spec):
+        """
+        Returns the job by its number given as the argument of the command.
+        :param spec: the job number with the optional '%' before it (string).
+        :return: the Job instance or None if there is no such job.
+        """
+        number = spec[1:] if spec.startswith('%') else spec
+        return self.get(int(number)) if number.isdigit() else None
+
+    def remove(self, job):
+        """Removes the job from the table."""
+        with self.__lock:
+            self.__jobs.pop(job.number(), None)
+
+    def finished(self):
+        """Removes finished jobs from the table and returns them."""
+        with self.__lock:
+            jobs = [job for job in self.__jobs.values() if job.is_done()]
+            for job in jobs:
+                del self.__jobs[job.number()]
+        return jobs
+
+    def wait_all(self):
+        """Waits for all jobs in the table to finish."""
+        for job in self.jobs():
+            job.wait()
+
+    async def __run(self, command, env, executor):
+        """The task of the job: runs the command in the thread pool of the loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, JobManager.__execute, command, env, executor)
+
+    @staticmethod
+    def __execute(command, env, executor):
+        """
+        Runs the command and reads its whole output.
+        :return: pair of the SpillBuffer with the output and the return value.
+        """
+        try:
+            result = executor.run(command, Stream(), env)
+            stream = result.get_stream()
+            buffer = SpillBuffer(stream.is_binary())
+            for chunk in stream.chunks():
+                buffer.write(chunk)
+            return buffer, result.return_value()
+        except Exception as ex:
+            buffer = SpillBuffer()
+            buffer.write('Job failed: {}{}'.format(str(ex) or type(ex).__name__, os.linesep))
+            return buffer, 1
+
+
+def get_job_manager():
+    """Returns the JobManager instance shared by the CLI and job commands."""
+    global __manager
+    with __lock:
+        if __manager is None:
+            __manager = JobManager()
+        return __manager
@@ -4,6 +4,7 @@ which are word or collocation with certain meaning and option.
 """
 
 from enum import Enum
+import re
 
 
 class Lexeme_type(Enum):
@@ -14,13 +15,21 @@ class Lexeme_type(Enum):
     STRING_WITH_QUOTES - string with single or double quotes around;
     STRING - single word or sequence of symbols without spaces;
     PIPE - "|" symbol;
-    ASSIGNMENT - the expression with '=' symbol.
+    ASSIGNMENT - the expression with '=' symbol;
+    AMPERSAND - "&" symbol;
+    SEMICOLON - ";" symbol;
+    AND - "&&" symbols;
+    OR - "||" symbols.
     """
     VAR = 1
     STRING_WITH_QUOTES = 2
     STRING = 3
     ASSIGNMENT = 4
     PIPE = 5
+    AMPERSAND = 6
+    SEMICOLON = 7
+    AND = 8
+    OR = 9
 
 
 class LexerException(Exception):
@@ -55,82 +64,90 @@ class Lexer:
     """
     The Lexer class for lexing the input string.
     Splits the input into list of lexemes.
+    The input is walked once from the left to the right: the kind
+    of every lexeme is chosen by its first symbol and its end is found
+    by the compiled regular expression or the search from the current index,
+    so the time of lexing is linear in the length of the input.
+    Symbols of operators end words, so 'echo a;echo b' has four words.
     """
+    __SPACES = re.compile(' *')
+    __WORD = re.compile('[^ ;&|]*')
+    __QUOTES = ('\"', '\'')
+    __OPERATORS = {';': Lexeme_type.SEMICOLON, '&&': Lexeme_type.AND,
+                   '||': Lexeme_type.OR, '|': Lexeme_type.PIPE, '&': Lexeme_type.AMPERSAND}
+
     def get_lexemes(self, str):
         """
         Takes the input string,
         splits in by spaces into words
         and gives thew the type.
+        The symbol following each lexeme is treated as the separator,
+        unless it is the symbol of the operator.
         :param str: the input string.
         :return: list of Lexemes.
         """
         self.__input = str
-        self.__cur_ix = 0
         self.__last_ix = len(str)
-        self.__list_lexems = []
-
-        while self.__cur_ix < self.__last_ix:
-            while self.__input[self.__cur_ix] is ' ':
-                self.__cur_ix = self.__next_idx()
-            self.__list_lexems.append(self.__get_lexem())
-            self.__cur_ix = self.__next_idx()
-        return self.__list_lexems
-
-    def __get_lexem(self):
+        list_lexems = []
+        ix = 0
+
+        while ix < self.__last_ix:
+            ix = Lexer.__SPACES.match(str, ix).end()
+            if ix == self.__last_ix:
+                break
+            lexem, ix = self.__get_lexem(ix)
+            list_lexems.append(lexem)
+            if lexem.type() not in Lexer.__OPERATORS.values() and \
+                    self.__input[ix:ix + 1] not in (';', '&', '|'):
+                ix += 1
+        return list_lexems
+
+    def __get_lexem(self, ix):
         """
-        Takes the next lexeme from current index.
-        :return: the next Lexeme.
+        Takes the next lexeme from the given index.
+        :param ix: index of the first symbol of the lexeme (int).
+        :return: pair of the next Lexeme and the index after it.
         """
-        ix = self.__cur_ix
+        symbol = self.__input[ix]
 
-        if self.__input[ix] is '|':
-            lexem_value = '|'
-            lexem_type = Lexeme_type.PIPE
-            self.__cur_ix = self.__next_idx()
+        if symbol in (';', '&', '|'):
+            operator = self.__input[ix:ix + 2]
+            if operator not in Lexer.__OPERATORS:
+                operator = symbol
+            return Lexeme(operator, Lexer.__OPERATORS[operator]), ix + len(operator)
 
-        elif self.__input[ix] in ('\"', '\''):
-            quote = self.__input[ix]
-            ix = self.__next_idx(quote, self.__cur_ix + 1)
-            if ix >= self.__last_ix:
-                raise LexerException('Missing second quote for fist one '
-                                     'at position {}.'.format(self.__cur_ix))
-            lexem_value = self.__input[self.__cur_ix:ix+1]
-            self.__cur_ix = ix + 1
-            if self.__cur_ix < self.__last_ix - 1 and \
-                    ((self.__input[self.__cur_ix]).isalpha() or
-                      self.__input[self.__cur_ix] in ['\'', '\"']):
-                following_text = self.__get_lexem().value()
-                lexem_value += following_text
-            lexem_type = Lexeme_type.STRING_WITH_QUOTES
-
-        elif self.__input[ix] is '$':
-            lexem_type = Lexeme_type.VAR
-            ix = self.__next_idx(' ', self.__cur_ix)
-            lexem_value = self.__input[self.__cur_ix:ix]
-            self.__cur_ix = ix
+        if symbol in Lexer.__QUOTES:
+            end = self.__end_of_quotes(ix)
+            return Lexeme(self.__input[ix:end], Lexeme_type.STRING_WITH_QUOTES), end
 
+        end = Lexer.__WORD.match(self.__input, ix).end()
+        if symbol == '$':
+            lexem_type = Lexeme_type.VAR
+        elif self.__input.find('=', ix, end) != -1:
+            lexem_type = Lexeme_type.ASSIGNMENT
         else:
             lexem_type = Lexeme_type.STRING
-            ix = self.__next_idx(' ', self.__cur_ix)
-            lexem_value = self.__input[self.__cur_ix:ix]
-            eq_symb_ix = lexem_value.find('=')
-            if eq_symb_ix is not -1:
-                lexem_type = Lexeme_type.ASSIGNMENT
-            self.__cur_ix = ix
-        return Lexeme(lexem_value, lexem_type)
-
-    def __next_idx(self, symbol=None, ix=None):
+        return Lexeme(self.__input[ix:end], lexem_type), end
+
+    def __end_of_quotes(self, ix):
         """
-        Returns the index or the last index if it is the end of string.
-        If the symbol and index are given returns the next index
-        of the given symbol from the given index.
+        Finds the end of the string with quotes.
+        Quoted strings and words that follow the closing quote
+        without spaces belong to the same lexeme.
+        :param ix: index of the opening quote (int).
+        :return: index after the lexeme.
         """
-        if symbol is not None:
-            d_ix = (self.__input[ix:]).find(symbol)
-            if d_ix is -1:
-                return self.__last_ix
-            return ix + d_ix
-        else:
-            if self.__cur_ix + 1 > self.__last_ix:
-                return self.__last_ix + 1
-            return self.__cur_ix + 1
+        while True:
+            close_ix = self.__input.find(self.__input[ix], ix + 1)
+            if close_ix == -1:
+                raise LexerException('Missing second quote for fist one '
+                                     'at position {}.'.format(ix))
+            ix = close_ix + 1
+            if ix >= self.__last_ix - 1:
+                return ix
+            symbol = self.__input[ix]
+            if symbol in Lexer.__QUOTES:
+                continue
+            if symbol.isalpha():
+                return Lexer.__WORD.match(self.__input, ix).end()
+            return ix
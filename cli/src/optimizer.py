@@ -0,0 +1,179 @@
+"""
+The optimizer of command trees.
+
+The Parser builds the tree as the line is written, so 'cat file | grep x'
+reads the file into the Stream only to pass it to 'grep'. The optimizer
+runs between the Parser and the PipelineExecutor and replaces adjacent
+stages of the pipe with one CommandFUSED:
+
+    cat FILE | grep PATTERN             grep PATTERN FILE
+    cat FILE | wc [-l]                  wc [-l] counting FILE as its input
+    cat FILE | head|tail [-n NUM]       head|tail [-n NUM] FILE
+    grep PATTERN [FILE...] | wc -l      grep -c PATTERN [FILE...]
+
+Stages are fused from the left, so 'cat f | grep x | wc -l' becomes
+one 'grep -c' scanning the file. Only 'grep' with the -i and -w keys
+is fused, other keys change what 'wc' would count. The fused stage keeps
+the original commands and runs them instead if some file is missing
+or empty, so errors are the same as without the optimizer.
+
+Pipes of lists of commands joined by ';', '&&', '||' and '&'
+are optimized one by one, parts of lists parsed only when they run
+are optimized after they are parsed.
+
+The line starting with the 'explain' word prints the optimized plan
+instead of running the line.
+"""
+from functools import reduce
+from src.commands import *
+from src.profiler import command_name
+
+GREP_KEYS = ('-i', '--ignore-case', '-w', '--word-regexp')
+
+
+def optimize(command):
+    """
+    Fuses stages of pipes of the Command tree.
+    :param command: the root of the Command tree.
+    :return: the root of the optimized tree, the same tree if nothing is fused.
+    """
+    if isinstance(command, CommandEXPLAIN):
+        inner = optimize(command.get_command())
+        return CommandEXPLAIN(inner, explain(inner))
+    if isinstance(command, (CommandTIME, CommandBACKGROUND)):
+        inner = optimize(command.get_command())
+        return command if inner is command.get_command() else type(command)(inner)
+    if isinstance(command, CommandLIST):
+        left = optimize(command.get_left())
+        right = optimize(command.get_right())
+        if left is command.get_left() and right is command.get_right():
+            return command
+        return type(command)(left, right)
+    if isinstance(command, CommandDEFERRED):
+        return CommandDEFERRED(lambda env: optimize(command.build(env)), command.get_text())
+    if not isinstance(command, CommandPIPE):
+        return command
+    stages = []
+    fused = False
+    for stage in command.stages():
+        stages.append(stage)
+        while len(stages) > 1:
+            stage = _fuse(stages[-2], stages[-1])
+            if stage is None:
+                break
+            stages[-2:] = [stage]
+            fused = True
+    return reduce(CommandPIPE, stages) if fused else command
+
+
+def explain(command):
+    """
+    Describes the Command tree, one line for every stage of the pipe.
+    Fused stages are followed by the commands they replace.
+    Pipes of the list are described one by one with operators between them.
+    :param command: the root of the Command tree.
+    :return: list of strings.
+    """
+    for wrapper, title in ((CommandTIME, 'time'), (CommandBACKGROUND, 'background job'),
+                           (CommandEXPLAIN, 'explain')):
+        if isinstance(command, wrapper):
+            return [title] + ['    ' + line for line in explain(command.get_command())]
+    if isinstance(command, CommandLIST):
+        return explain(command.get_left()) + [command.OPERATOR] + explain(command.get_right())
+    if isinstance(command, CommandDEFERRED):
+        return ['{}    <- parsed when it runs'.format(command.get_text())]
+    stages = command.stages() if isinstance(command, CommandPIPE) else [command]
+    lines = []
+    for number, stage in enumerate(stages, 1):
+        line = '{}. {}'.format(number, describe(stage))
+        if isinstance(stage, CommandFUSED):
+            line += '    <- {}'.format(describe(stage.get_original()))
+        lines.append(line)
+    return lines
+
+
+def describe(command):
+    """
+    Returns the command with its arguments as one line,
+    stages of the pipe are joined by '|', commands of the list by its operator.
+    :param command: the Command instance.
+    """
+    if isinstance(command, CommandFUSED):
+        return describe(command.get_command())
+    if isinstance(command, CommandPIPE):
+        return ' | '.join(describe(stage) for stage in command.stages())
+    if isinstance(command, CommandLIST):
+        return ' {} '.format(command.OPERATOR).join(describe(item) for item in command.items())
+    if isinstance(command, CommandDEFERRED):
+        return command.get_text()
+    if hasattr(command, 'get_commands'):
+        return 'external: ' + ' | '.join(' '.join(external.get_args_list())
+                                         for external in command.get_commands())
+    if isinstance(command, CommandWC) and command.get_input_files() is not None:
+        return ' '.join(['wc'] + command.get_args() + ['<'] + command.get_input_files())
+    if hasattr(command, 'get_args'):
+        return ' '.join([command_name(command)] + command.get_args())
+    return command_name(command)
+
+
+def _fuse(left, right):
+    """
+    Fuses two adjacent stages of the pipe.
+    :param left: the left Command, maybe already fused.
+    :param right: the right Command, never fused.
+    :return: the CommandFUSED instance or None if the stages cannot be fused.
+    """
+    original = CommandPIPE(_original(left), _original(right))
+    if isinstance(left, CommandCAT) and len(left.get_args()) == 1 and \
+            not left.get_args()[0].startswith('-'):
+        files = left.get_args()
+        if isinstance(right, CommandGREP) and _is_plain_grep(right.get_args(), False):
+            grep = CommandGREP()
+            grep.set_args(right.get_args() + files)
+            return CommandFUSED(grep, original, files)
+        if isinstance(right, CommandWC) and \
+                all(arg in CommandWC.LINES_KEYS for arg in right.get_args()):
+            wc = CommandWC()
+            wc.set_args(list(right.get_args()))
+            wc.set_input_files(files)
+            return CommandFUSED(wc, original, files)
+        if isinstance(right, (CommandHEAD, CommandTAIL)):
+            _, right_files, error = parse_count_args('', right.get_args())
+            if error is None and not right_files:
+                command = type(right)()
+                command.set_args(right.get_args() + files)
+                return CommandFUSED(command, original, files)
+        return None
+
+    files = []
+    grep = left
+    if isinstance(left, CommandFUSED) and not left.counts_lines():
+        files = left.get_files()
+        grep = left.get_command()
+    if isinstance(grep, CommandGREP) and _is_plain_grep(grep.get_args(), True) and \
+            isinstance(right, CommandWC) and len(right.get_args()) == 1 and \
+            right.get_args()[0] in CommandWC.LINES_KEYS:
+        counter = CommandGREP()
+        counter.set_args(['-c'] + grep.get_args())
+        return CommandFUSED(counter, original, files, count_lines=True)
+    return None
+
+
+def _original(command):
+    """Returns the Command replaced by the fused one or the Command itself."""
+    return command.get_original() if isinstance(command, CommandFUSED) else command
+
+
+def _is_plain_grep(args, with_files):
+    """
+    Checks if 'grep' has only the pattern, the -i and -w keys
+    and, if with_files, names of files.
+    :param args: list of arguments.
+    :param with_files: files are allowed (bool).
+    """
+    keys = [arg for arg in args if arg.startswith('-')]
+    if any(key not in GREP_KEYS and not (len(key) > 1 and set(key[1:]) <= set('iw'))
+           for key in keys):
+        return False
+    positional = len(args) - len(keys)
+    return positional >= 1 if with_files else positional == 1
@@ -5,6 +5,7 @@ It also uses the static Preprocessor class for variables substitution.
 from src.lexer import *
 from src.commands import *
 from src.preprocessor import *
+import time
 
 
 class Parser:
@@ -12,6 +13,11 @@ class Parser:
     The Parser class that takes list lexemes
     from Lexer and makes the commands tree from it.
     """
+    __PRIORITIES = {Lexeme_type.SEMICOLON: 0, Lexeme_type.AMPERSAND: 1,
+                    Lexeme_type.AND: 2, Lexeme_type.OR: 2}
+    __LISTS = {Lexeme_type.SEMICOLON: CommandSEQUENCE, Lexeme_type.AMPERSAND: CommandPARALLEL,
+               Lexeme_type.AND: CommandAND, Lexeme_type.OR: CommandOR}
+
     def __init__(self, environment):
         """
         Takes the current environment.
@@ -19,16 +25,119 @@ class Parser:
         """
         self.__env = environment
 
-    def build_command(self, list_of_lexems):
+    def build_command(self, list_of_lexems, profile=None):
         """
         Takes lexemes and builds the commands tree
         while the current index is not the last.
+        Pipes joined by ';', '&&', '||' and '&' are built as lists of commands.
+        The line starting with the 'time' word is built
+        as the CommandTIME with the rest of the line inside,
+        the line starting with the 'explain' word as the CommandEXPLAIN.
         :param list_of_lexems: list of Lexemes.
+        :param profile: the LineProfile getting the time of substitution
+        of variables or None.
+        :return: the root of the Command tree.
+        """
+        self.__profile = profile
+        if len(list_of_lexems) > 1 and list_of_lexems[0].type() == Lexeme_type.STRING \
+                and list_of_lexems[0].value() == 'explain':
+            return CommandEXPLAIN(self.build_command(list_of_lexems[1:], profile))
+        if len(list_of_lexems) > 1 and list_of_lexems[0].type() == Lexeme_type.STRING \
+                and list_of_lexems[0].value() == 'time':
+            command = self.build_command(list_of_lexems[1:], profile)
+            if isinstance(command, CommandBACKGROUND):
+                return CommandBACKGROUND(CommandTIME(command.get_command()))
+            return CommandTIME(command)
+        return self.__build_list(list_of_lexems)
+
+    def __build_list(self, lexemes):
+        """
+        Splits lexemes by operators of lists and joins pipes between them.
+        The ';' operator binds the loosest, then '&', then '&&' and '||'
+        with the same priority, operators of the same priority
+        are joined from the left. The ';' at the end is ignored,
+        the line ending with '&' is the CommandBACKGROUND.
+        :param lexemes: list of Lexemes.
+        :return: the root of the Command tree.
+        """
+        background = False
+        if lexemes and lexemes[-1].type() in (Lexeme_type.SEMICOLON, Lexeme_type.AMPERSAND):
+            background = lexemes[-1].type() == Lexeme_type.AMPERSAND
+            if len(lexemes) == 1:
+                raise ParserException('Syntax error near unexpected token {}'.
+                                      format(lexemes[-1].value()))
+            lexemes = lexemes[:-1]
+        pipes = [[]]
+        operators = []
+        for lexeme in lexemes:
+            if lexeme.type() in Parser.__PRIORITIES:
+                if not pipes[-1]:
+                    raise ParserException('Syntax error near unexpected token {}'.
+                                          format(lexeme.value()))
+                operators.append(lexeme)
+                pipes.append([])
+            else:
+                pipes[-1].append(lexeme)
+        if not pipes[-1]:
+            raise ParserException('Syntax error near unexpected token {}'.
+                                  format(operators[-1].value()))
+        command = self.__join(pipes, operators)
+        return CommandBACKGROUND(command) if background else command
+
+    def __join(self, pipes, operators):
+        """
+        Builds pipes and joins them by operators: the tree is split
+        by the last operator with the loosest priority.
+        If the left part of ';', '&&' or '||' assigns some variable,
+        the right part is the CommandDEFERRED parsed when it runs,
+        so it gets the new value.
+        :param pipes: list of lists of Lexemes of pipes.
+        :param operators: list of Lexemes of operators between pipes.
         :return: the root of the Command tree.
         """
-        self.__list_lexems = list_of_lexems
+        if not operators:
+            return self.__build_pipe(pipes[0])
+        priorities = [Parser.__PRIORITIES[operator.type()] for operator in operators]
+        ix = len(priorities) - 1 - priorities[::-1].index(min(priorities))
+        left = self.__join(pipes[:ix + 1], operators[:ix])
+        if operators[ix].type() != Lexeme_type.AMPERSAND and \
+                any(lexeme.type() == Lexeme_type.ASSIGNMENT
+                    for pipe in pipes[:ix + 1] for lexeme in pipe):
+            right = self.__defer(pipes[ix + 1:], operators[ix + 1:])
+        else:
+            right = self.__join(pipes[ix + 1:], operators[ix + 1:])
+        return Parser.__LISTS[operators[ix].type()](left, right)
+
+    def __defer(self, pipes, operators):
+        """
+        Makes the CommandDEFERRED building pipes joined by operators
+        by the new Parser with the environment given when it runs.
+        :param pipes: list of lists of Lexemes of pipes.
+        :param operators: list of Lexemes of operators between pipes.
+        :return: the CommandDEFERRED instance.
+        """
+        profile = self.__profile
+
+        def build(env):
+            parser = Parser(env)
+            parser.__profile = profile
+            return parser.__join(pipes, operators)
+        words = [lexeme.value() for lexeme in pipes[0]]
+        for operator, pipe in zip(operators, pipes[1:]):
+            words.append(operator.value())
+            words.extend(lexeme.value() for lexeme in pipe)
+        return CommandDEFERRED(build, ' '.join(words))
+
+    def __build_pipe(self, lexemes):
+        """
+        Builds the command or the pipe of commands from lexemes
+        without operators of lists.
+        :param lexemes: list of Lexemes.
+        :return: the Command.
+        """
+        self.__list_lexems = lexemes
         self.__cur_ix = 0
-        self.__last_ix = len(list_of_lexems)
+        self.__last_ix = len(lexemes)
         self.__commands = []
 
         while self.__cur_ix < self.__last_ix:
@@ -48,13 +157,13 @@ class Parser:
 
         if lexem.type() == Lexeme_type.ASSIGNMENT:
             (name, value) = self.__parse_assignment(lexem)
-            value = Preprocessor.substitute_vars(value, self.__env)
+            value = self.__substitute(value)
             self.__cur_ix += 1
             return CommandASSIGNMENT(name, value)
 
         if lexem.type() == Lexeme_type.VAR:
             self.__cur_ix += 1
-            value = Preprocessor.substitute_vars(lexem.value(), self.__env)
+            value = self.__substitute(lexem.value())
             runnable_value = Lexer().get_lexemes(value)
             if runnable_value:
                 command_name = runnable_value[0].value()
@@ -72,7 +181,7 @@ class Parser:
             args = self.__parse_args(self.__cur_ix)
             value = lexem.value()
             if lexem.type() == Lexeme_type.STRING:
-                value = Preprocessor.substitute_vars(lexem.value(), self.__env)
+                value = self.__substitute(lexem.value())
             return self.__make_certain_command(value, args)
 
         if lexem.type() == Lexeme_type.PIPE:
@@ -88,6 +197,21 @@ class Parser:
             raise ParserException('Syntax error near unexpected token {}'.
                                   format(lexem.value()))
 
+    def __substitute(self, value):
+        """
+        Substitutes variables into the string by the Preprocessor.
+        The time of substitution is added to the profile if it is given.
+        :param value: the string (string).
+        :return: the preprocessed string.
+        """
+        if self.__profile is None:
+            return Preprocessor.substitute_vars(value, self.__env)
+        start = time.perf_counter()
+        try:
+            return Preprocessor.substitute_vars(value, self.__env)
+        finally:
+            self.__profile.add_phase('preprocess', time.perf_counter() - start)
+
     def __parse_assignment(self, lexem):
         """
         Parses the variable name and value of the value of the given
@@ -118,13 +242,13 @@ class Parser:
             return args
         lexem = self.__list_lexems[ix]
         while ix < len(self.__list_lexems) and \
-                self.__list_lexems[ix].type() is not Lexeme_type.PIPE:
+                self.__list_lexems[ix].type() != Lexeme_type.PIPE:
             value = lexem.value()
             lexem_type = self.__list_lexems[ix].type()
             if lexem_type in \
                     [Lexeme_type.VAR, Lexeme_type.STRING, Lexeme_type.STRING_WITH_QUOTES]:
                 value = self.__list_lexems[ix].value()
-                value = Preprocessor.substitute_vars(value, self.__env)
+                value = self.__substitute(value)
             args.append(value)
             ix += 1
         self.__cur_ix = ix
@@ -135,13 +259,18 @@ class Parser:
         The very simple prototype of the command fabric.
         :param name: the name of the command (string).
         :param args: the list of arguments.
-        :return: Certain command with the given name and rhe given arguments.
+        :return: Certain command with the given name and rhe given arguments,
+        the external command if the builtin one does not implement some option.
         """
         self.__commands_list = {'cat': CommandCAT, 'echo': CommandECHO,
                                 'exit': CommandEXIT, 'pwd': CommandPWD,
-                                'wc': CommandWC, 'grep': CommandGREP}
+                                'wc': CommandWC, 'grep': CommandGREP,
+                                'index': CommandINDEX, 'filecache': CommandFILECACHE,
+                                'jobs': CommandJOBS, 'wait': CommandWAIT, 'fg': CommandFG,
+                                'stats': CommandSTATS, 'head': CommandHEAD, 'tail': CommandTAIL,
+                                'sort': CommandSORT, 'uniq': CommandUNIQ}
         command_cls = self.__commands_list.get(name, None)
-        if command_cls:
+        if command_cls and command_cls.supports(args):
             command_cls = command_cls()
             command_cls.set_args(args)
             return command_cls
@@ -23,6 +23,8 @@ Examples:
 """
 
 from src.parser import *
+import functools
+import re
 
 
 class ParserException(Exception):
@@ -30,7 +32,51 @@ class ParserException(Exception):
     pass
 
 
+class Template:
+    """
+    The compiled string: literal parts and references to variables.
+    Rendering only takes values of variables from the environment
+    and joins them with literal parts.
+
+    template = Preprocessor.compile('"$x"\'$x\'')
+    template.render(env)
+    """
+
+    def __init__(self, parts, var_slots):
+        """
+        :param parts: list of literal strings and names of variables.
+        :param var_slots: list of pairs of the index in parts and the variable name.
+        """
+        self.__parts = parts
+        self.__var_slots = var_slots
+
+    def variables(self):
+        """Returns the list of variable names used by the template."""
+        return [name for _, name in self.__var_slots]
+
+    def render(self, env):
+        """
+        Substitutes values of variables from the environment.
+        :param env: the Environment instance with variables.
+        :return: the preprocessed string.
+        """
+        if not self.__var_slots:
+            return ''.join(self.__parts)
+        parts = list(self.__parts)
+        for ix, name in self.__var_slots:
+            parts[ix] = env.get_var_value(name)
+        return ''.join(parts)
+
+
 class Preprocessor:
+    """
+    The static class substituting variables into strings.
+    The string is compiled to the Template by one pass over it
+    and compiled templates of recent strings are kept,
+    so repeated strings are only rendered.
+    """
+    __NAME = re.compile(r'[^\s$\'"]*')
+    __TEXT = re.compile(r'[^$\'"]*')
 
     @staticmethod
     def find_var(str):
@@ -40,14 +86,8 @@ class Preprocessor:
         :param str: the string after the '$' symbol.
         :return: the variable name and the rest of the string.
         """
-        next_index = 0
-        while next_index < len(str):
-            if str[next_index].isspace() or str[next_index] in ('$', '\'', '\"'):
-                break
-            next_index += 1
-        var_name = str[0:next_index]
-        str = str[next_index:]
-        return var_name, str
+        next_index = Preprocessor.__NAME.match(str).end()
+        return str[0:next_index], str[next_index:]
 
     @staticmethod
     def substitute_vars(input, env):
@@ -58,35 +98,20 @@ class Preprocessor:
         :param env: the Environment instance with variables.
         :return: the preprocessed string.
         """
-        result = ''
-        while input:
-            if input[0] == '$':
-                var_name, input = Preprocessor.find_var(input[1:])
-                var_value = env.get_var_value(var_name)
-                result += var_value
-            elif input[0] == '\"':
-                next_index = input[1:].find('\"')
-                if next_index == -1:
-                    raise ParserException('End of line: missing second double quote.')
-                in_quotes = input[1:next_index + 1]
-                ix = in_quotes.find('\'')
-                if ix != -1:
-                    in_quotes = Preprocessor.quotes_in_quotes(in_quotes, env)
-                    input = input[next_index + 1:-1]
-                else:
-                    in_quotes = Preprocessor.substitute_vars(in_quotes, env)
-                    input = input[next_index + 2:]
-                result += in_quotes
-            elif input[0] == '\'':
-                next_index = input[1:].find('\'')
-                if next_index == -1:
-                    raise ParserException('End of line: missing second single quote.')
-                result += input[1:next_index+1]
-                input = input[next_index + 2:]
-            else:
-                result += input[0]
-                input = input[1:]
-        return result
+        return Preprocessor.compile(input).render(env)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def compile(input):
+        """
+        Compiles the string to the Template.
+        Raises the ParserException if some quote has no pair.
+        :param input: the input string.
+        :return: the Template instance.
+        """
+        builder = _TemplateBuilder()
+        Preprocessor.__compile(input, 0, len(input), builder)
+        return builder.build()
 
     @staticmethod
     def quotes_in_quotes(input, env):
@@ -100,18 +125,101 @@ class Preprocessor:
         :param env: the Environment instance with variables.
         :return: the preprocessed string.
         """
-        other_quote = '\''
-        ix = input.find(other_quote)
-        first_part = input[0:ix]
-        first_part = Preprocessor.substitute_vars(first_part, env)
-        ix_next = input[ix + 1:].find(other_quote)
-        if ix_next != -1:
-            ix_next += ix + 1
-            second_part = input[ix + 1:ix_next]
-            second_part = Preprocessor.substitute_vars(second_part, env)
-            third_part = input[ix_next + 1:]
-            third_part = Preprocessor.substitute_vars(third_part, env)
-            in_quotes = other_quote + second_part + other_quote
-            return first_part + in_quotes + third_part
-        return input
+        builder = _TemplateBuilder()
+        Preprocessor.__compile_quotes_in_quotes(input, 0, len(input), builder)
+        return builder.build().render(env)
+
+    @staticmethod
+    def __compile(input, ix, end, builder):
+        """
+        Compiles the part of the string between the given indices.
+        The double quoted part with single quotes inside also cuts
+        the last symbol of the part and keeps the closing double quote,
+        like the original processing of strings did.
+        :param input: the input string.
+        :param ix: the start of the part (int).
+        :param end: the end of the part (int).
+        :param builder: the _TemplateBuilder collecting parts.
+        """
+        while ix < end:
+            symbol = input[ix]
+            if symbol == '$':
+                name_end = Preprocessor.__NAME.match(input, ix + 1, end).end()
+                builder.add_var(input[ix + 1:name_end])
+                ix = name_end
+            elif symbol == '\"':
+                close_ix = input.find('\"', ix + 1, end)
+                if close_ix == -1:
+                    raise ParserException('End of line: missing second double quote.')
+                if input.find('\'', ix + 1, close_ix) != -1:
+                    Preprocessor.__compile_quotes_in_quotes(input, ix + 1, close_ix, builder)
+                    ix = close_ix
+                    end -= 1
+                else:
+                    Preprocessor.__compile(input, ix + 1, close_ix, builder)
+                    ix = close_ix + 1
+            elif symbol == '\'':
+                close_ix = input.find('\'', ix + 1, end)
+                if close_ix == -1:
+                    raise ParserException('End of line: missing second single quote.')
+                builder.add_text(input[ix + 1:close_ix])
+                ix = close_ix + 1
+            else:
+                text_end = Preprocessor.__TEXT.match(input, ix, end).end()
+                builder.add_text(input[ix:text_end])
+                ix = text_end
+
+    @staticmethod
+    def __compile_quotes_in_quotes(input, start, end, builder):
+        """
+        Compiles the part of the string with '\'' quotes within '\"' quotes.
+        Variables are substituted inside single quotes too,
+        the part with the only single quote is kept as is
+        (but the part before the quote is still checked for pairs of quotes).
+        :param input: the input string.
+        :param start: index after the double quote (int).
+        :param end: index of the closing double quote (int).
+        :param builder: the _TemplateBuilder collecting parts.
+        """
+        ix = input.find('\'', start, end)
+        ix_next = input.find('\'', ix + 1, end)
+        if ix_next == -1:
+            Preprocessor.__compile(input, start, ix, _TemplateBuilder())
+            builder.add_text(input[start:end])
+            return
+        Preprocessor.__compile(input, start, ix, builder)
+        builder.add_text('\'')
+        Preprocessor.__compile(input, ix + 1, ix_next, builder)
+        builder.add_text('\'')
+        Preprocessor.__compile(input, ix_next + 1, end, builder)
+
+
+class _TemplateBuilder:
+    """Collects parts of the Template joining adjacent literal parts."""
+
+    def __init__(self):
+        self.__parts = []
+        self.__var_slots = []
+        self.__text = []
+
+    def add_text(self, text):
+        """Adds the literal part."""
+        if text:
+            self.__text.append(text)
+
+    def add_var(self, name):
+        """Adds the reference to the variable."""
+        self.__flush()
+        self.__var_slots.append((len(self.__parts), name))
+        self.__parts.append(name)
+
+    def build(self):
+        """Returns the Template instance."""
+        self.__flush()
+        return Template(self.__parts, self.__var_slots)
 
+    def __flush(self):
+        """Joins collected literal parts."""
+        if self.__text:
+            self.__parts.append(''.join(self.__text))
+            self.__text = []
@@ -0,0 +1,150 @@
+"""
+Timings of executed lines.
+
+The profiling is off by default. When it is on, the CLI makes
+the LineProfile for every line: the time of lexing, parsing and
+substitution of variables, the time of running the whole line
+and the time of every command of the pipe, from its start
+till the end of its output. Profiles of recent lines are kept
+in the ring buffer of the Profiler and the 'stats' command prints
+percentiles of these times for every command name.
+
+When the profiling is off, no LineProfile is made and the parser
+and the executor only check that they have got None instead of it.
+"""
+from collections import deque
+from src.iostreams import Stream
+import threading
+import time
+
+PHASES = ('lex', 'parse', 'preprocess', 'run')
+
+__profiler = None
+__lock = threading.Lock()
+
+
+class LineProfile:
+    """Timings of one executed line in seconds."""
+
+    def __init__(self, line):
+        """
+        :param line: the input string.
+        """
+        self.line = line
+        self.cached = False
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.stages = []
+        self.__lock = threading.Lock()
+
+    def add_phase(self, phase, elapsed):
+        """Adds the time to the phase of the line."""
+        self.phases[phase] += elapsed
+
+    def add_stage(self, name, elapsed):
+        """Adds the time of the command of the pipe, commands end in their own threads."""
+        with self.__lock:
+            self.stages.append((name, elapsed))
+
+    def time_stage(self, name, start, stream):
+        """
+        Wraps the output of the command, so its time is added
+        when the output is read till the end or closed.
+        :param name: the command name (string).
+        :param start: the time the command started at (time.perf_counter).
+        :param stream: the Stream instance with the command output.
+        :return: the Stream instance with the same content.
+        """
+        def chunks():
+            try:
+                yield from stream.chunks()
+            finally:
+                self.add_stage(name, time.perf_counter() - start)
+        return Stream(chunks(), stream.is_binary())
+
+
+class Profiler:
+    """
+    The ring buffer of LineProfiles of recent lines.
+
+    profiler = get_profiler()
+    profiler.enable(True)
+    ...
+    for name, count, percentiles in profiler.percentiles():
+        ...
+    """
+
+    def __init__(self, size=10000):
+        """
+        :param size: maximal number of kept LineProfiles (int).
+        """
+        self.__enabled = False
+        self.__profiles = deque(maxlen=size)
+        self.__lock = threading.Lock()
+
+    def enable(self, enabled):
+        """Turns the profiling on or off."""
+        self.__enabled = enabled
+
+    def is_enabled(self):
+        """Checks if the profiling is on."""
+        return self.__enabled
+
+    def add(self, profile):
+        """Puts the LineProfile to the buffer, the oldest one is removed if it is full."""
+        with self.__lock:
+            self.__profiles.append(profile)
+
+    def profiles(self):
+        """Returns the list of kept LineProfiles from the oldest one."""
+        with self.__lock:
+            return list(self.__profiles)
+
+    def clear(self):
+        """Removes all kept LineProfiles."""
+        with self.__lock:
+            self.__profiles.clear()
+
+    def percentiles(self, levels=(50, 90, 99, 100)):
+        """
+        Computes percentiles of times of phases and of every command.
+        Phases are named in brackets, i.e. '[lex]'.
+        :param levels: percents of wanted percentiles.
+        :return: list of triples: the name, the number of times
+        and the list of percentiles in seconds.
+        """
+        times = {}
+        for profile in self.profiles():
+            for phase in PHASES:
+                times.setdefault('[{}]'.format(phase), []).append(profile.phases[phase])
+            for name, elapsed in profile.stages:
+                times.setdefault(name, []).append(elapsed)
+        result = []
+        for name, values in times.items():
+            values.sort()
+            result.append((name, len(values),
+                           [values[max(0, -(-len(values) * level // 100) - 1)] for level in levels]))
+        return result
+
+
+def command_name(command):
+    """
+    Returns the name of the command for the profile:
+    names of external commands and of builtins, the fused stage
+    is named after the command doing its work.
+    :param command: the Command instance.
+    """
+    if hasattr(command, 'get_original'):
+        return command_name(command.get_command())
+    if hasattr(command, 'get_commands'):
+        return ' | '.join(external.get_args_list()[0] for external in command.get_commands())
+    name = type(command).__name__
+    return name[len('Command'):].lower() if name.startswith('Command') else name
+
+
+def get_profiler():
+    """Returns the Profiler instance shared by the CLI and the 'stats' command."""
+    global __profiler
+    with __lock:
+        if __profiler is None:
+            __profiler = Profiler()
+        return __profiler
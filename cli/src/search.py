@@ -0,0 +1,493 @@
+"""
+The engine of the 'grep' command.
+The Matcher compiles the pattern once and scans every line in linear time:
+the line is checked by one search and only matching lines
+are highlighted by one substitution of all matches.
+
+Big files are searched by the pool of processes: the memory-mapped file
+is split into chunks ending on line boundaries, each process finds
+candidate lines of its chunk by the bytes regular expression, checks them
+decoded by the string one and returns offsets of matching lines,
+which are merged back in the order of the file.
+
+Files kept by the file cache are searched as one text at once.
+
+Matching lines can also be only counted ('grep -c'): then lines
+are checked by one search and never highlighted.
+
+Directory trees are walked by os.scandir and their files are searched
+by the pool of processes, results are printed as each file is finished.
+"""
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+from collections import deque
+import concurrent.futures
+import io
+import locale
+import mmap
+import os
+import re
+
+HIGHLIGHT = '\x1b[1;31m{}\x1b[0m'
+SEPARATOR = '\x1b[0;34m---\x1b[0m'
+MIN_CHUNK_SIZE = 4 * 1024 * 1024
+SNIFF_SIZE = 1024
+_LINE_BOUND = ('\\A', '\\Z', '(?=', '(?!', '(?<')
+_ANCHORS = (sre_parse.AT_BEGINNING, sre_parse.AT_END,
+            sre_parse.AT_BEGINNING_STRING, sre_parse.AT_END_STRING)
+_REPEATS = tuple(getattr(sre_parse, name) for name in
+                 ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT') if hasattr(sre_parse, name))
+_ATOMIC_GROUP = getattr(sre_parse, 'ATOMIC_GROUP', None)
+
+
+class Matcher:
+    """
+    The compiled pattern of the 'grep' command.
+
+    matcher = Matcher('does', ignore_case=True, word_regexp=True)
+    matcher.highlight('Does he smoke?')
+    """
+
+    def __init__(self, pattern, ignore_case=False, word_regexp=False):
+        """
+        :param pattern: the regular expression (string).
+        :param ignore_case: ignore case distinctions (bool).
+        :param word_regexp: select only matches that form whole words (bool).
+        """
+        self.__source = pattern
+        if word_regexp:
+            pattern = r'(?<!\w)(?:{})(?!\w)'.format(pattern)
+        self.__pattern = pattern
+        self.__flags = re.IGNORECASE if ignore_case else 0
+        self.__regex = re.compile(pattern, self.__flags)
+        self.__search = self.__regex.search
+        self.__sub = self.__regex.sub
+
+    def source(self):
+        """Returns the regular expression as it was given (string)."""
+        return self.__source
+
+    def pattern(self):
+        """Returns the regular expression with applied options (string)."""
+        return self.__pattern
+
+    def flags(self):
+        """Returns flags of the regular expression (int)."""
+        return self.__flags
+
+    def highlight(self, line):
+        """
+        Highlights all matches in the line.
+        :param line: the string without the newline symbol.
+        :return: the highlighted line or None if the line does not match.
+        """
+        if self.__search(line) is None:
+            return None
+        return self.__sub(_highlight_match, line)
+
+    def matches(self, line):
+        """
+        Checks if the line matches without highlighting it.
+        :param line: the string without the newline symbol.
+        """
+        return self.__search(line) is not None
+
+
+def _highlight_match(matched):
+    """Returns the highlighted text of the match, empty matches are not highlighted."""
+    text = matched.group()
+    if text:
+        return HIGHLIGHT.format(text)
+    return text
+
+
+def grep_lines(matcher, lines, after_context=None, prefix=''):
+    """
+    Yields the result of search in the given lines: highlighted matching lines
+    and after_context lines after each of them. The separator is printed
+    after the context if there are more lines.
+    :param matcher: the Matcher instance.
+    :param lines: iterable with lines, each except maybe the last one
+    ends with the newline symbol.
+    :param after_context: number of lines printed after the matching line or None.
+    :param prefix: the string printed before every found line, i.e. the file name.
+    """
+    if not after_context:
+        highlight = matcher.highlight
+        for line in lines:
+            highlighted = highlight(line.rstrip('\r\n'))
+            if highlighted is not None:
+                yield prefix + highlighted + os.linesep
+        return
+
+    lines_after = 0
+    lines = iter(lines)
+    line = next(lines, None)
+    while line is not None:
+        next_line = next(lines, None)
+        text = line.rstrip('\r\n')
+        highlighted = matcher.highlight(text)
+        if highlighted is not None:
+            lines_after = after_context
+            yield prefix + highlighted + os.linesep
+        elif lines_after > 0:
+            lines_after -= 1
+            yield prefix + text + os.linesep
+            if lines_after == 0 and next_line is not None:
+                yield SEPARATOR + os.linesep
+        line = next_line
+
+
+def count_lines(matcher, lines):
+    """
+    Counts lines matching the pattern, the same lines grep_lines finds.
+    :param matcher: the Matcher instance.
+    :param lines: iterable with lines.
+    :return: the number of matching lines (int).
+    """
+    matches = matcher.matches
+    return sum(1 for line in lines if matches(line.rstrip('\r\n')))
+
+
+def grep_text(matcher, cached, after_context=None):
+    """
+    Yields the result of search in the cached file like grep_lines does.
+    Without the context the whole text is searched at once
+    and only lines containing found matches are checked separately.
+    Patterns that depend on the start or the end of the text
+    or look around are checked line by line.
+    :param matcher: the Matcher instance.
+    :param cached: the CachedFile instance.
+    :param after_context: number of lines printed after the matching line or None.
+    """
+    source = matcher.source()
+    if after_context or _is_line_bound(source):
+        yield from grep_lines(matcher, cached.lines(), after_context)
+        return
+    text = cached.text()
+    size = len(text)
+    search = re.compile(matcher.pattern(), matcher.flags() | re.MULTILINE).search
+    highlight = matcher.highlight
+    position = 0
+    while position <= size:
+        matched = search(text, position)
+        if matched is None:
+            return
+        start = matched.start()
+        if start == size and (not size or text[size - 1] == '\n'):
+            return
+        line_start = text.rfind('\n', 0, start) + 1
+        line_end = text.find('\n', start)
+        if line_end == -1:
+            line_end = size
+        highlighted = highlight(text[line_start:line_end])
+        if highlighted is not None:
+            yield highlighted + os.linesep
+        position = line_end + 1
+
+
+def grep_mapped_file(matcher, file_path, after_context, pool):
+    """
+    Yields the result of search in the big file like grep_lines does.
+    Chunks of the file are scanned by processes of the pool,
+    the output is produced in the order of the file.
+    :param matcher: the Matcher instance.
+    :param file_path: path to the existing file (string).
+    :param after_context: number of lines printed after the matching line or None.
+    :param pool: the concurrent.futures.Executor instance.
+    """
+    encoding = locale.getpreferredencoding(False)
+    with open(file_path, 'rb') as opened_file:
+        size = os.fstat(opened_file.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(opened_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            results = _scan_mapped(matcher, file_path, mapped, pool)
+            lines_after = 0
+            cursor = 0
+            for matches in results:
+                for start, end in matches:
+                    while lines_after > 0 and cursor < start:
+                        line_end = mapped.find(b'\n', cursor, start)
+                        yield _decode(mapped[cursor:line_end], encoding) + os.linesep
+                        lines_after -= 1
+                        cursor = line_end + 1
+                        if lines_after == 0:
+                            yield SEPARATOR + os.linesep
+                    highlighted = matcher.highlight(_decode(mapped[start:end], encoding))
+                    if highlighted is None:
+                        continue
+                    yield highlighted + os.linesep
+                    lines_after = after_context or 0
+                    cursor = end + 1
+            while lines_after > 0 and cursor < size:
+                line_end = mapped.find(b'\n', cursor)
+                if line_end == -1:
+                    line_end = size
+                yield _decode(mapped[cursor:line_end], encoding) + os.linesep
+                lines_after -= 1
+                cursor = line_end + 1
+                if lines_after == 0 and cursor < size:
+                    yield SEPARATOR + os.linesep
+
+
+def count_mapped_file(matcher, file_path, pool):
+    """
+    Counts lines of the big file matching the pattern, the same lines
+    grep_mapped_file finds. Chunks of the file are scanned by processes of the pool.
+    :param matcher: the Matcher instance.
+    :param file_path: path to the existing file (string).
+    :param pool: the concurrent.futures.Executor instance.
+    :return: the number of matching lines (int).
+    """
+    with open(file_path, 'rb') as opened_file:
+        if not os.fstat(opened_file.fileno()).st_size:
+            return 0
+        with mmap.mmap(opened_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return sum(len(matches) for matches in
+                       _scan_mapped(matcher, file_path, mapped, pool))
+
+
+def _scan_mapped(matcher, file_path, mapped, pool):
+    """
+    Splits the memory-mapped file into chunks and scans them by processes of the pool.
+    :return: iterable with lists of offsets of matching lines
+    (see scan_chunk) in the order of the file.
+    """
+    bounds = _split_lines(mapped, max(1, min(len(mapped) // MIN_CHUNK_SIZE,
+                                             4 * (os.cpu_count() or 1))))
+    return pool.map(scan_chunk, [file_path] * (len(bounds) - 1),
+                    bounds[:-1], bounds[1:],
+                    [matcher.pattern()] * (len(bounds) - 1),
+                    [matcher.flags()] * (len(bounds) - 1))
+
+
+def scan_chunk(file_path, start, end, pattern, flags):
+    """
+    Finds lines matching the pattern in the chunk of the file.
+    Every line is decoded and checked by the same string regular expression
+    the Matcher has, so the result is the same as for small files.
+    If the bytes regular expression finds all such lines (see _bytes_regex),
+    the whole chunk is searched by it at once and only lines containing
+    the found match are checked, so lines without matches are skipped quickly.
+    Otherwise lines are checked one by one, as well as if the pattern depends
+    on the start or the end of the text or looks around (like in grep_text),
+    or if it may match at the line end and lines end with the carriage return.
+    :param file_path: path to the file (string).
+    :param start: offset of the first line of the chunk (int).
+    :param end: offset after the last line of the chunk (int).
+    :param pattern: the regular expression (string).
+    :param flags: flags of the regular expression (int).
+    :return: list of pairs with offsets of the line start
+    and the newline symbol at the line end.
+    """
+    encoding = locale.getpreferredencoding(False)
+    chunk_regex = _bytes_regex(pattern, flags)
+    search = re.compile(pattern, flags).search
+    matches = []
+    with open(file_path, 'rb') as opened_file:
+        with mmap.mmap(opened_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            by_lines = chunk_regex is None or _is_line_bound(pattern) or \
+                ('$' in pattern and mapped.find(b'\r', start, end) != -1)
+            position = start
+            while position < end:
+                if by_lines:
+                    line_start = position
+                else:
+                    matched = chunk_regex.search(mapped, position, end)
+                    if matched is None or \
+                            (matched.start() == end and mapped[end - 1] == ord('\n')):
+                        break
+                    line_start = mapped.rfind(b'\n', start, matched.start()) + 1 or start
+                line_end = mapped.find(b'\n', line_start, end)
+                if line_end == -1:
+                    line_end = end
+                if search(_decode(mapped[line_start:line_end], encoding)) is not None:
+                    matches.append((line_start, line_end))
+                position = line_end + 1
+    return matches
+
+
+def _bytes_regex(pattern, flags):
+    """
+    Compiles the bytes regular expression finding candidate lines in chunks.
+    It is made only of ASCII literals, positive classes of them, anchors,
+    groups, repeats and alternatives, and the case is not ignored:
+    such bytes match exactly the same text in any ASCII compatible encoding.
+    Other parts ('.', '\\w', '\\b', non-ASCII symbols and so on) match
+    single bytes or only ASCII ones, so lines with matches could be missed.
+    :param pattern: the regular expression (string).
+    :param flags: flags of the regular expression (int).
+    :return: the compiled regular expression with the MULTILINE flag
+    or None if it may miss matching lines.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+        if (flags | parsed.state.flags) & re.IGNORECASE or not _is_ascii_only(parsed):
+            return None
+        return re.compile(pattern.encode('ascii'), flags | re.MULTILINE)
+    except (re.error, UnicodeEncodeError, OverflowError, RecursionError):
+        return None
+
+
+def _is_ascii_only(parsed):
+    """Checks if the parsed pattern matches only ASCII text the same way in bytes."""
+    for op, value in parsed:
+        if op is sre_parse.LITERAL:
+            safe = value < 128
+        elif op is sre_parse.IN:
+            safe = all(item_op is sre_parse.LITERAL and item < 128 or
+                       item_op is sre_parse.RANGE and item[1] < 128
+                       for item_op, item in value)
+        elif op is sre_parse.AT:
+            safe = value in _ANCHORS
+        elif op is sre_parse.SUBPATTERN:
+            safe = not value[1] & re.IGNORECASE and _is_ascii_only(value[3])
+        elif op in _REPEATS:
+            safe = _is_ascii_only(value[2])
+        elif op is sre_parse.BRANCH:
+            safe = all(_is_ascii_only(item) for item in value[1])
+        elif op is _ATOMIC_GROUP:
+            safe = _is_ascii_only(value)
+        else:
+            safe = op is sre_parse.GROUPREF
+        if not safe:
+            return False
+    return True
+
+
+def _is_line_bound(source):
+    """
+    Checks if the pattern depends on the start or the end of the searched text
+    or looks around, so its matches in the whole text and in the line may differ.
+    :param source: the regular expression (string).
+    """
+    return any(token in source for token in _LINE_BOUND)
+
+
+def _split_lines(mapped, count):
+    """
+    Splits the memory-mapped file into chunks ending on line boundaries.
+    :return: list of offsets with the first one 0 and the last one the file size.
+    """
+    size = len(mapped)
+    bounds = [0]
+    for ix in range(1, count):
+        line_end = mapped.find(b'\n', max(size * ix // count, bounds[-1]))
+        if line_end == -1:
+            break
+        if line_end + 1 > bounds[-1]:
+            bounds.append(line_end + 1)
+    if bounds[-1] < size:
+        bounds.append(size)
+    return bounds
+
+
+def _decode(line, encoding):
+    """Decodes the line without line ending symbols."""
+    return line.decode(encoding, 'replace').rstrip('\r')
+
+
+def walk_files(paths, ordered=False, skipped=()):
+    """
+    Yields paths to the given files and all files in the given directory trees.
+    Symbolic links to directories inside trees are not followed.
+    :param paths: list of paths to files or directories.
+    :param ordered: walk directories in the order of names (bool).
+    :param skipped: tuple of beginnings of names of files in directory trees
+    that are not yielded.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        stack = [_scan_directory(path, ordered)]
+        while stack:
+            entry = next(stack[-1], None)
+            if entry is None:
+                stack.pop()
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(_scan_directory(entry.path, ordered))
+                elif entry.is_file() and not (skipped and entry.name.startswith(skipped)):
+                    yield entry.path
+            except OSError:
+                continue
+
+
+def _scan_directory(path, ordered):
+    """Returns the iterator over entries of the directory."""
+    try:
+        with os.scandir(path) as entries:
+            entries = list(entries)
+    except OSError:
+        entries = []
+    if ordered:
+        entries.sort(key=lambda entry: entry.name)
+    return iter(entries)
+
+
+def grep_tree(matcher, paths, after_context, pool, ordered=False, may_match=None,
+              skipped=()):
+    """
+    Yields the result of search in all files of the given directory trees.
+    Every found line is printed with the file name. Binary files are skipped.
+    Files are searched by the pool, the results of each file are printed
+    as soon as the file is finished or in the order of the walk if needed.
+    :param matcher: the Matcher instance.
+    :param paths: list of paths to files or directories.
+    :param after_context: number of lines printed after the matching line or None.
+    :param pool: the concurrent.futures.Executor instance.
+    :param ordered: print results in the order of file names (bool).
+    :param may_match: optional function that takes the file path and returns
+    False if the file surely has no matches, such files are not opened.
+    :param skipped: tuple of beginnings of names of files in directory trees
+    that are not searched (see walk_files).
+    """
+    window = 4 * (os.cpu_count() or 1)
+    pending = deque()
+    files = walk_files(paths, ordered, skipped)
+    if may_match is not None:
+        files = filter(may_match, files)
+    while True:
+        for file_path in files:
+            pending.append(pool.submit(grep_file, matcher, os.path.abspath(file_path),
+                                       after_context, file_path))
+            if len(pending) >= window:
+                break
+        if not pending:
+            return
+        if ordered:
+            finished = pending.popleft()
+        else:
+            done, _ = concurrent.futures.wait(pending,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            finished = done.pop()
+            pending.remove(finished)
+        yield from finished.result()
+
+
+def grep_file(matcher, file_path, after_context, name=None):
+    """
+    Searches the pattern in the file and returns all results at once.
+    Binary files, i.e. files with the zero byte at the beginning, are skipped.
+    :param matcher: the Matcher instance.
+    :param file_path: path to the file (string).
+    :param after_context: number of lines printed after the matching line or None.
+    :param name: the file name printed before found lines, file_path by default.
+    :return: list of strings.
+    """
+    if name is None:
+        name = file_path
+    try:
+        with open(file_path, 'rb') as opened_file:
+            if b'\0' in opened_file.read(SNIFF_SIZE):
+                return []
+            opened_file.seek(0)
+            with io.TextIOWrapper(opened_file, errors='replace') as text_file:
+                return list(grep_lines(matcher, text_file, after_context, name + ':'))
+    except OSError as err:
+        return ['grep: {}: {}.{}'.format(name, err.strerror, os.linesep)]
@@ -0,0 +1,113 @@
+"""
+The engine of the 'sort' command.
+Lines are sorted by the external merge sort: they are collected while
+their size fits the memory budget (the spill threshold of streams,
+see the iostreams module by default), then the sorted run is written
+to the SpillBuffer, which keeps it in the temporary file, and the next run
+starts. If there were several runs, they are merged by heapq.merge,
+at most MERGE_WIDTH runs at once, so the number of open files is bounded.
+If all lines fit the budget, they are sorted in memory and never written.
+
+Lines are compared by code points of characters, like 'sort' with LC_ALL=C;
+lines with equal keys are compared as whole lines.
+"""
+from src.iostreams import SpillBuffer, Stream, get_spill_threshold
+import heapq
+import re
+
+LINE_OVERHEAD = 64
+MERGE_WIDTH = 64
+WRITE_BATCH = 4096
+
+__NUMBER = re.compile(r'\s*(-?(?:\d+(?:\.\d*)?|\.\d+))')
+
+
+def make_key(numeric=False, start=None, end=None):
+    """
+    Makes the key function comparing lines like 'sort' does.
+    :param numeric: compare by the number at the beginning of the key,
+    keys without the number are equal to 0 (bool).
+    :param start: the first field of the key starting from 1 or None for the whole line.
+    :param end: the last field of the key or None for the end of the line.
+    Fields are separated by whitespaces.
+    :return: the function taking the line without the newline symbol.
+    """
+    number = __NUMBER.match
+
+    def key(line):
+        text = line
+        if start is not None:
+            text = ' '.join(line.split()[start - 1:end])
+        if not numeric:
+            return text, line
+        matched = number(text)
+        return float(matched.group(1)) if matched else 0.0, line
+    return key
+
+
+def sort_lines(lines, key=None, reverse=False, budget=None):
+    """
+    Yields the given lines in the sorted order.
+    :param lines: iterable with lines without newline symbols.
+    :param key: the key function (see make_key) or None to compare whole lines.
+    :param reverse: sort in the descending order (bool).
+    :param budget: maximal size of lines kept in memory in bytes,
+    the spill threshold of streams by default.
+    """
+    if budget is None:
+        budget = get_spill_threshold()
+    runs = []
+    run = []
+    size = 0
+    try:
+        for line in lines:
+            run.append(line)
+            size += len(line) + LINE_OVERHEAD
+            if size > budget:
+                runs.append(_write_run(sorted(run, key=key, reverse=reverse)))
+                run = []
+                size = 0
+        run.sort(key=key, reverse=reverse)
+        if not runs:
+            yield from run
+            return
+        if run:
+            runs.append(_write_run(run))
+        run = None
+        while len(runs) > MERGE_WIDTH:
+            merged = runs[:MERGE_WIDTH]
+            runs = runs[MERGE_WIDTH:] + [_write_run(_merge(merged, key, reverse))]
+            for buffer in merged:
+                buffer.close()
+        yield from _merge(runs, key, reverse)
+    finally:
+        for buffer in runs:
+            buffer.close()
+
+
+def _write_run(lines):
+    """
+    Writes sorted lines to the SpillBuffer kept in the temporary file.
+    :return: the SpillBuffer instance.
+    """
+    buffer = SpillBuffer(threshold=0)
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= WRITE_BATCH:
+            buffer.write('\n'.join(batch) + '\n')
+            batch = []
+    if batch:
+        buffer.write('\n'.join(batch) + '\n')
+    return buffer
+
+
+def _read_run(buffer):
+    """Yields lines of the run without newline symbols."""
+    for line in Stream(buffer.chunks()).lines():
+        yield line[:-1]
+
+
+def _merge(runs, key, reverse):
+    """Yields lines of sorted runs in the sorted order."""
+    return heapq.merge(*[_read_run(buffer) for buffer in runs], key=key, reverse=reverse)
@@ -0,0 +1,287 @@
+"""
+Starting of external commands.
+
+Names of commands are resolved by the search in PATH only once:
+found paths are kept till the command fails to start, and names that
+are not found are kept while PATH and its directories are not changed,
+so 'command not found' is answered without starting anything.
+
+Processes are started by the LocalSpawner right from the CLI or,
+if it is enabled, by the SpawnServer: the small helper process started
+once by the fork server. The CLI sends it the command and the pipe ends
+for standard input and output, the helper starts the command by posix_spawn
+and reports its exit status. The helper has neither threads nor big memory
+of the CLI, so starting processes does not depend on the state of the CLI;
+benchmarks/bench_spawn.py compares both ways.
+Both ways start processes with the default action of SIGPIPE, which
+the CLI ignores, so a process stops when its output is closed.
+"""
+import multiprocessing
+import os
+import pickle
+import selectors
+import shutil
+import signal
+import socket
+import subprocess
+import threading
+
+__resolved = {}
+__missing = {}
+__spawner = None
+__server_enabled = False
+__lock = threading.Lock()
+
+
+def resolve(name):
+    """
+    Finds the executable file of the command.
+    :param name: the command name or path (string).
+    :return: the path to the executable file or None if it is not found.
+    """
+    if os.sep in name:
+        return name if os.path.isfile(name) and os.access(name, os.X_OK) else None
+    path_variable = os.environ.get('PATH', os.defpath)
+    path = __resolved.get((name, path_variable))
+    if path is not None:
+        return path
+    signature = _path_signature(path_variable)
+    if __missing.get(name) == signature:
+        return None
+    path = shutil.which(name, path=path_variable)
+    if path is None:
+        __missing[name] = signature
+    else:
+        __missing.pop(name, None)
+        __resolved[(name, path_variable)] = path
+    return path
+
+
+def forget(name):
+    """
+    Removes the resolved path of the command, i.e. if it failed to start.
+    :param name: the command name (string).
+    """
+    for key in [key for key in __resolved if key[0] == name]:
+        del __resolved[key]
+
+
+def _path_signature(path_variable):
+    """Returns PATH with modification times of its directories."""
+    signature = [path_variable]
+    for directory in path_variable.split(os.pathsep):
+        try:
+            signature.append(os.stat(directory or os.curdir).st_mtime_ns)
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def use_spawn_server(enabled):
+    """
+    Chooses the way to start external commands.
+    :param enabled: start commands by the SpawnServer (bool).
+    """
+    global __server_enabled
+    with __lock:
+        __server_enabled = enabled
+
+
+def get_spawner():
+    """
+    Returns the spawner of external commands: the SpawnServer if it is enabled
+    and works, the LocalSpawner otherwise.
+    """
+    global __spawner
+    with __lock:
+        if __server_enabled and hasattr(os, 'pidfd_open'):
+            if not isinstance(__spawner, SpawnServer) or not __spawner.is_alive():
+                try:
+                    __spawner = SpawnServer()
+                except OSError:
+                    __spawner = LocalSpawner()
+        elif not isinstance(__spawner, LocalSpawner):
+            __spawner = LocalSpawner()
+        return __spawner
+
+
+class LocalSpawner:
+    """Starts processes right from the CLI."""
+
+    def spawn(self, path, args_list, stdin, stdout, cwd):
+        """
+        Starts the process with the given standard input and output.
+        :param path: the path to the executable file (string).
+        :param args_list: the command name and its arguments.
+        :param stdin: the file descriptor of the standard input.
+        :param stdout: the file descriptor of the standard output.
+        :param cwd: the working directory of the process.
+        :return: the process object with methods wait and kill
+        and the attribute returncode. Raises OSError if the process is not started.
+        """
+        return subprocess.Popen(args_list, executable=path, stdin=stdin,
+                                stdout=stdout, cwd=cwd)
+
+
+class RemoteProcess:
+    """The process started by the SpawnServer."""
+
+    def __init__(self, pid):
+        """
+        :param pid: the process id (int).
+        """
+        self.pid = pid
+        self.returncode = None
+        self.__exited = threading.Event()
+
+    def set_returncode(self, returncode):
+        """Sets the exit status reported by the SpawnServer."""
+        self.returncode = returncode
+        self.__exited.set()
+
+    def wait(self):
+        """Waits for the process to exit and returns its exit status."""
+        self.__exited.wait()
+        return self.returncode
+
+    def kill(self):
+        """Kills the process."""
+        if not self.__exited.is_set():
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+class SpawnServer:
+    """
+    The helper process starting external commands on request.
+    Requests are passed by one Unix socket together with the pipe ends
+    for the new process and are answered at once, exit statuses
+    of started processes come by the other socket.
+    """
+
+    def __init__(self):
+        """Starts the helper process and the thread reading exit statuses."""
+        self.__socket, helper_socket = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.__events, helper_events = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        context = multiprocessing.get_context('forkserver')
+        self.__helper = context.Process(target=_serve, args=(helper_socket, helper_events),
+                                        daemon=True)
+        self.__helper.start()
+        helper_socket.close()
+        helper_events.close()
+        self.__lock = threading.Lock()
+        self.__processes = {}
+        self.__exited = {}
+        self.__environ = None
+        self.__alive = True
+        reader = threading.Thread(target=self.__read_events, daemon=True)
+        reader.start()
+
+    def is_alive(self):
+        """Checks if the helper process works."""
+        return self.__alive
+
+    def spawn(self, path, args_list, stdin, stdout, cwd):
+        """
+        Starts the process by the helper, see LocalSpawner.spawn.
+        The environment is sent only if it was changed.
+        :return: the RemoteProcess instance.
+        Raises OSError if the process is not started.
+        """
+        with self.__lock:
+            if not self.__alive:
+                raise OSError('The spawn server is stopped.')
+            environ = dict(os.environ)
+            if environ == self.__environ:
+                environ = None
+            else:
+                self.__environ = environ
+            message = pickle.dumps((path, args_list, cwd, environ))
+            try:
+                socket.send_fds(self.__socket, [message], [stdin, stdout])
+                reply = self.__socket.recv(4096)
+            except OSError:
+                self.__alive = False
+                raise
+            if not reply:
+                self.__alive = False
+                raise OSError('The spawn server is stopped.')
+            kind, value = pickle.loads(reply)
+            if kind == 'failed':
+                raise OSError(value, os.strerror(value))
+            process = RemoteProcess(value)
+            returncode = self.__exited.pop(value, None)
+            if returncode is None:
+                self.__processes[value] = process
+            else:
+                process.set_returncode(returncode)
+            return process
+
+    def __read_events(self):
+        """Passes exit statuses reported by the helper to processes."""
+        try:
+            while True:
+                message = self.__events.recv(4096)
+                if not message:
+                    break
+                pid, returncode = pickle.loads(message)
+                with self.__lock:
+                    process = self.__processes.pop(pid, None)
+                    if process is None:
+                        self.__exited[pid] = returncode
+                if process is not None:
+                    process.set_returncode(returncode)
+        except OSError:
+            pass
+        finally:
+            with self.__lock:
+                self.__alive = False
+                for process in self.__processes.values():
+                    process.set_returncode(-1)
+                self.__processes.clear()
+
+
+def _serve(sock, events):
+    """
+    The main loop of the helper process.
+    Starts requested commands and reports their pids,
+    exited processes are found by their pidfds.
+    :param sock: the socket for requests from the CLI.
+    :param events: the socket for exit statuses.
+    """
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ)
+    environ = dict(os.environ)
+    while True:
+        for key, _ in selector.select():
+            if key.fileobj is not sock:
+                pid = key.data
+                selector.unregister(key.fileobj)
+                os.close(key.fileobj)
+                _, status = os.waitpid(pid, 0)
+                events.send(pickle.dumps((pid, os.waitstatus_to_exitcode(status))))
+                continue
+            try:
+                message, fds, _, _ = socket.recv_fds(sock, 1024 * 1024, 2)
+            except OSError:
+                return
+            if not message:
+                return
+            path, args_list, cwd, new_environ = pickle.loads(message)
+            if new_environ is not None:
+                environ = new_environ
+            try:
+                os.chdir(cwd)
+                pid = os.posix_spawn(path, args_list, environ, file_actions=[
+                    (os.POSIX_SPAWN_DUP2, fds[0], 0), (os.POSIX_SPAWN_DUP2, fds[1], 1)],
+                    setsigdef=(signal.SIGPIPE,))
+            except OSError as err:
+                sock.send(pickle.dumps(('failed', err.errno)))
+                continue
+            finally:
+                for fd in fds:
+                    os.close(fd)
+            selector.register(os.pidfd_open(pid), selectors.EVENT_READ, pid)
+            sock.send(pickle.dumps(('started', pid)))
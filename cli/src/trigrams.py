@@ -0,0 +1,324 @@
+"""
+The persistent trigram index used by the 'grep' command.
+
+For every indexed file the index stores its modification time, size
+and the sorted array of all three-byte sequences (trigrams)
+of its lowercased content, packed into bytes. The index is stored as JSON
+with the packed arrays in base64, so reading it never runs any code,
+and a file of a wrong shape is taken as no index.
+Before the file is searched, trigrams of literal parts of the pattern
+are looked up in the set: if some of them is missing, the file cannot match
+and it is not opened at all. Files changed after indexing (by the modification
+time or size) and files that are not indexed are always searched.
+
+The index is stored in the file INDEX_NAME in the current directory,
+it is built and refreshed by the 'index' command.
+"""
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+from array import array
+import base64
+import bisect
+import json
+import locale
+import os
+import re
+import sys
+import threading
+from src.search import walk_files
+from src.wordcount import read_chunks
+
+INDEX_NAME = '.grep-index'
+TRIGRAM_SIZE = array('I').itemsize
+_FORMAT_VERSION = 1
+_UNSAFE_LETTERS = 'iks'
+_REPEATS = tuple(getattr(sre_parse, name) for name in
+                 ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT') if hasattr(sre_parse, name))
+_ATOMIC_GROUP = getattr(sre_parse, 'ATOMIC_GROUP', None)
+__cache = {}
+__lock = threading.Lock()
+
+
+class TrigramIndex:
+    """
+    The trigram index of files under several root directories.
+
+    index = TrigramIndex.load(path)
+    index.build(['logs'], pool)
+    index.save()
+    index.may_match('logs/today.log', required_trigrams('error', 0))
+    """
+
+    def __init__(self, path):
+        """
+        Creates the empty index.
+        :param path: path to the file where the index is stored (string).
+        """
+        self.__path = path
+        self.__roots = []
+        self.__files = {}
+
+    @staticmethod
+    def load(path):
+        """
+        Reads the index from the file, the empty index is returned
+        if the file does not exist or is broken.
+        :param path: path to the index file (string).
+        :return: the TrigramIndex instance.
+        """
+        index = TrigramIndex(path)
+        try:
+            with open(path, 'rb') as opened_file:
+                index.__roots, index.__files = _decode(json.load(opened_file))
+        except (OSError, ValueError, TypeError, RecursionError):
+            pass
+        return index
+
+    def save(self):
+        """Writes the index to its file, the old file is replaced at once."""
+        temp_path = self.__path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as opened_file:
+            json.dump(_encode(self.__roots, self.__files), opened_file)
+        os.replace(temp_path, self.__path)
+
+    def roots(self):
+        """Returns the list of indexed directories and files."""
+        return list(self.__roots)
+
+    def build(self, paths, pool):
+        """
+        Adds the given directories and files to the index.
+        Only new and changed files are read, by the processes of the pool.
+        :param paths: list of paths to files or directories.
+        :param pool: the concurrent.futures.Executor instance.
+        :return: number of read files.
+        """
+        for path in paths:
+            path = os.path.abspath(path)
+            if path not in self.__roots:
+                self.__roots.append(path)
+        return self.__update([os.path.abspath(path) for path in paths], pool)
+
+    def refresh(self, pool):
+        """
+        Updates the index: changed and new files under the indexed directories
+        are read again, removed files are forgotten.
+        :param pool: the concurrent.futures.Executor instance.
+        :return: pair of numbers of read and removed files.
+        """
+        self.__roots = [root for root in self.__roots if os.path.exists(root)]
+        removed = [path for path in self.__files if not os.path.isfile(path)]
+        for path in removed:
+            del self.__files[path]
+        return self.__update(self.__roots, pool), len(removed)
+
+    def __update(self, paths, pool):
+        """Reads new and changed files under the given paths."""
+        changed = []
+        for file_path in walk_files(paths):
+            if os.path.basename(file_path).startswith(INDEX_NAME):
+                continue
+            stamp = _get_stamp(file_path)
+            entry = self.__files.get(file_path)
+            if stamp is not None and (entry is None or entry[0] != stamp):
+                changed.append((file_path, stamp))
+        results = pool.map(file_trigrams, [file_path for file_path, _ in changed])
+        for (file_path, stamp), trigrams in zip(changed, results):
+            if trigrams is None:
+                self.__files.pop(file_path, None)
+            else:
+                self.__files[file_path] = (stamp, trigrams)
+        return len(changed)
+
+    def may_match(self, file_path, trigrams):
+        """
+        Checks if the file may contain all given trigrams.
+        :param file_path: path to the file (string).
+        :param trigrams: set of trigrams of the pattern.
+        :return: False if the file is indexed, was not changed since
+        and some of trigrams is missing in it, True otherwise.
+        """
+        if not trigrams:
+            return True
+        entry = self.__files.get(os.path.abspath(file_path))
+        if entry is None or entry[0] != _get_stamp(file_path):
+            return True
+        packed = array('I')
+        packed.frombytes(entry[1])
+        for trigram in trigrams:
+            ix = bisect.bisect_left(packed, trigram)
+            if ix == len(packed) or packed[ix] != trigram:
+                return False
+        return True
+
+    def stats(self):
+        """
+        Returns the statistics of the index.
+        :return: dictionary with numbers of roots, files, stale files
+        and trigrams and the size of the index file in bytes.
+        """
+        stale = sum(1 for file_path, (stamp, _) in self.__files.items()
+                    if _get_stamp(file_path) != stamp)
+        try:
+            size = os.path.getsize(self.__path)
+        except OSError:
+            size = 0
+        return {'roots': len(self.__roots), 'files': len(self.__files),
+                'stale': stale,
+                'trigrams': sum(len(packed) // TRIGRAM_SIZE for _, packed in self.__files.values()),
+                'size': size}
+
+
+def get_index(directory):
+    """
+    Returns the saved index of the directory.
+    The index is read from the file only if the file was changed
+    since the last call.
+    :param directory: path to the directory with the index file (string).
+    :return: the TrigramIndex instance or None if there is no index.
+    """
+    path = os.path.join(directory, INDEX_NAME)
+    stamp = _get_stamp(path)
+    with __lock:
+        if stamp is None:
+            __cache.pop(path, None)
+            return None
+        cached = __cache.get(path)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, TrigramIndex.load(path))
+            __cache[path] = cached
+        return cached[1]
+
+
+def file_trigrams(file_path):
+    """
+    Collects trigrams of the lowercased content of the file.
+    Every chunk is viewed as arrays of 4-byte ints starting at four
+    successive offsets, so the ints of all windows are collected
+    without a loop over bytes and the fourth byte is dropped afterwards.
+    :param file_path: path to the file (string).
+    :return: bytes with the sorted array of trigrams as ints
+    or None if the file cannot be read.
+    """
+    windows = set()
+    tail = b''
+    try:
+        for chunk in read_chunks(file_path):
+            chunk = tail + chunk.lower()
+            tail = chunk[-2:]
+            view = memoryview(chunk + b'\0')
+            for offset in range(4):
+                end = offset + (len(view) - offset) // 4 * 4
+                windows.update(view[offset:end].cast('I'))
+    except OSError:
+        return None
+    if sys.byteorder == 'little':
+        trigrams = {window & 0xffffff for window in windows}
+    else:
+        trigrams = {window >> 8 for window in windows}
+    return array('I', sorted(trigrams)).tobytes()
+
+
+def required_trigrams(pattern, flags):
+    """
+    Collects trigrams which every match of the pattern contains.
+    Only sequences of literal symbols outside of alternatives and optional
+    parts are taken. Symbols that match non-ASCII ones ignoring case
+    end the sequence if the case is ignored.
+    :param pattern: the regular expression (string).
+    :param flags: flags of the regular expression (int).
+    :return: set of trigrams as ints.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except (re.error, OverflowError, RecursionError):
+        return set()
+    ignore_case = bool((flags | parsed.state.flags) & re.IGNORECASE)
+    encoding = locale.getpreferredencoding(False)
+    trigrams = set()
+    for literal in _literals(parsed, ignore_case):
+        try:
+            data = literal.encode(encoding).lower()
+        except UnicodeEncodeError:
+            continue
+        trigrams.update(int.from_bytes(data[ix:ix + 3], sys.byteorder)
+                        for ix in range(len(data) - 2))
+    return trigrams
+
+
+def _literals(parsed, ignore_case):
+    """Yields literal strings which are required by the parsed pattern."""
+    literal = []
+    for op, value in parsed:
+        if op is sre_parse.LITERAL and _is_safe(chr(value), ignore_case):
+            literal.append(chr(value))
+            continue
+        if literal:
+            yield ''.join(literal)
+            literal = []
+        if op is sre_parse.SUBPATTERN:
+            _, add_flags, del_flags, subpattern = value
+            if not add_flags and not del_flags:
+                yield from _literals(subpattern, ignore_case)
+        elif op in _REPEATS:
+            low, _, subpattern = value
+            if low >= 1:
+                yield from _literals(subpattern, ignore_case)
+        elif op is _ATOMIC_GROUP:
+            yield from _literals(value, ignore_case)
+    if literal:
+        yield ''.join(literal)
+
+
+def _is_safe(symbol, ignore_case):
+    """Checks if the symbol can be searched in the lowercased content."""
+    if symbol in '\r\n\ufffd':
+        return False
+    if ignore_case:
+        return symbol.isascii() and symbol.lower() not in _UNSAFE_LETTERS
+    return True
+
+
+def _encode(roots, files):
+    """Converts the roots and files of the index to the JSON object."""
+    return {'version': _FORMAT_VERSION, 'roots': roots,
+            'files': {file_path: [mtime, size, base64.b64encode(packed).decode('ascii')]
+                      for file_path, ((mtime, size), packed) in files.items()}}
+
+
+def _decode(data):
+    """
+    Converts the JSON object back to the roots and files of the index.
+    :param data: the loaded JSON object.
+    :return: pair of the list of roots and the dictionary of files.
+    :raise ValueError: if the object has not the shape of the index.
+    """
+    if not isinstance(data, dict) or data.get('version') != _FORMAT_VERSION:
+        raise ValueError('unknown index format')
+    roots, entries = data.get('roots'), data.get('files')
+    if not isinstance(roots, list) or not all(isinstance(root, str) for root in roots):
+        raise ValueError('broken index roots')
+    if not isinstance(entries, dict):
+        raise ValueError('broken index files')
+    files = {}
+    for file_path, entry in entries.items():
+        if not isinstance(entry, list) or len(entry) != 3 \
+                or not all(type(value) is int for value in entry[:2]) \
+                or not isinstance(entry[2], str):
+            raise ValueError('broken index entry')
+        packed = base64.b64decode(entry[2], validate=True)
+        if len(packed) % TRIGRAM_SIZE:
+            raise ValueError('broken index entry')
+        files[file_path] = ((entry[0], entry[1]), packed)
+    return roots, files
+
+
+def _get_stamp(file_path):
+    """Returns the pair of modification time and size of the file or None."""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
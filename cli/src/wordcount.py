@@ -0,0 +1,58 @@
+"""
+The engine of the 'wc' command.
+Counts newlines, words and bytes in one pass over binary chunks.
+Words are counted without splitting: every byte is translated
+to the space or to the letter 'x' and then the number of
+'word starts' (the space followed by the letter) is counted,
+so all work is done by bytes methods on the whole chunk.
+"""
+
+CHUNK_SIZE = 1024 * 1024
+WHITESPACE = b' \t\n\r\x0b\x0c'
+__MARKS = bytes(ord(' ') if byte in WHITESPACE else ord('x') for byte in range(256))
+__WORD = ord('x')
+
+
+def count_chunks(chunks):
+    """
+    Counts newlines, words and bytes in the sequence of binary chunks.
+    :param chunks: iterable with bytes.
+    :return: list with three counts.
+    """
+    line_count = 0
+    word_count = 0
+    byte_count = 0
+    in_word = False
+    for chunk in chunks:
+        if not chunk:
+            continue
+        line_count += chunk.count(b'\n')
+        byte_count += len(chunk)
+        marks = chunk.translate(__MARKS)
+        word_count += marks.count(b' x')
+        if marks[0] == __WORD and not in_word:
+            word_count += 1
+        in_word = marks[-1] == __WORD
+    return [line_count, word_count, byte_count]
+
+
+def read_chunks(file_path):
+    """
+    Yields the content of the file by binary chunks.
+    :param file_path: path to the file (string).
+    """
+    with open(file_path, 'rb') as opened_file:
+        while True:
+            chunk = opened_file.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def count_file(file_path):
+    """
+    Counts newlines, words and bytes in the file.
+    :param file_path: path to the file (string).
+    :return: list with three counts.
+    """
+    return count_chunks(read_chunks(file_path))
@@ -0,0 +1,25 @@
+"""
+The pool of worker processes shared by commands
+that split big jobs into parts, i.e. 'wc' with several big files.
+The pool is created at the first usage and lives till the CLI exits.
+Processes are started by the fork server, so it is safe
+to use the pool while other threads of the CLI are running.
+"""
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+
+__pool = None
+__lock = threading.Lock()
+
+
+def get_process_pool():
+    """Returns the shared ProcessPoolExecutor instance."""
+    global __pool
+    with __lock:
+        if __pool is None:
+            context = multiprocessing.get_context('forkserver')
+            __pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=os.cpu_count(), mp_context=context)
+        return __pool
@@ -0,0 +1,81 @@
+import unittest
+from src.cache import *
+from src.commands import *
+from src.environment import Environment
+
+
+class TestParseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.env = Environment()
+        self.env.set_var_value('x', '10')
+        self.env.set_var_value('y', 'kek')
+        self.cache = ParseCache(self.env, max_size=2)
+
+    def test_hit(self):
+        command = self.cache.get_command('echo $x | wc')
+        self.assertIs(command, self.cache.get_command('echo $x | wc'))
+        self.assertEqual(1, self.cache.hits())
+        self.assertEqual(1, self.cache.misses())
+
+    def test_invalidation(self):
+        with_x = self.cache.get_command('echo $x')
+        with_y = self.cache.get_command('echo $y')
+        self.env.set_var_value('x', '20')
+        self.assertIs(with_y, self.cache.get_command('echo $y'))
+        command = self.cache.get_command('echo $x')
+        self.assertIsNot(with_x, command)
+        self.assertEqual('20' + os.linesep, command.run(Stream(), self.env).get_output())
+
+    def test_same_value(self):
+        command = self.cache.get_command('echo $x')
+        self.env.set_var_value('x', '10')
+        self.assertIs(command, self.cache.get_command('echo $x'))
+
+    def test_max_size(self):
+        self.cache.get_command('echo 1')
+        self.cache.get_command('echo 2')
+        self.cache.get_command('echo 1')
+        self.cache.get_command('echo 3')
+        self.assertEqual(2, self.cache.size())
+        self.cache.get_command('echo 1')
+        self.assertEqual(2, self.cache.hits())
+
+    def test_command_from_variable(self):
+        self.env.set_var_value('p', 'pwd')
+        self.cache.get_command('$p')
+        self.cache.get_command('$p')
+        self.assertEqual(0, self.cache.hits())
+        self.assertEqual(0, self.cache.size())
+        self.cache.get_command('echo 1 && $p')
+        self.assertEqual(0, self.cache.size())
+
+    def test_assignment_in_list(self):
+        self.cache.get_command('x=5; echo $x')
+        self.cache.get_command('x=5 & echo $x')
+        self.assertEqual(1, self.cache.size())
+
+    def test_empty_line(self):
+        self.assertIsNone(self.cache.get_command('   '))
+
+
+class TestEnvironmentChanges(unittest.TestCase):
+
+    def setUp(self):
+        self.env = Environment()
+
+    def test_subscribe(self):
+        changed = []
+        self.env.subscribe(changed.append)
+        self.env.set_var_value('a', '1')
+        self.env.set_var_value('a', '1')
+        self.env.set_var_value('b', '2')
+        self.assertEqual(['a', 'b'], changed)
+
+    def test_recording(self):
+        self.env.start_recording()
+        self.env.get_var_value('a')
+        self.env.get_var_value('b')
+        self.assertEqual({'a', 'b'}, self.env.stop_recording())
+        self.env.get_var_value('c')
+        self.assertEqual(set(), self.env.stop_recording())
@@ -1,4 +1,7 @@
 import unittest
+from io import StringIO
+import sys
+import tempfile
 from src.cli import *
 
 
@@ -30,6 +33,13 @@ class testCli(unittest.TestCase):
         result = self.cli.process_input('cat ../Readme.md | grep cat')
         self.assertEqual('  - \x1b[1;31mcat\x1b[0m;' + os.linesep, result.get_output())
 
+    def test_explain(self):
+        result = self.cli.process_input('explain cat ../Readme.md | grep cat | wc -l')
+        self.assertEqual('1. grep -c cat ../Readme.md    <- cat ../Readme.md | grep cat | wc -l' +
+                         os.linesep, result.get_output())
+        result = self.cli.process_input('cat ../Readme.md | grep cat | wc -l')
+        self.assertEqual('   1     ' + os.linesep, result.get_output())
+
     def test_grep_from_file(self):
         result = self.cli.process_input('grep cat ../Readme.md')
         self.assertEqual('  - \x1b[1;31mcat\x1b[0m;' + os.linesep, result.get_output())
@@ -46,3 +56,85 @@ class testCli(unittest.TestCase):
                           self.cli.process_input, '\'x')
         self.assertRaises(ParserException,
                           self.cli.process_input, 'x\"')
+
+    def test_run_script(self):
+        out = StringIO()
+        err = StringIO()
+        lines = ['x=kek\n', 'echo $x\n', '\n', 'echo \'x\n', 'echo $x | wc\n', 'exit\n', 'echo no\n']
+        return_value = self.cli.run_script(lines, out, err, summary=True)
+        self.assertEqual(0, return_value)
+        self.assertEqual('kek' + os.linesep + '   1    1    4     ' + os.linesep, out.getvalue())
+        report = err.getvalue().splitlines()
+        self.assertEqual('line 4: Lexing exception: Missing second quote '
+                         'for fist one at position 5.', report[0])
+        self.assertTrue(report[1].startswith('Executed 5 lines in '))
+        counts = dict(row.split()[:2] for row in report[3:])
+        self.assertEqual({'x=': '1', 'echo': '3', 'exit': '1'}, counts)
+
+    def test_background_jobs(self):
+        out = StringIO()
+        lines = ['x=kek\n', 'echo $x &\n', 'wait\n', 'y=1 &\n', 'wait\n', 'echo $y\n']
+        self.assertEqual(0, self.cli.run_script(lines, out, StringIO()))
+        self.assertEqual(['[1]', 'kek', '[1]  Done      echo $x', '[1]',
+                          '[1]  Done      y=1', ''], out.getvalue().splitlines())
+        self.cli.process_input('echo a &')
+        result = self.cli.process_input('fg')
+        self.assertEqual('a' + os.linesep, result.get_output())
+        self.assertEqual(1, self.cli.process_input('fg').return_value())
+
+    def test_time_external(self):
+        line = 'time {} -c "import time; exec(\'while time.process_time() < 0.2: pass\')"'
+        output = self.cli.process_input(line.format(sys.executable)).get_output().splitlines()
+        name, user = output[1].split('\t')
+        self.assertEqual('user', name)
+        self.assertGreater(float(user[user.index('m') + 1:-1]), 0)
+
+    def test_time_and_stats(self):
+        output = self.cli.process_input('time echo kek | wc').get_output().splitlines()
+        self.assertEqual('   1    1    4     ', output[0])
+        self.assertEqual(['real', 'user', 'sys'], [line.split('\t')[0] for line in output[1:]])
+        self.cli.process_input('stats clear')
+        self.cli.process_input('stats on')
+        try:
+            self.cli.process_input('echo kek | wc').get_output()
+            self.cli.process_input('echo kek | wc').get_output()
+            output = self.cli.process_input('stats').get_output().splitlines()
+        finally:
+            self.cli.process_input('stats off')
+        self.assertTrue(output[-1].startswith('Spilled to disk: '))
+        counts = {line.split()[0]: int(line.split()[1]) for line in output[1:-1]}
+        self.assertEqual({'[lex]': 2, '[parse]': 2, '[preprocess]': 2, '[run]': 2,
+                          'echo': 2, 'wc': 2}, counts)
+        self.assertEqual(1, self.cli.process_input('stats now').return_value())
+
+    def test_binary_pipe(self):
+        data = b'\xff\x00a\r\nb\rc'
+        with tempfile.NamedTemporaryFile(delete=False) as opened_file:
+            opened_file.write(data)
+        try:
+            for line in ['cat {}', 'cat {} | cat', 'cat {} | tee | cat']:
+                stream = self.cli.process_input(line.format(opened_file.name)).get_stream()
+                self.assertTrue(stream.is_binary())
+                self.assertEqual(data, b''.join(stream.bytes_chunks()))
+            result = self.cli.process_input('cat {} | wc'.format(opened_file.name))
+            self.assertEqual('   1    3    8     ' + os.linesep, result.get_output())
+        finally:
+            os.remove(opened_file.name)
+
+    def test_lists(self):
+        result = self.cli.process_input('x=1 ; echo a && echo b | wc || echo c & echo d')
+        self.assertEqual(['a', '   1    1    2     ', 'd'], result.get_output().splitlines())
+        self.assertEqual(0, result.return_value())
+        self.assertEqual('1' + os.linesep, self.cli.process_input('echo $x').get_output())
+        out = StringIO()
+        lines = ['y=2 & echo $x\n', 'cat no_file.txt && echo no\n', 'echo $y; echo $x &\n']
+        self.assertEqual(0, self.cli.run_script(lines, out, StringIO()))
+        self.assertEqual(['1', 'cat: no_file.txt: No such file or directory.', '[1]',
+                          '', '1', '[1]  Done      echo $y; echo $x'], out.getvalue().splitlines())
+
+    def test_assignment_in_list(self):
+        for value in ('5', '7'):
+            result = self.cli.process_input('x={} ; echo $x'.format(value))
+            self.assertEqual(value + os.linesep, result.get_output())
+        result = self.cli.process_input('y=$x && echo $y || echo no ; y=1 & echo $y')
+        self.assertEqual(['7', '7'], result.get_output().splitlines())
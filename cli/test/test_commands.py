@@ -1,4 +1,6 @@
 import unittest
+import shutil
+import tempfile
 from src.commands import *
 from src.iostreams import Stream
 from src.environment import Environment
@@ -191,6 +193,20 @@ class TestAllCommands(unittest.TestCase):
         self.assertEqual('Wrong number of arguments for grep command.' + os.linesep,
                          result.get_output())
 
+    def test_grep_files_with_input(self):
+        closed = []
+
+        def lines():
+            try:
+                yield 'Son' + os.linesep
+            finally:
+                closed.append(True)
+        command = CommandGREP()
+        command.set_args(['Son', self.file])
+        result = command.run(Stream(lines()), self.env)
+        self.assertEqual('The Perfect \x1b[1;31mSon\x1b[0m.' + os.linesep, result.get_output())
+        self.assertEqual([True], closed)
+
     def test_grep_with_wrong_file(self):
         command = CommandGREP()
         command.set_args(['pattern', 'other_file.txt'])
@@ -263,3 +279,344 @@ class TestAllCommands(unittest.TestCase):
         self.assertEqual(1, result.return_value())
         self.assertEqual('Wrong number of arguments for grep '
                          'command.' + os.linesep, result.get_output())
+
+    def test_external_pipeline(self):
+        left_command = UnknownCommand('printf', ['b\\na\\nb\\n'])
+        middle_command = UnknownCommand('sort', [])
+        right_command = CommandWC()
+        right_command.set_args([])
+        pipe = CommandPIPE(CommandPIPE(left_command, middle_command), right_command)
+        stages = pipe.stages()
+        self.assertEqual([ExternalPipeline, CommandWC], [type(stage) for stage in stages])
+        self.assertEqual(2, len(stages[0].get_commands()))
+        result = stages[0].run(Stream(), self.env)
+        self.assertEqual(0, result.return_value())
+        self.assertEqual('a\nb\nb\n', result.get_output())
+        result = pipe.run(Stream(), self.env)
+        self.assertEqual(['3', '3', '6'], result.get_output().split())
+
+    def test_external_pipeline_with_input(self):
+        left_command = CommandECHO()
+        left_command.set_args(['b', 'a'])
+        pipe = CommandPIPE(CommandPIPE(left_command, UnknownCommand('tr', [' ', '\n'])),
+                           UnknownCommand('sort', []))
+        result = pipe.run(Stream(), self.env)
+        self.assertEqual(0, result.return_value())
+        self.assertEqual('a\nb\n', result.get_output())
+
+    def test_external_pipeline_streams(self):
+        result = UnknownCommand('yes', []).run(Stream(), self.env)
+        self.assertFalse(result.is_return_value_known())
+        stream = result.get_stream()
+        self.assertTrue(next(stream.chunks()).startswith(b'y\n'))
+        stream.close()
+        self.assertNotEqual(0, result.return_value())
+        result = UnknownCommand('printf', ['a']).run(Stream(), self.env)
+        self.assertEqual(0, result.return_value())
+        self.assertEqual('a', result.get_output())
+
+    def test_external_pipeline_fail(self):
+        pipe = CommandPIPE(UnknownCommand('echo', ['x']), UnknownCommand('kek', []))
+        result = pipe.run(Stream(), self.env)
+        self.assertEqual(1, result.return_value())
+        self.assertEqual('Command kek: command not found.' + os.linesep,
+                         result.get_output())
+
+    def test_wc_parallel(self):
+        command = CommandWC()
+        command.set_args([self.file, 'test_env.py', self.file])
+        parallel_size = CommandWC.PARALLEL_SIZE
+        CommandWC.PARALLEL_SIZE = 0
+        try:
+            result = command.run(Stream(), self.env)
+        finally:
+            CommandWC.PARALLEL_SIZE = parallel_size
+        self.assertEqual(0, result.return_value())
+        right_result = ['10', '60', '284', self.file,
+                        '21', '50', '622', 'test_env.py',
+                        '10', '60', '284', self.file,
+                        '41', '170', '1190', 'total']
+        self.assertEqual(right_result, result.get_output().split())
+
+    def test_grep_pattern_with_capital_a(self):
+        command = CommandGREP()
+        command.set_args(['-i', 'WEDNESDAY', self.file])
+        result = command.run(Stream(), self.env)
+        self.assertEqual(0, result.return_value())
+        self.assertEqual('A: He will be six months old next '
+                         '\x1b[1;31mWednesday\x1b[0m.' + os.linesep,
+                         result.get_output())
+
+    def test_grep_word_at_end_of_line(self):
+        left_command = CommandECHO()
+        left_command.set_args(['kek', 'kekek', 'kek'])
+        right_command = CommandGREP()
+        right_command.set_args(['-w', 'kek'])
+        result = CommandPIPE(left_command, right_command).run(Stream(), self.env)
+        self.assertEqual('\x1b[1;31mkek\x1b[0m kekek \x1b[1;31mkek\x1b[0m' + os.linesep,
+                         result.get_output())
+
+    def test_grep_parallel(self):
+        command = CommandGREP()
+        command.set_args(['-iA', '1', 'have', self.file])
+        expected = command.run(Stream(), self.env).get_output()
+        parallel_size = CommandGREP.PARALLEL_SIZE
+        CommandGREP.PARALLEL_SIZE = 0
+        try:
+            result = command.run(Stream(), self.env)
+        finally:
+            CommandGREP.PARALLEL_SIZE = parallel_size
+        self.assertEqual(0, result.return_value())
+        self.assertEqual(expected, result.get_output())
+
+    def test_grep_recursive(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs(os.path.join(directory, 'sub'))
+            shutil.copy(self.file, directory)
+            shutil.copy(self.file, os.path.join(directory, 'sub'))
+            command = CommandGREP()
+            command.set_args(['-r', '--sorted', 'Does he s', directory])
+            result = command.run(Stream(), self.env)
+            output = result.get_output()
+        self.assertEqual(0, result.return_value())
+        line = ':B: \x1b[1;31mDoes he s\x1b[0mmoke?' + os.linesep
+        self.assertEqual(os.path.join(directory, 'sub', self.file) + line +
+                         os.path.join(directory, self.file) + line,
+                         output)
+
+    def test_index(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            shutil.copy(self.file, directory)
+            with open(os.path.join(directory, 'other.txt'), 'w') as opened_file:
+                opened_file.write('Does he?')
+            os.chdir(directory)
+            try:
+                env = Environment()
+                command = CommandINDEX()
+                command.set_args(['build'])
+                result = command.run(Stream(), env)
+                self.assertEqual('Indexed 2 files.' + os.linesep, result.get_output())
+                command.set_args(['stats'])
+                self.assertIn('files: 2', command.run(Stream(), env).get_output())
+
+                grep = CommandGREP()
+                grep.set_args(['-r', 'he s', '.'])
+                self.assertEqual('./' + self.file + ':B: Does \x1b[1;31mhe s\x1b[0mmoke?' +
+                                 os.linesep, grep.run(Stream(), env).get_output())
+                with open(INDEX_NAME + '.tmp', 'w') as opened_file:
+                    opened_file.write('other.txt')
+                grep.set_args(['-r', 'other', '.'])
+                self.assertEqual('', grep.run(Stream(), env).get_output())
+                grep.set_args(['Does', 'other.txt'])
+                self.assertEqual('\x1b[1;31mDoes\x1b[0m he?' + os.linesep,
+                                 grep.run(Stream(), env).get_output())
+                command.set_args(['remove'])
+                self.assertEqual(1, command.run(Stream(), env).return_value())
+            finally:
+                os.chdir(cwd)
+
+    def test_filecache(self):
+        command = CommandFILECACHE()
+        command.set_args(['flush'])
+        command.run(Stream(), Environment())
+        wc = CommandWC()
+        wc.set_args([self.file])
+        first = wc.run(Stream(), Environment()).get_output()
+        self.assertEqual(first, wc.run(Stream(), Environment()).get_output())
+        command.set_args([])
+        self.assertIn('files: 1', command.run(Stream(), Environment()).get_output())
+        command.set_args(['flush'])
+        command.run(Stream(), Environment())
+        command.set_args(['stats'])
+        self.assertIn('files: 0', command.run(Stream(), Environment()).get_output())
+        command.set_args(['drop'])
+        self.assertEqual(1, command.run(Stream(), Environment()).return_value())
+
+    def test_grep_count(self):
+        command = CommandGREP()
+        command.set_args(['-c', '-i', 'son', self.file, self.file])
+        result = command.run(Stream(), self.env)
+        self.assertEqual(0, result.return_value())
+        self.assertEqual('6' + os.linesep, result.get_output())
+        command.set_args(['--count', 'perfect'])
+        result = command.run(Stream(['the perfect son\n', 'no\n', 'perfect\n']), self.env)
+        self.assertEqual('2' + os.linesep, result.get_output())
+        command.set_args(['-c', '-r', 'son'])
+        self.assertEqual(1, command.run(Stream(), self.env).return_value())
+
+    def test_wc_lines(self):
+        command = CommandWC()
+        command.set_args(['-l', self.file, self.file])
+        result = command.run(Stream(), self.env)
+        self.assertEqual(0, result.return_value())
+        self.assertEqual(['10', self.file, '10', self.file, '20', 'total'],
+                         result.get_output().split())
+        command.set_args(['--lines'])
+        result = command.run(Stream(['a\n', 'b\n']), self.env)
+        self.assertEqual('   2     ' + os.linesep, result.get_output())
+
+    def test_wc_input_files(self):
+        command = CommandWC()
+        command.set_args([])
+        command.set_input_files([self.file, self.file])
+        result = command.run(Stream(['ignored\n']), self.env)
+        self.assertEqual('  20  120  568     ' + os.linesep, result.get_output())
+
+    def test_fused(self):
+        cat = CommandCAT()
+        cat.set_args([self.file])
+        grep = CommandGREP()
+        grep.set_args(['-c', 'Son', self.file])
+        wc = CommandWC()
+        wc.set_args(['-l'])
+        original = CommandPIPE(cat, wc)
+        command = CommandFUSED(grep, original, [self.file], count_lines=True)
+        result = command.run(Stream(['ignored\n']), self.env)
+        self.assertEqual('   1     ' + os.linesep, result.get_output())
+        cat.set_args(['not_funny.txt'])
+        command = CommandFUSED(grep, original, ['not_funny.txt'], count_lines=True)
+        result = command.run(Stream(), self.env)
+        self.assertEqual(1, result.return_value())
+        self.assertIn('cat: not_funny.txt', result.get_output())
+
+    def test_explain(self):
+        command = CommandEXPLAIN(CommandPWD(), ['1. pwd'])
+        result = command.run(Stream(), self.env)
+        self.assertEqual('1. pwd' + os.linesep, result.get_output())
+
+    def test_head(self):
+        command = CommandHEAD()
+        command.set_args(['-n', '2', self.file])
+        result = command.run(Stream(), self.env)
+        self.assertEqual(0, result.return_value())
+        self.assertEqual(['The Perfect Son.', 'A: I have the perfect son.'],
+                         result.get_output().splitlines())
+        command.set_args(['-1', self.file, self.file])
+        self.assertEqual(['==> {} <=='.format(self.file), 'The Perfect Son.', '',
+                          '==> {} <=='.format(self.file), 'The Perfect Son.'],
+                         command.run(Stream(), self.env).get_output().splitlines())
+
+    def test_head_closes_input(self):
+        closed = []
+
+        def lines():
+            try:
+                while True:
+                    yield 'line' + os.linesep
+            finally:
+                closed.append(True)
+        command = CommandHEAD()
+        command.set_args(['--lines=3'])
+        result = command.run(Stream(lines()), self.env)
+        self.assertEqual(('line' + os.linesep) * 3, result.get_output())
+        self.assertEqual([True], closed)
+
+    def test_tail(self):
+        command = CommandTAIL()
+        command.set_args(['-n2', self.file])
+        result = command.run(Stream(), self.env)
+        self.assertEqual(0, result.return_value())
+        lines = open(self.file).read().splitlines()
+        self.assertEqual(lines[-2:], result.get_output().splitlines())
+        command.set_args([])
+        result = command.run(Stream(['{}\n'.format(i) for i in range(20)]), self.env)
+        self.assertEqual([str(i) for i in range(10, 20)], result.get_output().split())
+
+    def test_head_tail_fail(self):
+        for command_class, name in ((CommandHEAD, 'head'), (CommandTAIL, 'tail')):
+            command = command_class()
+            for args, error in ((['-n', 'x'], 'invalid number of lines: \'x\''),
+                                (['-q'], 'unknown option -q'),
+                                (['not_funny.txt'], 'not_funny.txt: No such file or directory')):
+                command.set_args(args)
+                result = command.run(Stream(), self.env)
+                self.assertEqual(1, result.return_value())
+                self.assertEqual('{}: {}.{}'.format(name, error, os.linesep), result.get_output())
+
+    def test_sort(self):
+        command = CommandSORT()
+        command.set_args(['-rn', '-k', '2'])
+        result = command.run(Stream(['a 10\n', 'b 9\n', 'c 100']), self.env)
+        self.assertEqual(0, result.return_value())
+        self.assertEqual(['c 100', 'a 10', 'b 9'], result.get_output().splitlines())
+        command.set_args([self.file])
+        lines = open(self.file).read().splitlines()
+        self.assertEqual(sorted(lines), command.run(Stream(), self.env).get_output().splitlines())
+        for args, error in ((['-k', '0'], 'invalid key \'0\''), (['-x'], 'unknown option -x'),
+                            (['not_funny.txt'], 'not_funny.txt: No such file or directory')):
+            command.set_args(args)
+            result = command.run(Stream(), self.env)
+            self.assertEqual(1, result.return_value())
+            self.assertEqual('sort: {}.{}'.format(error, os.linesep), result.get_output())
+
+    def test_uniq(self):
+        command = CommandUNIQ()
+        command.set_args([])
+        lines = ['a\n', 'a\n', 'b\n', 'a\n']
+        self.assertEqual(['a', 'b', 'a'],
+                         command.run(Stream(lines), self.env).get_output().splitlines())
+        command.set_args(['-c'])
+        self.assertEqual(['      2 a', '      1 b', '      1 a'],
+                         command.run(Stream(lines), self.env).get_output().splitlines())
+        command.set_args(['--top', '1'])
+        self.assertEqual(['      3 a'],
+                         command.run(Stream(lines), self.env).get_output().splitlines())
+        command.set_args(['--top=x'])
+        self.assertEqual(1, command.run(Stream(lines), self.env).return_value())
+
+    def test_lists(self):
+        def echo(word):
+            command = CommandECHO()
+            command.set_args([word])
+            return command
+        grep = CommandGREP()
+        grep.set_args(['a', 'no_file.txt'])
+        assignment = CommandASSIGNMENT('x', '1')
+        for command, output, return_value in (
+                (CommandSEQUENCE(echo('a'), echo('b')), 'a b', 0),
+                (CommandSEQUENCE(grep, echo('b')),
+                 'grep: no_file.txt: No such file or directory. b', 0),
+                (CommandAND(grep, echo('b')), 'grep: no_file.txt: No such file or directory.', 1),
+                (CommandOR(grep, echo('b')), 'grep: no_file.txt: No such file or directory. b', 0),
+                (CommandOR(CommandAND(echo('a'), echo('b')), echo('c')), 'a b', 0),
+                (CommandSEQUENCE(assignment, echo('b')), 'b', 0)):
+            result = command.run(Stream(), self.env)
+            self.assertEqual(output, ' '.join(result.get_output().splitlines()))
+            self.assertEqual(return_value, result.return_value())
+        self.assertEqual('1', self.env.get_var_value('x'))
+
+    def test_list_runs_lazily(self):
+        grep = CommandGREP()
+        grep.set_args(['a', 'no_file.txt'])
+        wc = CommandWC()
+        wc.set_args([])
+        result = CommandSEQUENCE(CommandSEQUENCE(grep, wc), grep).run(Stream(), self.env)
+        self.assertTrue(result.get_stream().is_binary())
+        chunks = result.get_stream().chunks()
+        self.assertEqual(b'grep: no_file.txt: No such file or directory.', next(chunks).rstrip())
+        result.get_stream().close()
+        self.assertEqual([], list(chunks))
+
+    def test_parallel(self):
+        def assign(name):
+            return CommandASSIGNMENT(name, '1')
+        commands = [CommandECHO(), CommandWC(), CommandGREP()]
+        commands[0].set_args(['a'])
+        commands[1].set_args([self.file])
+        commands[2].set_args(['a', 'no_file.txt'])
+        command = CommandPARALLEL(CommandPARALLEL(*commands[:2]), commands[2])
+        self.assertEqual(commands, command.items())
+        wc = CommandWC()
+        wc.set_args([self.file])
+        result = command.run(Stream(), self.env)
+        self.assertEqual(['a', wc.run(Stream(), self.env).get_output().rstrip(os.linesep),
+                          'grep: no_file.txt: No such file or directory.'],
+                         result.get_output().splitlines())
+        self.assertEqual(1, result.return_value())
+        result = CommandPARALLEL(commands[2], commands[0]).run(Stream(), self.env)
+        result.get_output()
+        self.assertEqual(0, result.return_value())
+        result = CommandPARALLEL(assign('y'), assign('z')).run(Stream(), self.env)
+        self.assertEqual(('', 0), (result.get_output(), result.return_value()))
+        self.assertEqual('', self.env.get_var_value('y') + self.env.get_var_value('z'))
@@ -0,0 +1,124 @@
+import unittest
+import threading
+from src.executor import *
+from src.commands import *
+from src.iostreams import Stream
+from src.environment import Environment
+
+
+class Producer(Command):
+    """The command producing the given number of lines lazily."""
+
+    def __init__(self, count):
+        self.produced = 0
+        self.threads = set()
+        self.__count = count
+
+    def run(self, input, env):
+        def lines():
+            try:
+                for i in range(self.__count):
+                    self.produced += 1
+                    self.threads.add(threading.current_thread())
+                    yield '{}{}'.format(i, os.linesep)
+            finally:
+                self.closed.set()
+        self.closed = threading.Event()
+        return CommandResult(Stream(lines()), env, 0)
+
+
+class TestPipelineExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.env = Environment()
+        self.file = 'test_text.txt'
+        self.executor = PipelineExecutor(queue_size=2, batch_size=1)
+
+    def test_single_command(self):
+        command = CommandECHO()
+        command.set_args(['kek'])
+        result = self.executor.run(command, Stream(), self.env)
+        self.assertEqual(0, result.return_value())
+        self.assertEqual('kek' + os.linesep, result.get_output())
+
+    def test_three_stages(self):
+        cat = CommandCAT()
+        cat.set_args([self.file])
+        grep = CommandGREP()
+        grep.set_args(['-i', 'does'])
+        wc = CommandWC()
+        wc.set_args([])
+        pipe = CommandPIPE(CommandPIPE(cat, grep), wc)
+        result = self.executor.run(pipe, Stream(), self.env)
+        self.assertEqual(0, result.return_value())
+        self.assertEqual(pipe.run(Stream(), self.env).get_output(),
+                         result.get_output())
+
+    def test_stages_in_threads(self):
+        producer = Producer(10)
+        cat = CommandCAT()
+        cat.set_args([])
+        result = self.executor.run(CommandPIPE(producer, cat), Stream(), self.env)
+        self.assertEqual(''.join('{}{}'.format(i, os.linesep) for i in range(10)),
+                         result.get_output())
+        self.assertNotIn(threading.current_thread(), producer.threads)
+
+    def test_backpressure(self):
+        producer = Producer(1000)
+        cat = CommandCAT()
+        cat.set_args([])
+        result = self.executor.run(CommandPIPE(producer, cat), Stream(), self.env)
+        stream = iter(result.get_stream())
+        next(stream)
+        self.assertLess(producer.produced, 10)
+        stream.close()
+
+    def test_failed_stage(self):
+        cat = CommandCAT()
+        cat.set_args(['not_funny.txt'])
+        wc = CommandWC()
+        wc.set_args([])
+        result = self.executor.run(CommandPIPE(cat, wc), Stream(), self.env)
+        self.assertEqual(1, result.return_value())
+        self.assertEqual('cat: not_funny.txt: No such file or directory.' + os.linesep,
+                         result.get_output())
+
+    def test_exit(self):
+        echo = CommandECHO()
+        echo.set_args(['kek'])
+        exit = CommandEXIT()
+        exit.set_args([])
+        self.assertRaises(ExitException, self.executor.run,
+                          CommandPIPE(echo, exit), Stream(), self.env)
+
+    def test_head_stops_upstream(self):
+        producer = Producer(10 ** 9)
+        cat = CommandCAT()
+        cat.set_args([])
+        head = CommandHEAD()
+        head.set_args(['-n', '3'])
+        result = self.executor.run(CommandPIPE(CommandPIPE(producer, cat), head),
+                                   Stream(), self.env)
+        self.assertEqual(['0', '1', '2'], result.get_output().split())
+        self.assertTrue(producer.closed.wait(5))
+        self.assertLess(producer.produced, 100)
+
+    def test_parallel_list(self):
+        producers = [Producer(10), Producer(10)]
+        cat = CommandCAT()
+        cat.set_args([])
+        command = CommandPARALLEL(CommandPIPE(producers[0], cat), producers[1])
+        result = self.executor.run(command, Stream(), self.env)
+        lines = ''.join('{}{}'.format(i, os.linesep) for i in range(10))
+        self.assertEqual(lines * 2, result.get_output())
+        self.assertEqual(0, result.return_value())
+        self.assertTrue(producers[0].threads.isdisjoint(producers[1].threads))
+        self.assertNotIn(threading.current_thread(), producers[0].threads | producers[1].threads)
+
+    def test_external_stage_streams(self):
+        head = CommandHEAD()
+        head.set_args(['-n', '2'])
+        result = self.executor.run(CommandPIPE(UnknownCommand('yes', []), head),
+                                   Stream(), self.env)
+        self.assertEqual('y' + os.linesep + 'y' + os.linesep, result.get_output())
+        self.assertEqual(0, result.return_value())
@@ -0,0 +1,61 @@
+import unittest
+import os
+import tempfile
+from src.filecache import *
+
+
+class TestFileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = FileCache(max_size=10, max_file_size=8)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def make_file(self, name, data):
+        file_path = os.path.join(self.directory.name, name)
+        with open(file_path, 'wb') as opened_file:
+            opened_file.write(data)
+        return file_path
+
+    def test_cached_file(self):
+        cached = CachedFile(b'a b\r\nc\rd')
+        self.assertEqual('a b\nc\nd', cached.text())
+        self.assertEqual([1, 4, 8], cached.counts())
+        self.assertEqual([0, 4, 6], list(cached.line_offsets()))
+        self.assertEqual(['a b\n', 'c\n', 'd'], list(cached.lines()))
+        self.assertEqual(['x\n'], list(CachedFile(b'x\n').lines()))
+        self.assertEqual([], list(CachedFile(b'').lines()))
+
+    def test_hit_and_change(self):
+        file_path = self.make_file('a', b'abc')
+        cached = self.cache.get(file_path)
+        self.assertIs(cached, self.cache.get(file_path))
+        self.make_file('a', b'abcd')
+        self.assertEqual('abcd', self.cache.get(file_path).text())
+        stats = self.cache.stats()
+        self.assertEqual((1, 2, 1, 4), (stats['hits'], stats['misses'],
+                                        stats['files'], stats['size']))
+
+    def test_eviction(self):
+        first = self.make_file('a', b'12345')
+        second = self.make_file('b', b'12345')
+        third = self.make_file('c', b'12345')
+        self.cache.get(first)
+        self.cache.get(second)
+        self.cache.get(first)
+        self.cache.get(third)
+        stats = self.cache.stats()
+        self.assertEqual((2, 10, 1), (stats['files'], stats['size'], stats['evictions']))
+        self.cache.get(first)
+        self.assertEqual(2, self.cache.stats()['hits'])
+
+    def test_big_file(self):
+        self.assertIsNone(self.cache.get(self.make_file('a', b'123456789')))
+        self.assertIsNone(self.cache.get(os.path.join(self.directory.name, 'none')))
+
+    def test_flush(self):
+        self.cache.get(self.make_file('a', b'abc'))
+        self.cache.flush()
+        self.assertEqual(0, self.cache.stats()['files'])
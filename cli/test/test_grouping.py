@@ -0,0 +1,22 @@
+import unittest
+import random
+from collections import Counter
+from src.grouping import top_lines, unique_lines
+
+
+class TestGrouping(unittest.TestCase):
+
+    def test_unique_lines(self):
+        self.assertEqual([('a', 2), ('b', 1), ('a', 1), ('', 2)],
+                         list(unique_lines(['a', 'a', 'b', 'a', '', ''])))
+        self.assertEqual([], list(unique_lines([])))
+
+    def test_top_lines(self):
+        self.assertEqual([('b', 3), ('a', 2)], top_lines(['a', 'b', 'b', 'c', 'a', 'b'], 2))
+        self.assertEqual([('a', 1), ('b', 1)], top_lines(['b', 'a'], 5))
+
+    def test_top_lines_spilled(self):
+        generator = random.Random(3)
+        lines = ['w{}'.format(int(generator.expovariate(0.01))) for _ in range(5000)]
+        expected = sorted(Counter(lines).items(), key=lambda item: (-item[1], item[0]))[:10]
+        self.assertEqual(expected, top_lines(iter(lines), 10, budget=1000))
@@ -0,0 +1,53 @@
+import unittest
+import os
+import tempfile
+from src import headtail
+from src.headtail import head_chunks, last_lines, tail_chunks, tail_file
+
+
+class TestHeadTail(unittest.TestCase):
+
+    def test_head_chunks(self):
+        chunks = ['a\nb', '\nc\n', 'd\n']
+        self.assertEqual('a\nb\nc\n', ''.join(head_chunks(chunks, 3)))
+        self.assertEqual('a\n', ''.join(head_chunks(chunks, 1)))
+        self.assertEqual('a\nb\nc\nd\n', ''.join(head_chunks(chunks, 10)))
+        self.assertEqual([], list(head_chunks(chunks, 0)))
+        self.assertEqual(b'\xff\n', b''.join(head_chunks([b'\xff\n\x00\n'], 1)))
+
+    def test_head_stops_reading(self):
+        read = []
+
+        def chunks():
+            for i in range(100):
+                read.append(i)
+                yield '{}\n'.format(i)
+        self.assertEqual('0\n1\n', ''.join(head_chunks(chunks(), 2)))
+        self.assertEqual([0, 1], read)
+
+    def test_last_lines(self):
+        self.assertEqual('c\nd\n', last_lines('a\nb\nc\nd\n', 2))
+        self.assertEqual('c\nd', last_lines('a\nb\nc\nd', 2))
+        self.assertEqual('a\nb\n', last_lines('a\nb\n', 5))
+        self.assertEqual(b'', last_lines(b'a\n', 0))
+
+    def test_tail_chunks(self):
+        chunks = ['{}\n'.format(i) for i in range(1000)]
+        self.assertEqual('997\n998\n999\n', tail_chunks(chunks, 3))
+        self.assertEqual(b'b\nc', tail_chunks([b'a\n', b'b', b'\nc'], 2))
+        self.assertIsNone(tail_chunks([], 3))
+
+    def test_tail_file(self):
+        block_size = headtail.BLOCK_SIZE
+        headtail.BLOCK_SIZE = 4
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                file_path = os.path.join(directory, 'file.txt')
+                with open(file_path, 'wb') as opened_file:
+                    opened_file.write(b''.join(b'line %d\n' % i for i in range(100)))
+                self.assertEqual(b'line 98\nline 99\n', tail_file(file_path, 2))
+                self.assertEqual(100, tail_file(file_path, 1000).count(b'\n'))
+                open(file_path, 'wb').close()
+                self.assertEqual(b'', tail_file(file_path, 2))
+        finally:
+            headtail.BLOCK_SIZE = block_size
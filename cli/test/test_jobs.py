@@ -0,0 +1,53 @@
+import unittest
+import time
+from src.jobs import *
+from src.commands import *
+from src.executor import PipelineExecutor
+from src.environment import Environment
+
+
+class TestJobManager(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = JobManager()
+        self.executor = PipelineExecutor()
+        self.env = Environment()
+
+    def test_output(self):
+        echo = CommandECHO()
+        echo.set_args(['kek'])
+        wc = CommandWC()
+        wc.set_args([])
+        job = self.manager.start('echo kek | wc', CommandPIPE(echo, wc),
+                                 self.env, self.executor)
+        self.assertEqual(1, job.number())
+        self.assertEqual(0, job.wait())
+        self.assertEqual('   1    1    4     ' + os.linesep, job.output().get_value())
+        self.assertEqual('Done', job.state())
+        self.assertEqual([job], self.manager.finished())
+        self.assertEqual([], self.manager.jobs())
+
+    def test_parallel(self):
+        start = time.perf_counter()
+        jobs = [self.manager.start('sleep 0.3', UnknownCommand('sleep', ['0.3']),
+                                   self.env, self.executor) for _ in range(3)]
+        self.assertEqual([1, 2, 3], [job.number() for job in jobs])
+        self.assertIs(jobs[1], self.manager.find('%2'))
+        self.assertIs(jobs[2], self.manager.get())
+        self.manager.wait_all()
+        self.assertLess(time.perf_counter() - start, 0.8)
+
+    def test_environment_is_copied(self):
+        job = self.manager.start('x=1', CommandASSIGNMENT('x', '1'), self.env, self.executor)
+        job.wait()
+        self.assertEqual('', self.env.get_var_value('x'))
+        self.env.set_var_value('y', '2')
+        copied = self.env.copy()
+        self.assertEqual('2', copied.get_var_value('y'))
+        self.assertEqual(self.env.get_cwd(), copied.get_cwd())
+
+    def test_failed_job(self):
+        job = self.manager.start('exit', CommandEXIT(), self.env, self.executor)
+        self.assertEqual(1, job.wait())
+        self.assertEqual('Job failed: Bye!' + os.linesep, job.output().get_value())
+        self.assertEqual('Exit 1', job.state())
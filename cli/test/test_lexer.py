@@ -96,3 +96,34 @@ class TestLexer(unittest.TestCase):
         self.assertEqual(1, len(lexems))
         self.assertEqual('aaa\'aa', lexems[0].value())
         self.assertEqual(Lexeme_type.STRING, lexems[0].type())
+
+    def test_trailing_spaces(self):
+        lexems = self.lexer.get_lexemes('  echo a   ')
+        self.assertEqual(['echo', 'a'], [lexem.value() for lexem in lexems])
+        self.assertEqual([], self.lexer.get_lexemes('   '))
+
+    def test_many_glued_quotes(self):
+        line = '\'a\'\"b\"' * 10000
+        lexems = self.lexer.get_lexemes('echo ' + line)
+        self.assertEqual(2, len(lexems))
+        self.assertEqual(line, lexems[1].value())
+        self.assertEqual(Lexeme_type.STRING_WITH_QUOTES, lexems[1].type())
+
+    def test_exception_position(self):
+        with self.assertRaises(LexerException) as context:
+            self.lexer.get_lexemes('echo \'a\'\"b')
+        self.assertEqual('Missing second quote for fist one at position 8.',
+                         str(context.exception))
+
+    def test_ampersand(self):
+        lexems = self.lexer.get_lexemes('grep x f &')
+        self.assertEqual(Lexeme_type.AMPERSAND, lexems[-1].type())
+        self.assertEqual(['grep', 'x', 'f', '&'], [lexem.value() for lexem in lexems])
+
+    def test_operators(self):
+        lexems = self.lexer.get_lexemes('echo \'a;b\';echo a && grep x f || wc&pwd ;')
+        self.assertEqual(['echo', '\'a;b\'', ';', 'echo', 'a', '&&', 'grep', 'x', 'f',
+                          '||', 'wc', '&', 'pwd', ';'], [lexem.value() for lexem in lexems])
+        self.assertEqual([Lexeme_type.SEMICOLON, Lexeme_type.AND, Lexeme_type.OR,
+                          Lexeme_type.AMPERSAND, Lexeme_type.SEMICOLON],
+                         [lexems[ix].type() for ix in (2, 5, 9, 11, 13)])
@@ -0,0 +1,98 @@
+import unittest
+import tempfile
+from src.optimizer import *
+from src.environment import Environment
+from src.executor import PipelineExecutor
+from src.iostreams import Stream
+from src.lexer import Lexer
+from src.parser import Parser
+
+
+class TestOptimizer(unittest.TestCase):
+
+    def setUp(self):
+        self.env = Environment()
+        self.file = 'test_text.txt'
+
+    def build(self, line):
+        return Parser(self.env).build_command(Lexer().get_lexemes(line))
+
+    def check_same(self, line):
+        executor = PipelineExecutor()
+        optimized = optimize(self.build(line))
+        expected = executor.run(self.build(line), Stream(), self.env)
+        result = executor.run(optimized, Stream(), self.env)
+        self.assertEqual(expected.get_output(), result.get_output())
+        self.assertEqual(expected.return_value(), result.return_value())
+        return optimized
+
+    def test_cat_grep(self):
+        command = self.check_same('cat {} | grep -i son'.format(self.file))
+        self.assertEqual(CommandFUSED, type(command))
+        self.assertEqual(['-i', 'son', self.file], command.get_command().get_args())
+
+    def test_cat_wc(self):
+        for line in ('cat {} | wc', 'cat {} | wc -l'):
+            command = self.check_same(line.format(self.file))
+            self.assertEqual(CommandFUSED, type(command))
+            self.assertEqual([self.file], command.get_command().get_input_files())
+
+    def test_cat_head_tail(self):
+        for line in ('cat {} | head -n 3', 'cat {} | tail -2'):
+            command = self.check_same(line.format(self.file))
+            self.assertEqual(CommandFUSED, type(command))
+            self.assertEqual(self.file, command.get_command().get_args()[-1])
+
+    def test_grep_wc(self):
+        command = self.check_same('echo son | grep -w son | wc -l')
+        self.assertEqual(CommandPIPE, type(command))
+        self.assertEqual(CommandECHO, type(command.stages()[0]))
+        self.assertTrue(command.stages()[1].counts_lines())
+        self.check_same('echo son | grep no | wc -l')
+
+    def test_cat_grep_wc(self):
+        command = self.check_same('cat {} | grep perfect | wc -l'.format(self.file))
+        self.assertTrue(command.counts_lines())
+        self.assertEqual(['-c', 'perfect', self.file], command.get_command().get_args())
+        self.assertEqual(3, len(command.get_original().stages()))
+
+    def test_not_fused(self):
+        for line in ('cat {0} {0} | grep son', 'cat {0} | grep -A 1 son | wc -l',
+                     'cat {0} | grep son {0}', 'grep son {0} | wc', 'cat {0} | wc {0}',
+                     'cat {0} | head {0}', 'cat {0} | tail -x'):
+            command = self.build(line.format(self.file))
+            self.assertIs(command, optimize(command))
+
+    def test_fallback(self):
+        with tempfile.NamedTemporaryFile(dir='.') as empty:
+            name = os.path.basename(empty.name)
+            self.check_same('cat {} | grep son'.format(name))
+            self.check_same('cat {} | grep son | wc -l'.format(name))
+        self.check_same('cat not_funny.txt | grep son | wc -l')
+        self.check_same('cat not_funny.txt | wc')
+
+    def test_explain(self):
+        command = optimize(self.build('explain time cat {} | grep son | wc'.format(self.file)))
+        result = command.run(Stream(), self.env)
+        self.assertEqual(['time',
+                          '    1. grep son {0}    <- cat {0} | grep son'.format(self.file),
+                          '    2. wc'], result.get_output().splitlines())
+
+    def test_lists(self):
+        line = 'cat {0} | grep son && cat {0} | wc -l ; cat no_file.txt | wc || echo a'
+        command = self.check_same(line.format(self.file))
+        self.assertEqual(CommandSEQUENCE, type(command))
+        self.assertEqual(CommandOR, type(command.get_right()))
+        self.assertEqual(CommandFUSED, type(command.get_left().get_right()))
+        self.assertEqual(['1. grep son {0}    <- cat {0} | grep son'.format(self.file), '&&',
+                          '1. wc -l < {0}    <- cat {0} | wc -l'.format(self.file)],
+                         explain(command.get_left()))
+        self.assertEqual('wc -l < {0} & pwd'.format(self.file),
+                         describe(optimize(self.build('cat {} | wc -l & pwd'.format(self.file)))))
+        command = self.build('echo a ; echo b')
+        self.assertIs(command, optimize(command))
+        command = optimize(self.build('f={} ; cat $f | wc -l'.format(self.file)))
+        self.assertEqual(['1. assignment', ';', 'cat $f | wc -l    <- parsed when it runs'],
+                         explain(command))
+        self.env.set_var_value('f', self.file)
+        self.assertEqual(CommandFUSED, type(command.get_right().build(self.env)))
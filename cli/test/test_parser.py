@@ -61,6 +61,18 @@ class TestParser(unittest.TestCase):
         command = self.parser.build_command(lexems)
         self.assertEqual(UnknownCommand, type(command))
 
+    def test_unsupported_options(self):
+        build = lambda line: self.parser.build_command(Lexer().get_lexemes(line))
+        for line, command_class in (('head -n 3 f', CommandHEAD), ('head -3 f', CommandHEAD),
+                                    ('tail --lines=2', CommandTAIL), ('head -c 3 f', UnknownCommand),
+                                    ('tail -f log', UnknownCommand), ('tail -q a b', UnknownCommand),
+                                    ('sort -rn -k 2,3 f', CommandSORT), ('sort --key=2', CommandSORT),
+                                    ('sort -u', UnknownCommand), ('sort -t, -k2', UnknownCommand),
+                                    ('sort -h', UnknownCommand), ('uniq -c --top 3', CommandUNIQ),
+                                    ('uniq -d', UnknownCommand), ('uniq -u', UnknownCommand),
+                                    ('uniq -i f', UnknownCommand)):
+            self.assertEqual(command_class, type(build(line)), line)
+
     def test_echo_pipe_cat(self):
         lexems = [Lexeme('$echo', Lexeme_type.VAR),
                   Lexeme('\"t\"', Lexeme_type.STRING_WITH_QUOTES),
@@ -94,4 +106,66 @@ class TestParser(unittest.TestCase):
 
     def test_exception_bad_assignment(self):
         self.assertRaises(ParserException,
-                          self.parser.build_command, [Lexeme('$a=10', Lexeme_type.VAR)])
\ No newline at end of file
+                          self.parser.build_command, [Lexeme('$a=10', Lexeme_type.VAR)])
+
+    def test_background(self):
+        lexems = [Lexeme('echo', Lexeme_type.STRING),
+                  Lexeme('a', Lexeme_type.STRING),
+                  Lexeme('|', Lexeme_type.PIPE),
+                  Lexeme('wc', Lexeme_type.STRING),
+                  Lexeme('&', Lexeme_type.AMPERSAND)]
+        command = self.parser.build_command(lexems)
+        self.assertEqual(CommandBACKGROUND, type(command))
+        self.assertEqual(CommandPIPE, type(command.get_command()))
+        self.assertRaises(ParserException, self.parser.build_command, lexems[-1:])
+        self.assertRaises(ParserException, self.parser.build_command,
+                          lexems[-1:] + lexems[:2])
+
+    def test_time(self):
+        lexems = [Lexeme('time', Lexeme_type.STRING),
+                  Lexeme('echo', Lexeme_type.STRING),
+                  Lexeme('&', Lexeme_type.AMPERSAND)]
+        command = self.parser.build_command(lexems)
+        self.assertEqual(CommandBACKGROUND, type(command))
+        self.assertEqual(CommandTIME, type(command.get_command()))
+        self.assertEqual(CommandECHO, type(command.get_command().get_command()))
+        self.assertEqual(UnknownCommand, type(self.parser.build_command(lexems[:1])))
+
+    def test_explain(self):
+        lexems = [Lexeme('explain', Lexeme_type.STRING),
+                  Lexeme('cat', Lexeme_type.STRING),
+                  Lexeme('|', Lexeme_type.PIPE),
+                  Lexeme('wc', Lexeme_type.STRING)]
+        command = self.parser.build_command(lexems)
+        self.assertEqual(CommandEXPLAIN, type(command))
+        self.assertEqual(CommandPIPE, type(command.get_command()))
+        self.assertEqual(1, command.run(Stream(), self.env).return_value())
+
+    def test_lists(self):
+        build = lambda line: self.parser.build_command(Lexer().get_lexemes(line))
+        command = build('echo a ; cat f | wc & pwd && echo b || echo c ;')
+        self.assertEqual(CommandSEQUENCE, type(command))
+        self.assertEqual(CommandECHO, type(command.get_left()))
+        self.assertEqual(CommandPARALLEL, type(command.get_right()))
+        self.assertEqual(CommandPIPE, type(command.get_right().get_left()))
+        self.assertEqual(CommandOR, type(command.get_right().get_right()))
+        self.assertEqual(CommandAND, type(command.get_right().get_right().get_left()))
+        self.assertEqual([CommandECHO] * 3,
+                         [type(item) for item in build('echo ; echo ; echo').items()])
+        command = build('echo a && echo b &')
+        self.assertEqual(CommandBACKGROUND, type(command))
+        self.assertEqual(CommandAND, type(command.get_command()))
+        for line in (';', '&&', 'echo a ;; echo b', 'echo a &&', '|| echo a', 'echo a & &'):
+            self.assertRaises(ParserException, build, line)
+
+    def test_deferred(self):
+        command = self.parser.build_command(Lexer().get_lexemes('y=$x ; echo $y && cat $y | wc'))
+        self.assertEqual(CommandASSIGNMENT, type(command.get_left()))
+        self.assertEqual(CommandDEFERRED, type(command.get_right()))
+        self.assertEqual('echo $y && cat $y | wc', command.get_right().get_text())
+        self.env.set_var_value('y', 'f')
+        built = command.get_right().build(self.env)
+        self.assertEqual(CommandAND, type(built))
+        self.assertEqual(['f'], built.get_right().stages()[0].get_args())
+        command = self.parser.build_command(Lexer().get_lexemes('y=1 & echo $y'))
+        self.assertEqual(CommandECHO, type(command.get_right()))
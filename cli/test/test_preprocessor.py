@@ -95,3 +95,19 @@ class TestPreprocessor(unittest.TestCase):
         def test_exception_one_single_and_one_double_quote(self):
             self.assertRaises(ParserException,
                               Preprocessor.substitute_vars, '\"x\'x', self.__env)
+
+        def test_template(self):
+            template = Preprocessor.compile('\"$x\"\'$x\'$var_name')
+            self.assertEqual(['x', 'var_name'], template.variables())
+            self.assertEqual('10$xkek', template.render(self.__env))
+            self.__env.set_var_value('x', '20')
+            self.assertEqual('20$xkek', template.render(self.__env))
+            self.assertIs(template, Preprocessor.compile('\"$x\"\'$x\'$var_name'))
+
+        def test_quotes_in_double_quotes_cut_the_end(self):
+            result = Preprocessor.substitute_vars('\"$x\'a\'\"$x\"b\"', self.__env)
+            self.assertEqual('10\'a\'10b', result)
+
+        def test_long_string(self):
+            result = Preprocessor.substitute_vars('\"$x\"\'$x\'' * 100000, self.__env)
+            self.assertEqual('10$x' * 100000, result)
@@ -0,0 +1,42 @@
+import unittest
+from src.profiler import *
+from src.commands import *
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.profiler = Profiler(size=3)
+
+    def test_ring_buffer(self):
+        for i in range(5):
+            self.profiler.add(LineProfile(str(i)))
+        self.assertEqual(['2', '3', '4'], [profile.line for profile in self.profiler.profiles()])
+        self.profiler.clear()
+        self.assertEqual([], self.profiler.profiles())
+
+    def test_percentiles(self):
+        for i in range(1, 4):
+            profile = LineProfile('wc')
+            profile.add_phase('run', i)
+            profile.add_stage('wc', i * 10)
+            self.profiler.add(profile)
+        percentiles = {name: (count, values) for name, count, values in
+                       self.profiler.percentiles((50, 100))}
+        self.assertEqual((3, [20, 30]), percentiles['wc'])
+        self.assertEqual((3, [2, 3]), percentiles['[run]'])
+        self.assertEqual((3, [0.0, 0.0]), percentiles['[lex]'])
+
+    def test_time_stage(self):
+        profile = LineProfile('echo a')
+        stream = Stream()
+        stream.write('a')
+        self.assertEqual('a', profile.time_stage('echo', 0.0, stream).get_value())
+        self.assertEqual('echo', profile.stages[0][0])
+
+    def test_command_name(self):
+        self.assertEqual('grep', command_name(CommandGREP()))
+        self.assertEqual('ls | sort', command_name(ExternalPipeline(
+            [UnknownCommand('ls', []), UnknownCommand('sort', ['-r'])])))
+        self.assertEqual('head', command_name(CommandFUSED(
+            CommandHEAD(), CommandPIPE(CommandCAT(), CommandHEAD()), ['f'])))
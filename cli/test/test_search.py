@@ -0,0 +1,114 @@
+import unittest
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from src import search
+from src.search import *
+from src.filecache import CachedFile
+
+
+def red(text):
+    return HIGHLIGHT.format(text)
+
+
+class TestSearch(unittest.TestCase):
+
+    def test_highlight_many_matches(self):
+        matcher = Matcher('ab')
+        self.assertEqual(red('ab') * 3 + 'c' + red('ab'), matcher.highlight('abababcab'))
+        self.assertIsNone(matcher.highlight('acbd'))
+
+    def test_highlight_word(self):
+        matcher = Matcher('does', ignore_case=True, word_regexp=True)
+        self.assertEqual('he ' + red('Does'), matcher.highlight('he Does'))
+        self.assertIsNone(matcher.highlight('he doesn\'t'))
+
+    def test_empty_pattern(self):
+        matcher = Matcher('')
+        self.assertEqual('text', matcher.highlight('text'))
+
+    def test_grep_lines_context(self):
+        lines = ['a\n', 'b\n', 'c\n', 'a\n', 'd\n', 'e\n']
+        result = list(grep_lines(Matcher('a'), lines, 1))
+        self.assertEqual([red('a') + os.linesep, 'b' + os.linesep, SEPARATOR + os.linesep,
+                          red('a') + os.linesep, 'd' + os.linesep, SEPARATOR + os.linesep],
+                         result)
+
+    def test_grep_lines_last_without_newline(self):
+        result = list(grep_lines(Matcher('b'), ['a\n', 'b'], 3))
+        self.assertEqual([red('b') + os.linesep], result)
+
+    def test_grep_mapped_file(self):
+        min_chunk_size = search.MIN_CHUNK_SIZE
+        search.MIN_CHUNK_SIZE = 16
+        try:
+            for args in (('have', 1), ('^A: No', 2), ('^$', None), ('Does', None),
+                         ('\\AA: ', None), ('\\.\\Z', 1), ('e(?!.*son)', None)):
+                matcher = Matcher(args[0])
+                with open('test_text.txt') as file:
+                    expected = list(grep_lines(matcher, file, args[1]))
+                with ThreadPoolExecutor(4) as pool:
+                    result = list(grep_mapped_file(matcher, 'test_text.txt', args[1], pool))
+                self.assertEqual(expected, result)
+        finally:
+            search.MIN_CHUNK_SIZE = min_chunk_size
+
+    def test_grep_mapped_file_not_ascii(self):
+        text = 'aéb\nбольшоеслово\nслово тут\nÉTÉ\n[é]\nKelvin \u212a\nab 12\n' * 3
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as file:
+            try:
+                file.write(text)
+            except UnicodeEncodeError:
+                self.skipTest('the locale encoding has no Cyrillic letters')
+        min_chunk_size = search.MIN_CHUNK_SIZE
+        search.MIN_CHUNK_SIZE = 16
+        try:
+            for args in (('a.b',), ('\\w+ое',), ('слово', False, True), ('[^x]b',),
+                         ('\\bтут',), ('[é]',), ('été', True), ('k', True), ('[0-9]+',),
+                         ('a\\w?b',), ('(ab|aé)', False, True)):
+                matcher = Matcher(*args)
+                with open(file.name) as opened_file:
+                    expected = list(grep_lines(matcher, opened_file))
+                self.assertTrue(expected, args)
+                with ThreadPoolExecutor(4) as pool:
+                    self.assertEqual(expected, list(grep_mapped_file(matcher, file.name, None, pool)),
+                                     args)
+                    self.assertEqual(len(expected), count_mapped_file(matcher, file.name, pool))
+        finally:
+            search.MIN_CHUNK_SIZE = min_chunk_size
+            os.remove(file.name)
+
+    def test_scan_chunk_crlf(self):
+        with tempfile.NamedTemporaryFile(delete=False) as file:
+            file.write(b'a\r\n\r\nb\r\n')
+        try:
+            self.assertEqual([(3, 4)], scan_chunk(file.name, 0, 8, '^$', 0))
+            self.assertEqual([(5, 7)], scan_chunk(file.name, 5, 8, 'b', 0))
+        finally:
+            os.remove(file.name)
+
+    def test_grep_tree(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs(os.path.join(directory, 'b', 'c'))
+            for name, content in (('a.txt', b'kek\n'), ('b/x.txt', b'no\nkek kek\n'),
+                                  ('b/c/y.txt', b'kek\n'), ('b/bin', b'kek\0kek\n')):
+                with open(os.path.join(directory, name), 'wb') as file:
+                    file.write(content)
+            files = list(walk_files([directory], ordered=True))
+            self.assertEqual(['a.txt', 'b/bin', 'b/c/y.txt', 'b/x.txt'],
+                             [os.path.relpath(file, directory) for file in files])
+            with ThreadPoolExecutor(2) as pool:
+                result = list(grep_tree(Matcher('kek'), [directory], None, pool, True))
+            self.assertEqual([os.path.join(directory, 'a.txt') + ':' + red('kek') + os.linesep,
+                              os.path.join(directory, 'b/c/y.txt') + ':' + red('kek') + os.linesep,
+                              os.path.join(directory, 'b/x.txt') + ':' + red('kek') + ' ' +
+                              red('kek') + os.linesep],
+                             result)
+
+    def test_grep_text(self):
+        cached = CachedFile(b'ab\n\nb a\r\nb')
+        for pattern in ['a', 'b$', '^$', 'a\\s*b', '\\Ab', 'a(?![\\s\\S]*b)', '(?=\\s)', '']:
+            matcher = Matcher(pattern)
+            self.assertEqual(list(grep_lines(matcher, cached.lines())),
+                             list(grep_text(matcher, cached)))
+        self.assertEqual(['b ' + red('a') + os.linesep, 'b' + os.linesep],
+                         list(grep_text(Matcher('a'), CachedFile(b'x\nb a\nb'), 1)))
@@ -0,0 +1,37 @@
+import unittest
+import random
+from src import sorting
+from src.sorting import make_key, sort_lines
+
+
+class TestSorting(unittest.TestCase):
+
+    def setUp(self):
+        generator = random.Random(5)
+        self.lines = ['{} w{}'.format(generator.randint(-100, 100), generator.randint(0, 30))
+                      for _ in range(2000)]
+
+    def test_in_memory(self):
+        self.assertEqual(sorted(self.lines), list(sort_lines(iter(self.lines))))
+
+    def test_key(self):
+        key = make_key()
+        self.assertEqual(('a b', 'a b'), key('a b'))
+        key = make_key(numeric=True, start=2, end=2)
+        self.assertEqual((-1.5, 'x -1.5a y'), key('x -1.5a y'))
+        self.assertEqual((0.0, 'x'), key('x'))
+        key = make_key(start=2)
+        self.assertEqual(('b c', 'a  b c'), key('a  b c'))
+
+    def test_spilled_runs(self):
+        width = sorting.MERGE_WIDTH
+        sorting.MERGE_WIDTH = 3
+        try:
+            key = make_key(numeric=True)
+            result = list(sort_lines(iter(self.lines), key, True, budget=1000))
+        finally:
+            sorting.MERGE_WIDTH = width
+        self.assertEqual(sorted(self.lines, key=key, reverse=True), result)
+
+    def test_empty(self):
+        self.assertEqual([], list(sort_lines(iter([]), budget=0)))
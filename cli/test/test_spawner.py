@@ -0,0 +1,50 @@
+import unittest
+import os
+import stat
+import tempfile
+from src import spawner
+from src.commands import *
+from src.environment import Environment
+
+
+class TestSpawner(unittest.TestCase):
+
+    def setUp(self):
+        self.env = Environment()
+        self.path = os.environ.get('PATH')
+
+    def tearDown(self):
+        os.environ['PATH'] = self.path
+        spawner.use_spawn_server(False)
+
+    def test_resolve(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ['PATH'] = directory
+            self.assertIsNone(spawner.resolve('kek'))
+            file_path = os.path.join(directory, 'kek')
+            with open(file_path, 'w') as opened_file:
+                opened_file.write('#! /bin/sh\necho kek\n')
+            os.chmod(file_path, stat.S_IRWXU)
+            os.utime(directory, ns=(0, os.stat(directory).st_mtime_ns + 1))
+            self.assertEqual(file_path, spawner.resolve('kek'))
+            os.remove(file_path)
+            self.assertEqual(file_path, spawner.resolve('kek'))
+            result = UnknownCommand('kek', []).run(Stream(), self.env)
+            self.assertEqual(1, result.return_value())
+            self.assertIsNone(spawner.resolve('kek'))
+
+    def test_spawn_server(self):
+        spawner.use_spawn_server(True)
+        self.assertIsInstance(spawner.get_spawner(), spawner.SpawnServer)
+        echo = CommandECHO()
+        echo.set_args(['hello'])
+        pipe = CommandPIPE(CommandPIPE(echo, UnknownCommand('tr', ['a-z', 'A-Z'])),
+                           UnknownCommand('cat', []))
+        result = pipe.run(Stream(), self.env)
+        self.assertEqual(0, result.return_value())
+        self.assertEqual('HELLO\n', result.get_output())
+        result = UnknownCommand('sh', ['-c', 'exit 3']).run(Stream(), self.env)
+        self.assertEqual(3, result.return_value())
+        result = UnknownCommand('kek_not_found', []).run(Stream(), self.env)
+        self.assertEqual('Command kek_not_found: command not found.' + os.linesep,
+                         result.get_output())
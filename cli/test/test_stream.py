@@ -1,6 +1,9 @@
 import unittest
 from src.iostreams import *
+from io import StringIO
 import os
+import tempfile
+import time
 
 
 class TestStream(unittest.TestCase):
@@ -11,3 +14,187 @@ class TestStream(unittest.TestCase):
         test_obj.write(' ')
         test_obj.write_line('kek')
         self.assertEqual('kek kek{}'.format(os.linesep), test_obj.get_value())
+
+    def test_lazy_source(self):
+        consumed = []
+
+        def source():
+            for chunk in ['first', ' line\nsecond', ' line\n']:
+                consumed.append(chunk)
+                yield chunk
+        test_obj = Stream(source())
+        self.assertEqual([], consumed)
+        self.assertFalse(test_obj.is_empty())
+        self.assertEqual(['first'], consumed)
+        self.assertEqual(['first line\n', 'second line\n'], list(test_obj.lines()))
+
+    def test_lazy_get_value(self):
+        test_obj = Stream(iter(['kek', '', ' kek']))
+        self.assertEqual('kek kek', test_obj.get_value())
+        self.assertEqual('kek kek', test_obj.get_value())
+
+    def test_empty(self):
+        self.assertTrue(Stream().is_empty())
+        self.assertTrue(Stream(iter(['', ''])).is_empty())
+
+    def test_binary(self):
+        test_obj = Stream(iter([b'\xff\x00a\r', b'\nb']), binary=True)
+        self.assertTrue(test_obj.is_binary())
+        self.assertFalse(test_obj.is_empty())
+        self.assertEqual([b'\xff\x00a\r', b'\nb'], list(test_obj.chunks()))
+        test_obj = Stream(iter([b'a\r', b'\nb']), binary=True)
+        self.assertEqual('a{}b'.format(os.linesep), test_obj.get_value())
+        self.assertFalse(test_obj.is_binary())
+        self.assertEqual([b'kek'], list(Stream(iter(['kek'])).bytes_chunks()))
+
+    def test_binary_write_to(self):
+        with tempfile.TemporaryFile('w+') as out:
+            out.write('text ')
+            Stream(iter([b'\x00\r\n']), binary=True).write_to(out)
+            out.seek(0)
+            self.assertEqual(b'text \x00\r\n', out.buffer.read())
+
+
+class TestFileSource(unittest.TestCase):
+
+    def setUp(self):
+        self.file = tempfile.NamedTemporaryFile(delete=False)
+        self.file.write(b'first\r\nsecond\rthird\nlast')
+        self.file.close()
+        self.expected = 'first{0}second{0}third{0}last'.format(os.linesep)
+
+    def tearDown(self):
+        os.remove(self.file.name)
+
+    def test_iter(self):
+        self.assertEqual(self.expected,
+                         Stream(FileSource([self.file.name]), binary=True).get_value())
+        self.assertEqual(b'first\r\nsecond\rthird\nlast', b''.join(FileSource([self.file.name])))
+
+    def test_iter_small_chunks(self):
+        source = FileSource([self.file.name, self.file.name], 'error')
+        source.CHUNK_SIZE = 6
+        self.assertEqual(self.expected + self.expected + 'error' + os.linesep,
+                         ''.join(source.text_chunks()))
+
+    def test_write_to_text_file(self):
+        out = StringIO()
+        Stream(FileSource([self.file.name])).write_to(out)
+        self.assertEqual(self.expected, out.getvalue())
+
+    def test_write_to_binary_file(self):
+        with tempfile.TemporaryFile('w+') as out:
+            Stream(FileSource([self.file.name], 'error')).write_to(out)
+            out.seek(0)
+            self.assertEqual(self.expected + 'error' + os.linesep, out.read())
+
+
+class TestSpillBuffer(unittest.TestCase):
+
+    def test_memory(self):
+        buffer = SpillBuffer(threshold=10)
+        buffer.write('kek')
+        self.assertFalse(buffer.is_spilled())
+        self.assertEqual(['kek'], list(buffer.chunks()))
+
+    def test_spill(self):
+        stats = get_spill_stats()
+        buffer = SpillBuffer(threshold=4)
+        buffer.CHUNK_SIZE = 3
+        for part in ['ab', 'вг', 'де', '']:
+            buffer.write(part)
+        self.assertTrue(buffer.is_spilled())
+        self.assertEqual(6, buffer.tell())
+        self.assertEqual('abвгде', ''.join(buffer.chunks()))
+        self.assertEqual('abвгде', buffer.getvalue())
+        new_stats = get_spill_stats()
+        self.assertEqual(stats['spills'] + 1, new_stats['spills'])
+        self.assertEqual(stats['spilled bytes'] + 10, new_stats['spilled bytes'])
+        buffer.close()
+        self.assertEqual('', buffer.getvalue())
+
+    def test_binary_spill(self):
+        buffer = SpillBuffer(binary=True, threshold=0)
+        buffer.write(b'\xff\x00')
+        self.assertTrue(buffer.is_spilled())
+        self.assertEqual(b'\xff\x00', buffer.getvalue())
+
+    def test_stream_spill(self):
+        threshold = get_spill_threshold()
+        set_spill_threshold(5)
+        try:
+            test_obj = Stream(iter(['kek'] * 10))
+            self.assertEqual('kek' * 10, test_obj.get_value())
+            self.assertEqual('kek' * 10, ''.join(test_obj))
+        finally:
+            set_spill_threshold(threshold)
+
+
+class TestPipeSource(unittest.TestCase):
+
+    def test_read(self):
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, b'a\xff')
+        source = PipeSource(read_fd)
+        chunks = iter(source)
+        self.assertEqual(b'a\xff', next(chunks))
+        os.write(write_fd, b'b')
+        os.close(write_fd)
+        self.assertEqual([b'b'], list(chunks))
+        self.assertRaises(OSError, os.fstat, read_fd)
+
+    def test_drain(self):
+        read_fd, write_fd = os.pipe()
+        source = PipeSource(read_fd)
+        source.READ_SIZE = 2
+        chunks = iter(source)
+        os.write(write_fd, b'abc')
+        self.assertEqual(b'ab', next(chunks))
+        os.write(write_fd, b'de')
+        os.close(write_fd)
+        source.drain()
+        self.assertEqual(b'cde', b''.join(chunks))
+
+    def test_close(self):
+        read_fd, write_fd = os.pipe()
+        source = PipeSource(read_fd)
+        source.close()
+        self.assertRaises(BrokenPipeError, os.write, write_fd, b'a')
+        os.close(write_fd)
+        self.assertEqual([], list(source))
+
+
+class TestBatchedWriter(unittest.TestCase):
+
+    def test_batches(self):
+        out = StringIO()
+        writer = BatchedWriter(out, batch_size=4, interval=60)
+        writer.write('ab')
+        self.assertEqual('', out.getvalue())
+        writer.write('cd')
+        self.assertEqual('abcd', out.getvalue())
+        writer.write('e')
+        writer.flush()
+        self.assertEqual('abcde', out.getvalue())
+        self.assertIsNone(writer.buffer)
+
+    def test_later(self):
+        out = StringIO()
+        writer = BatchedWriter(out, interval=0.01)
+        writer.write('a')
+        for _ in range(500):
+            if out.getvalue():
+                break
+            time.sleep(0.01)
+        self.assertEqual('a', out.getvalue())
+
+    def test_bytes_order(self):
+        with tempfile.TemporaryFile('w+') as out:
+            writer = BatchedWriter(out, interval=60)
+            writer.write('a')
+            writer.buffer.write(b'b')
+            writer.write('c')
+            self.assertEqual(out.buffer.fileno(), writer.buffer.fileno())
+            writer.flush()
+            out.seek(0)
+            self.assertEqual('abc', out.read())
@@ -0,0 +1,71 @@
+import unittest
+from array import array
+import os
+import re
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from src.trigrams import *
+
+
+def trigrams_of(*words):
+    return {int.from_bytes(word, sys.byteorder) for word in words}
+
+
+class TestTrigrams(unittest.TestCase):
+
+    def test_required_trigrams(self):
+        self.assertEqual(trigrams_of(b'doe', b'oes'), required_trigrams('Does', 0))
+        self.assertEqual(trigrams_of(b'abc', b'hel', b'ell', b'llo'),
+                         required_trigrams('abc.*(hello)+x?', 0))
+        self.assertEqual(set(), required_trigrams('abc|def', 0))
+        self.assertEqual(set(), required_trigrams('a[bc]d', 0))
+
+    def test_required_trigrams_ignore_case(self):
+        self.assertEqual(trigrams_of(b'tte', b'ten'), required_trigrams('kitten', re.I))
+        self.assertEqual(trigrams_of(b'tte', b'ten'), required_trigrams('(?i)kitten', 0))
+
+    def test_file_trigrams(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'file.txt')
+            with open(file_path, 'wb') as opened_file:
+                opened_file.write(b'AbcDab')
+            packed = array('I')
+            packed.frombytes(file_trigrams(file_path))
+            self.assertEqual(sorted(trigrams_of(b'abc', b'bcd', b'cda', b'dab')), list(packed))
+
+    def test_index(self):
+        with tempfile.TemporaryDirectory() as directory, ThreadPoolExecutor() as pool:
+            first = os.path.join(directory, 'first.txt')
+            second = os.path.join(directory, 'second.txt')
+            with open(first, 'w') as opened_file:
+                opened_file.write('Does he smoke?')
+            with open(second, 'w') as opened_file:
+                opened_file.write('Nothing here')
+            index = TrigramIndex(os.path.join(directory, INDEX_NAME))
+            self.assertEqual(2, index.build([directory], pool))
+            index.save()
+            index = get_index(directory)
+            trigrams = required_trigrams('smoke', 0)
+            self.assertTrue(index.may_match(first, trigrams))
+            self.assertFalse(index.may_match(second, trigrams))
+
+            with open(second, 'a') as opened_file:
+                opened_file.write(', smoke')
+            self.assertTrue(index.may_match(second, trigrams))
+            self.assertEqual(1, index.stats()['stale'])
+            os.remove(first)
+            self.assertEqual((1, 1), index.refresh(pool))
+            self.assertEqual(1, index.stats()['files'])
+            self.assertEqual(0, index.stats()['stale'])
+
+    def test_broken_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, INDEX_NAME)
+            for content in (b'\x80\x04\x95', b'[1, 2]', b'{"version": 1, "roots": [], "files": 3}',
+                            b'{"version": 1, "roots": ["/"], "files": {"a": [1, 2, "AAA="]}}'):
+                with open(path, 'wb') as opened_file:
+                    opened_file.write(content)
+                index = TrigramIndex.load(path)
+                self.assertEqual([], index.roots())
+                self.assertEqual(0, index.stats()['files'])
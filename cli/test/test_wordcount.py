@@ -0,0 +1,19 @@
+import unittest
+from src.wordcount import *
+
+
+class TestWordCount(unittest.TestCase):
+
+    def test_count_chunks(self):
+        data = b'  first word\n\tsecond  line \r\nlast'
+        self.assertEqual([2, 5, len(data)], count_chunks([data]))
+
+    def test_word_between_chunks(self):
+        self.assertEqual([0, 2, 9], count_chunks([b'wo', b'rd ', b'', b'wo', b'rd']))
+        self.assertEqual([1, 2, 9], count_chunks([b'word', b'\n', b'word']))
+
+    def test_empty(self):
+        self.assertEqual([0, 0, 0], count_chunks([]))
+
+    def test_count_file(self):
+        self.assertEqual([10, 60, 284], count_file('test_text.txt'))